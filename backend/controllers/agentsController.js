@@ -1,4 +1,21 @@
 const Agent = require('../models/Agent');
+const axios = require('axios');
+
+// Get WebArena service URL from environment variables or use default
+const WEBARENA_SERVICE_URL = process.env.WEBARENA_SERVICE_URL || 'http://localhost:8000';
+
+// Ask the WebArena service to compile and cache the agent. Returns an error
+// message for broken code, or null when the code is valid or the service
+// can't be reached (the evaluation itself will validate again).
+const validateAgentCode = async (code) => {
+  try {
+    const { data } = await axios.post(`${WEBARENA_SERVICE_URL}/api/agents/validate`, { agent_code: code });
+    return data.valid ? null : data.error;
+  } catch (error) {
+    console.error('Could not validate agent with WebArena service:', error.message);
+    return null;
+  }
+};
 
 const getAgents = async (req, res) => {
   try {
@@ -27,6 +44,14 @@ const createAgent = async (req, res) => {
       });
     }
 
+    const validationError = await validateAgentCode(code);
+    if (validationError) {
+      return res.status(400).json({
+        error: 'Invalid agent code',
+        details: { code: validationError }
+      });
+    }
+
     const { data, error } = await Agent.create(req.body);
     
     if (error) {
@@ -57,6 +82,16 @@ const getAgent = async (req, res) => {
 
 const updateAgent = async (req, res) => {
   try {
+    if (req.body.code) {
+      const validationError = await validateAgentCode(req.body.code);
+      if (validationError) {
+        return res.status(400).json({
+          error: 'Invalid agent code',
+          details: { code: validationError }
+        });
+      }
+    }
+
     const { data, error } = await Agent.update(req.params.id, req.body);
     if (error) throw error;
     res.status(200).json(data);
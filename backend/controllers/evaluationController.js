@@ -2,6 +2,8 @@ const Evaluation = require('../models/Evaluation');
 const Agent = require('../models/Agent');
 const Challenge = require('../models/Challenge');
 const axios = require('axios');
+const crypto = require('crypto');
+const { pipeline } = require('stream');
 
 // Get WebArena service URL from environment variables or use default
 const WEBARENA_SERVICE_URL = process.env.WEBARENA_SERVICE_URL || 'http://localhost:8000';
@@ -16,6 +18,15 @@ const evaluationController = {
         return res.status(400).json({ error: 'Missing required fields' });
       }
 
+      const { data: inFlight, error: inFlightError } = await Evaluation.findInFlight([agent_id], [challenge_id]);
+      if (inFlightError) throw inFlightError;
+      if (inFlight.length) {
+        return res.status(409).json({
+          error: `This agent's evaluation on this challenge is still ${inFlight[0].status}`,
+          evaluation_id: inFlight[0].id
+        });
+      }
+
       const evaluationData = {
         agent_id,
         challenge_id,
@@ -49,6 +60,13 @@ const evaluationController = {
           agent_code: agentData[0].code,
           challenge_url: challengeData.url,
           success_criteria: challengeData.success_criteria,
+          ready_selectors: challengeData.ready_selectors || null,
+          observation_mode: agentData[0].observation_mode || 'full',
+          network_mode: challengeData.network_mode || 'live',
+          use_snapshot: Boolean(challengeData.use_snapshot),
+          challenge_version: challengeData.updated_at || null,
+          routing_policy: challengeData.routing_policy || null,
+          trials: Number(req.body.trials || challengeData.trials) || 1,
           callback_url: `${BACKEND_URL}/api/evaluations/${data[0].id}/callback`
         };
         
@@ -60,9 +78,15 @@ const evaluationController = {
           })
           .catch(error => {
             console.error('Error starting WebArena evaluation:', error);
+            // The service rejects submissions with 429 when its queue is full
+            const busy = error.response && error.response.status === 429;
             Evaluation.update(data[0].id, { 
               status: 'failed',
-              result: { error: 'Failed to start evaluation' }
+              result: {
+                error: busy
+                  ? `Evaluation service is busy, retry after ${error.response.headers['retry-after']}s`
+                  : 'Failed to start evaluation'
+              }
             });
           });
         
@@ -83,6 +107,115 @@ const evaluationController = {
     }
   },
 
+  // Evaluate every agent against every challenge: one insert, two lookups and
+  // one request to the WebArena service for the whole matrix
+  async createBatchEvaluation(req, res) {
+    try {
+      const { agent_ids, challenge_ids } = req.body;
+
+      if (!Array.isArray(agent_ids) || !Array.isArray(challenge_ids) || !agent_ids.length || !challenge_ids.length) {
+        return res.status(400).json({ error: 'agent_ids and challenge_ids must be non-empty arrays' });
+      }
+
+      const agentIds = [...new Set(agent_ids)];
+      const challengeIds = [...new Set(challenge_ids)];
+      const [{ data: agents, error: agentsError }, { data: challenges, error: challengesError }] = await Promise.all([
+        Agent.findByIds(agentIds),
+        Challenge.findByIds(challengeIds)
+      ]);
+      if (agentsError) throw agentsError;
+      if (challengesError) throw challengesError;
+      if (agents.length !== agentIds.length || challenges.length !== challengeIds.length) {
+        return res.status(404).json({ error: 'Agent or challenge not found' });
+      }
+
+      // Pairs still being evaluated keep their run; re-running them would reuse its evaluation id
+      const { data: inFlight, error: inFlightError } = await Evaluation.findInFlight(agentIds, challengeIds);
+      if (inFlightError) throw inFlightError;
+      const busy = new Set(inFlight.map(evaluation => `${evaluation.agent_id}:${evaluation.challenge_id}`));
+      const rows = [];
+      for (const agent_id of agentIds) {
+        for (const challenge_id of challengeIds) {
+          if (!busy.has(`${agent_id}:${challenge_id}`)) {
+            rows.push({ agent_id, challenge_id, status: 'queued' });
+          }
+        }
+      }
+      if (!rows.length) {
+        return res.status(409).json({
+          error: 'Every agent and challenge pair is still being evaluated',
+          in_flight: inFlight.map(evaluation => evaluation.id)
+        });
+      }
+      const { data, error } = await Evaluation.createMany(rows);
+      if (error) throw error;
+
+      const batchId = crypto.randomUUID();
+      const evaluationIds = data.map(evaluation => evaluation.id);
+      const batchRequest = {
+        batch_id: batchId,
+        agents: Object.fromEntries(agents.map(agent => [agent.id, {
+          agent_code: agent.code,
+          observation_mode: agent.observation_mode || 'full'
+        }])),
+        challenges: Object.fromEntries(challenges.map(challenge => [challenge.id, {
+          challenge_url: challenge.url,
+          success_criteria: challenge.success_criteria,
+          ready_selectors: challenge.ready_selectors || null,
+          network_mode: challenge.network_mode || 'live',
+          use_snapshot: Boolean(challenge.use_snapshot),
+          challenge_version: challenge.updated_at || null,
+          routing_policy: challenge.routing_policy || null
+        }])),
+        evaluations: data.map(evaluation => ({
+          evaluation_id: evaluation.id,
+          agent_id: evaluation.agent_id,
+          challenge_id: evaluation.challenge_id,
+          callback_url: `${BACKEND_URL}/api/evaluations/${evaluation.id}/callback`
+        }))
+      };
+
+      try {
+        const response = await axios.post(`${WEBARENA_SERVICE_URL}/api/evaluate/batch`, batchRequest);
+        await Evaluation.updateMany(evaluationIds, { status: response.data.status === 'running' ? 'running' : 'queued' });
+      } catch (batchError) {
+        console.error('Error starting WebArena batch:', batchError.message);
+        // The service rejects submissions with 429 when its queue is full
+        const busy = batchError.response && batchError.response.status === 429;
+        const detail = batchError.response && batchError.response.data && batchError.response.data.detail;
+        await Evaluation.updateMany(evaluationIds, {
+          status: 'failed',
+          result: {
+            error: busy
+              ? `Evaluation service is busy, retry after ${batchError.response.headers['retry-after']}s`
+              : `Failed to start evaluation${detail ? `: ${detail}` : ''}`
+          }
+        });
+      }
+
+      res.status(201).json({
+        batch_id: batchId,
+        evaluation_ids: evaluationIds,
+        skipped: inFlight.map(evaluation => evaluation.id)
+      });
+    } catch (error) {
+      res.status(500).json({ error: error.message });
+    }
+  },
+
+  // Progress and aggregate results of a batch, from the WebArena service
+  async getBatch(req, res) {
+    try {
+      const response = await axios.get(`${WEBARENA_SERVICE_URL}/api/batches/${req.params.batchId}`);
+      res.json(response.data);
+    } catch (error) {
+      if (error.response && error.response.status === 404) {
+        return res.status(404).json({ error: 'Batch not found' });
+      }
+      res.status(500).json({ error: error.message });
+    }
+  },
+
   async getEvaluation(req, res) {
     try {
       const { id } = req.params;
@@ -133,11 +266,11 @@ const evaluationController = {
       const { data, error } = await Evaluation.update(id, updateData);
       
       if (error) throw error;
-      if (!data) {
+      if (!data || data.length === 0) {
         return res.status(404).json({ error: 'Evaluation not found' });
       }
       
-      res.json(data);
+      res.json(data[0]);
     } catch (error) {
       res.status(500).json({ error: error.message });
     }
@@ -156,11 +289,42 @@ const evaluationController = {
     }
   },
   
+  // Relay the WebArena microservice's progress events to the browser as SSE
+  async streamEvaluationEvents(req, res) {
+    const { id } = req.params;
+
+    res.set({
+      'Content-Type': 'text/event-stream',
+      'Cache-Control': 'no-cache',
+      'Connection': 'keep-alive'
+    });
+    res.flushHeaders();
+
+    try {
+      const upstream = await axios.get(`${WEBARENA_SERVICE_URL}/api/evaluations/${id}/events`, {
+        responseType: 'stream',
+        headers: req.headers['last-event-id'] ? { 'Last-Event-ID': req.headers['last-event-id'] } : {}
+      });
+
+      // pipeline ends res if the service drops the stream, instead of an unhandled 'error'
+      pipeline(upstream.data, res, (error) => {
+        if (error && !req.destroyed) {
+          console.error('Evaluation event stream interrupted:', error.message);
+        }
+      });
+      req.on('close', () => upstream.data.destroy());
+    } catch (error) {
+      console.error('Error relaying evaluation events:', error.message);
+      res.write(`event: error\ndata: ${JSON.stringify({ error: 'Progress stream unavailable' })}\n\n`);
+      res.end();
+    }
+  },
+  
   // New callback handler for the WebArena microservice
   async evaluationCallback(req, res) {
     try {
       const { id } = req.params;
-      const { steps_taken, score, status, result, logs } = req.body;
+      const { steps_taken, score, status, result, logs, trials } = req.body;
       
       //console.log(`Received callback for evaluation ${id}:`, req.body);
       
@@ -172,6 +336,11 @@ const evaluationController = {
         completed_at: new Date(),
         logs: logs || []
       };
+      // Multi-trial evaluations score the mean of their trials; keep the success rate and its interval too
+      if (trials) {
+        updateData.accuracy = trials.success_rate;
+        updateData.result = { ...(result || {}), trials };
+      }
       
       const { data, error } = await Evaluation.update(id, updateData);
       
@@ -0,0 +1,3 @@
+-- CSS selectors that must all be visible before a challenge page counts as loaded
+alter table public.challenges
+  add column if not exists ready_selectors text[] null;
@@ -0,0 +1,3 @@
+-- Whether the agent receives the full accessibility tree every step or diffs after the first
+alter table public.agents
+  add column if not exists observation_mode character varying(10) not null default 'full';
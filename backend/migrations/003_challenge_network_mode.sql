@@ -0,0 +1,3 @@
+-- Where a challenge's page traffic comes from: the live site, or a recorded HAR archive
+alter table public.challenges
+  add column if not exists network_mode character varying(10) not null default 'live';
@@ -0,0 +1,20 @@
+-- Start evaluations from a snapshot of the challenge's loaded state
+alter table public.challenges
+  add column if not exists use_snapshot boolean not null default false;
+
+-- Sent as challenge_version, so editing a challenge invalidates its snapshots
+alter table public.challenges
+  add column if not exists updated_at timestamp with time zone not null default now();
+
+create or replace function public.set_updated_at()
+returns trigger as $$
+begin
+  new.updated_at = now();
+  return new;
+end;
+$$ language plpgsql;
+
+drop trigger if exists challenges_set_updated_at on public.challenges;
+create trigger challenges_set_updated_at
+  before update on public.challenges
+  for each row execute function public.set_updated_at();
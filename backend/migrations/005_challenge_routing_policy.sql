@@ -0,0 +1,3 @@
+-- Requests to block or stub while the challenge is evaluated, e.g. {"preset": "lean"}
+alter table public.challenges
+  add column if not exists routing_policy jsonb null;
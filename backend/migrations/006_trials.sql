@@ -0,0 +1,7 @@
+-- How many times each evaluation of the challenge runs by default
+alter table public.challenges
+  add column if not exists trials integer not null default 1 check (trials >= 1);
+
+-- Success rate over an evaluation's trials
+alter table public.evaluations
+  add column if not exists accuracy numeric(5, 4) null;
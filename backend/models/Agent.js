@@ -38,6 +38,10 @@ const Agent = {
     return supabase.from('agents').select('*').eq('id', id);
   },
   
+  async findByIds(ids) {
+    return supabase.from('agents').select('*').in('id', ids);
+  },
+  
   async findByChallenge(challengeId) {
     return supabase.from('agents').select('*').eq('challenge_id', challengeId);
   },
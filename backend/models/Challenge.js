@@ -12,6 +12,10 @@ const Challenge = {
       return result;
     },
     
+    async findByIds(ids) {
+      return supabase.from('challenges').select('*').in('id', ids);
+    },
+    
     async findByUser(userId) {
       return supabase.from('challenges').select('*').eq('created_by', userId);
     },
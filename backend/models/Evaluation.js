@@ -1,10 +1,24 @@
 const supabase = require('../config/database');
 
+// An agent has one evaluation per challenge (unique_agent_challenge); evaluating
+// it again re-runs that row, clearing the previous run's results
+const RERUN = {
+  score: null,
+  steps_taken: null,
+  accuracy: null,
+  result: null,
+  logs: null,
+  completed_at: null
+};
+
+// Statuses of an evaluation the WebArena service hasn't reported back on yet
+const IN_FLIGHT = ['queued', 'running'];
+
 const Evaluation = {
   async create(evaluationData) {
       const { data, error } = await supabase
           .from('evaluations')
-          .insert(evaluationData)
+          .upsert({ ...RERUN, ...evaluationData }, { onConflict: 'agent_id,challenge_id' })
           .select();
   
       if (error) {
@@ -15,6 +29,30 @@ const Evaluation = {
       return { data, error: null };
   },
   
+  // One upsert for many rows, e.g. a batch of evaluations
+  async createMany(rows) {
+      const { data, error } = await supabase
+          .from('evaluations')
+          .upsert(rows.map(row => ({ ...RERUN, ...row })), { onConflict: 'agent_id,challenge_id' })
+          .select();
+
+      if (error) {
+          console.error("Supabase insert error:", error);
+          return { data: null, error };
+      }
+      return { data, error: null };
+  },
+
+  // Unfinished evaluations of any of these agents on any of these challenges;
+  // re-running one would dispatch its id to the service a second time
+  async findInFlight(agentIds, challengeIds) {
+    return supabase.from('evaluations')
+      .select('id, agent_id, challenge_id, status')
+      .in('agent_id', agentIds)
+      .in('challenge_id', challengeIds)
+      .in('status', IN_FLIGHT);
+  },
+
   async findById(id) {
     return supabase.from('evaluations')
       .select(`
@@ -58,7 +96,14 @@ const Evaluation = {
   async update(id, updatedData) {
     return supabase.from('evaluations')
       .update(updatedData)
-      .eq('id', id);
+      .eq('id', id)
+      .select(); // Without select() supabase returns no rows
+  },
+
+  async updateMany(ids, updatedData) {
+    return supabase.from('evaluations')
+      .update(updatedData)
+      .in('id', ids);
   },
 
   async delete(id) {
@@ -5,9 +5,18 @@ const evaluationController = require('../controllers/evaluationController');
 // Create a new evaluation
 router.post('/', evaluationController.createEvaluation);
 
+// Evaluate several agents against several challenges
+router.post('/batch', evaluationController.createBatchEvaluation);
+
+// Get the progress and results of a batch
+router.get('/batch/:batchId', evaluationController.getBatch);
+
 // Get a specific evaluation
 router.get('/:id', evaluationController.getEvaluation);
 
+// Stream live progress events for an evaluation (Server-Sent Events)
+router.get('/:id/events', evaluationController.streamEvaluationEvents);
+
 // Get evaluations for a specific agent
 router.get('/agent/:agentId', evaluationController.getEvaluationsByAgent);
 
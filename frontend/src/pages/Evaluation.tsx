@@ -12,7 +12,14 @@ import {
   FileText,
   ArrowLeft
 } from 'lucide-react';
-import { getEvaluation, getChallenge, getAgent, type Evaluation as EvaluationType } from '../services/api';
+import {
+  getEvaluation,
+  getChallenge,
+  getAgent,
+  subscribeToEvaluationEvents,
+  type Evaluation as EvaluationType,
+  type EvaluationEvent
+} from '../services/api';
 
 export function Evaluation() {
   const { id } = useParams();
@@ -22,11 +29,11 @@ export function Evaluation() {
   const [agent, setAgent] = useState<any | null>(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
-  const [pollInterval, setPollInterval] = useState<number | null>(null);
+  const [liveEvents, setLiveEvents] = useState<EvaluationEvent[]>([]);
 
   // Function to fetch evaluation data
-  const fetchEvaluation = async () => {
-    if (!id) return;
+  const fetchEvaluation = async (): Promise<EvaluationType | null> => {
+    if (!id) return null;
     
     try {
       console.log('Fetching evaluation with id:', id);
@@ -55,42 +62,75 @@ export function Evaluation() {
         }
       }
       
-      // If status is now completed or failed, stop polling
-      if (evalData.status === 'completed' || evalData.status === 'failed') {
-        if (pollInterval) {
-          clearInterval(pollInterval);
-          setPollInterval(null);
-        }
-      }
-      
       setLoading(false);
+      return evalData;
     } catch (err) {
       console.error('Error fetching evaluation:', err);
       setError('Failed to fetch evaluation data');
       setLoading(false);
-      
-      // Stop polling on error
-      if (pollInterval) {
-        clearInterval(pollInterval);
-        setPollInterval(null);
-      }
+      return null;
     }
   };
 
-  // Set up initial data fetch and polling
+  const isFinished = (evalData: EvaluationType | null) =>
+    !evalData || evalData.status === 'completed' || evalData.status === 'failed';
+
+  // Fetch once, then follow progress over the event stream instead of polling
   useEffect(() => {
-    fetchEvaluation();
+    if (!id) return;
     
-    // Set up polling every 3 seconds
-    const interval = window.setInterval(fetchEvaluation, 3000);
-    setPollInterval(interval);
+    let unsubscribe: (() => void) | null = null;
+    let interval: number | null = null;
+    let cancelled = false;
+    setLiveEvents([]);
+
+    const stopPolling = () => {
+      if (interval !== null) {
+        clearInterval(interval);
+        interval = null;
+      }
+    };
+
+    // Poll every 3 seconds if the stream is unavailable, or until the result arrives after "finished"
+    const startPolling = () => {
+      interval = window.setInterval(async () => {
+        if (isFinished(await fetchEvaluation())) stopPolling();
+      }, 3000);
+    };
+
+    fetchEvaluation().then(evalData => {
+      if (cancelled || isFinished(evalData)) return;
+
+      unsubscribe = subscribeToEvaluationEvents(id, event => {
+        setLiveEvents(prev => [...prev, event]);
+        if (event.type === 'started') {
+          setEvaluation(prev => prev ? { ...prev, status: 'running' } : prev);
+        }
+        if (event.type === 'finished') {
+          unsubscribe?.();
+          unsubscribe = null;
+          // The result reaches the backend through the service's callback, which may still be in flight
+          fetchEvaluation().then(data => {
+            if (!cancelled && !isFinished(data)) startPolling();
+          });
+        }
+      }, () => {
+        unsubscribe = null;
+        startPolling();
+      });
+    });
     
-    // Clean up interval on component unmount
+    // Close the stream and any fallback polling on unmount
     return () => {
-      if (interval) clearInterval(interval);
+      cancelled = true;
+      unsubscribe?.();
+      stopPolling();
     };
   }, [id]);
 
+  // Latest step reported by the event stream
+  const lastStepEvent = [...liveEvents].reverse().find(event => event.type === 'step_started');
+
   // Helper to format time
   const formatTime = (dateString: string) => {
     return new Date(dateString).toLocaleTimeString([], { 
@@ -369,7 +409,11 @@ export function Evaluation() {
               {evaluation.status === 'running' && (
                 <div className="flex items-center mt-1">
                   <div className="animate-pulse mr-2 h-2 w-2 bg-blue-500 rounded-full"></div>
-                  <p className="text-sm text-blue-500">In progress...</p>
+                  <p className="text-sm text-blue-500">
+                    {lastStepEvent
+                      ? `Step ${lastStepEvent.data.step} of ${lastStepEvent.data.max_steps}...`
+                      : 'In progress...'}
+                  </p>
                 </div>
               )}
             </div>
@@ -406,6 +450,27 @@ export function Evaluation() {
         </div>
       </div>
       
+      {/* Live progress from the event stream */}
+      {evaluation.status !== 'completed' && evaluation.status !== 'failed' && liveEvents.length > 0 && (
+        <div className="bg-white rounded-lg shadow-lg p-6 mb-6">
+          <h2 className="text-lg font-semibold mb-4">Live Progress</h2>
+          <div className="bg-gray-800 text-gray-200 p-4 rounded-md font-mono text-sm overflow-auto max-h-96">
+            {liveEvents.map(event => (
+              <div key={event.id} className="mb-1">
+                {event.type === 'queued' && `Queued (position ${event.data.queue_position})`}
+                {event.type === 'started' && 'Evaluation started'}
+                {event.type === 'loaded' && `Page loaded in ${event.data.load_time?.toFixed(2)}s (${event.data.lines} lines)`}
+                {event.type === 'step_started' && `Step ${event.data.step}/${event.data.max_steps}`}
+                {event.type === 'action_executed' && `  ${event.data.action} (settled in ${event.data.settle_time?.toFixed(2)}s)`}
+                {event.type === 'action_rejected' && `  Rejected ${event.data.action}: ${event.data.error}${event.data.skipped ? ` (${event.data.skipped} later actions skipped)` : ''}`}
+                {event.type === 'observation' && `  ${event.data.url} - ${event.data.lines} lines${event.data.success ? ', success criteria met' : ''}`}
+                {event.type === 'finished' && `Finished: ${event.data.status}`}
+              </div>
+            ))}
+          </div>
+        </div>
+      )}
+      
       {/* Logs section */}
       {evaluation.logs && Array.isArray(evaluation.logs) && evaluation.logs.length > 0 && (
         <div className="bg-white rounded-lg shadow-lg p-6">
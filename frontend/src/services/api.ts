@@ -69,6 +69,13 @@ export interface Evaluation {
   completed_at: string | null;
 }
 
+export interface EvaluationEvent {
+  id: number;
+  type: 'queued' | 'started' | 'loaded' | 'step_started' | 'action_executed' | 'action_rejected' | 'observation' | 'finished';
+  time: number;
+  data: Record<string, any>;
+}
+
 // Helper type for API responses
 type ApiResponse<T> = Promise<T>;
 
@@ -121,3 +128,30 @@ export const createEvaluation = (data: { agent_id: string; challenge_id: string
 
 export const getEvaluation = (id: string): ApiResponse<Evaluation> => 
   api.get(`/evaluations/${id}`).then(response => response as Evaluation);
+
+const EVALUATION_EVENT_TYPES: EvaluationEvent['type'][] = [
+  'queued', 'started', 'loaded', 'step_started', 'action_executed', 'action_rejected', 'observation', 'finished'
+];
+
+// Follow an evaluation's progress over Server-Sent Events. Returns a function
+// that closes the stream. onError is called if the stream is unavailable.
+export const subscribeToEvaluationEvents = (
+  id: string,
+  onEvent: (event: EvaluationEvent) => void,
+  onError: () => void
+): (() => void) => {
+  const source = new EventSource(`/api/evaluations/${id}/events`);
+
+  EVALUATION_EVENT_TYPES.forEach(type => {
+    source.addEventListener(type, (e) => onEvent(JSON.parse((e as MessageEvent).data)));
+  });
+  // Sent by the backend when it can't reach the WebArena service
+  source.addEventListener('error', (e) => {
+    if ((e as MessageEvent).data !== undefined || source.readyState === EventSource.CLOSED) {
+      source.close();
+      onError();
+    }
+  });
+
+  return () => source.close();
+};
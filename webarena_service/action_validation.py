@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Validation of agent actions before they reach the browser.
+
+Every action is parsed with the same grammar as WebArena's
+``create_id_based_action`` and its element id, if it has one, is looked up in
+the ``AXTree`` of the observation the agent was given. An invalid action is
+rejected without a browser round-trip: the rest of its batch is skipped and
+the agent sees the problem on its next observation as ``obs_text.errors``,
+a list of dicts like::
+
+    {"action": "click [999]", "code": "unknown_element", "error": "..."}
+
+Codes are ``not_a_string``, ``unknown_action``, ``malformed`` and
+``unknown_element``.
+"""
+
+import re
+from typing import Optional, Tuple
+
+from ax_tree import AXTree
+
+# Action type -> pattern its arguments must match (mirrors create_id_based_action)
+_ACTION_PATTERNS = {
+    "click": re.compile(r"click ?\[(\d+)\]"),
+    "hover": re.compile(r"hover ?\[(\d+)\]"),
+    "type": re.compile(r"type ?\[(\d+)\] ?\[(.+)\] ?\[(\d+)\]", re.DOTALL),
+    "press": re.compile(r"press ?\[(.+)\]"),
+    "scroll": re.compile(r"scroll ?\[?(up|down)\]?"),
+    "goto": re.compile(r"goto ?\[(.+)\]"),
+    "tab_focus": re.compile(r"tab_focus ?\[(\d+)\]"),
+    "new_tab": None,
+    "go_back": None,
+    "go_forward": None,
+    "close_tab": None,
+    "stop": None,
+    "noop": None,
+}
+ELEMENT_ACTIONS = ("click", "hover", "type")
+
+
+def _rejection(action, code, error):
+    return {"action": action, "code": code, "error": error}
+
+
+def _action_type(action_str):
+    return action_str.split("[")[0].strip() if "[" in action_str else action_str.split()[0]
+
+
+def _match_arguments(action_type, action_str):
+    pattern = _ACTION_PATTERNS[action_type]
+    if pattern is None:
+        return ()
+    if action_type == "type" and not action_str.endswith(("[0]", "[1]")):
+        # create_id_based_action presses Enter after typing unless told otherwise
+        action_str += " [1]"
+    match = pattern.search(action_str)
+    return None if match is None else match.groups()
+
+
+def validate_action(action, tree: AXTree) -> Optional[dict]:
+    """Return a rejection for ``action``, or None if it may be executed."""
+    if not isinstance(action, str):
+        return _rejection(repr(action), "not_a_string", "Actions must be strings")
+
+    action_str = action.strip()
+    if not action_str:
+        return _rejection(action, "malformed", "Empty action")
+    action_type = _action_type(action_str)
+    if action_type not in _ACTION_PATTERNS:
+        return _rejection(
+            action, "unknown_action",
+            f"Unknown action type {action_type!r}; expected one of: {', '.join(_ACTION_PATTERNS)}",
+        )
+
+    arguments = _match_arguments(action_type, action_str)
+    if arguments is None:
+        return _rejection(action, "malformed", f"Could not parse arguments of {action_type!r} action")
+
+    if action_type in ELEMENT_ACTIONS and arguments[0] not in tree:
+        return _rejection(
+            action, "unknown_element",
+            f"Element [{arguments[0]}] is not in the current observation",
+        )
+    return None
+
+
+def parse_action(action: str) -> Tuple[str, tuple]:
+    """Action type and arguments of an action ``validate_action`` accepted.
+
+    ``type`` actions always get their third argument, the Enter flag.
+    """
+    action_str = action.strip()
+    action_type = _action_type(action_str)
+    arguments = _match_arguments(action_type, action_str) if action_type in _ACTION_PATTERNS else None
+    if arguments is None:
+        raise ValueError(f"Invalid action: {action!r}")
+    return action_type, arguments
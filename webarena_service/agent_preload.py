@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Warm-up module imported by the agent forkserver before it forks workers.
+
+Agents commonly import heavy packages (numpy, transformers, tiktoken, nltk,
+openai). Importing them once in the forkserver parent means every worker
+inherits them already initialised through copy-on-write memory, so an agent's
+own ``import numpy`` is a dictionary lookup instead of a cold import.
+
+Configured through environment variables:
+
+- ``AGENT_PRELOAD_MODULES``: comma separated modules to import
+- ``AGENT_WARM_TOKENIZERS``: comma separated tiktoken encodings to load
+- ``AGENT_WARM_FILES``: comma separated files (model weights, vocabularies)
+  to read once so they sit in the OS page cache
+"""
+
+import os
+import time
+
+AGENT_PRELOAD_MODULES = os.environ.get(
+    "AGENT_PRELOAD_MODULES", "numpy,tiktoken,nltk,openai,transformers"
+)
+AGENT_WARM_TOKENIZERS = os.environ.get("AGENT_WARM_TOKENIZERS", "")
+AGENT_WARM_FILES = os.environ.get("AGENT_WARM_FILES", "")
+
+# Seconds spent on each warm-up item, or the error that stopped it
+preload_report = {}
+
+
+def _split(value):
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _timed(name, fn):
+    started = time.perf_counter()
+    try:
+        fn()
+        preload_report[name] = round(time.perf_counter() - started, 4)
+    except Exception as e:
+        preload_report[name] = f"{type(e).__name__}: {e}"
+
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        while f.read(1 << 20):
+            pass
+
+
+def _load_tokenizer(encoding):
+    import tiktoken
+    tiktoken.get_encoding(encoding)
+
+
+def warm_up():
+    for module in _split(AGENT_PRELOAD_MODULES):
+        _timed(f"import {module}", lambda module=module: __import__(module))
+    for encoding in _split(AGENT_WARM_TOKENIZERS):
+        _timed(f"tokenizer {encoding}", lambda encoding=encoding: _load_tokenizer(encoding))
+    for path in _split(AGENT_WARM_FILES):
+        _timed(f"file {path}", lambda path=path: _read_file(path))
+
+
+warm_up()
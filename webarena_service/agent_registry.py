@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of compiled agent code.
+
+Agents are keyed by the SHA-256 of their source. The first time an agent is
+seen its source is syntax checked, checked for a top-level ``agent_logic``
+and compiled to a code object; later evaluations of the same agent reuse the
+code object and only pay for executing the module body. The cache is an LRU
+bounded by ``AGENT_CACHE_SIZE`` entries.
+"""
+
+import ast
+import collections
+import hashlib
+import os
+import threading
+import types
+from typing import Optional
+
+AGENT_CACHE_SIZE = int(os.environ.get("AGENT_CACHE_SIZE", "128"))
+
+
+class AgentValidationError(ValueError):
+    """Raised when agent code cannot be compiled or does not define agent_logic."""
+
+
+def agent_hash(agent_code: str) -> str:
+    return hashlib.sha256(agent_code.encode("utf-8")).hexdigest()
+
+
+def _defines_agent_logic(tree: ast.Module) -> bool:
+    """Check the module's top level binds the name ``agent_logic``."""
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            if node.name == "agent_logic":
+                return True
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            if any(isinstance(t, ast.Name) and t.id == "agent_logic" for t in targets):
+                return True
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            if any((alias.asname or alias.name) == "agent_logic" for alias in node.names):
+                return True
+    return False
+
+
+class CompiledAgent:
+    """Validated, compiled agent source."""
+
+    def __init__(self, digest, code):
+        self.hash = digest
+        self.code = code
+
+    def load(self):
+        """Execute the module body in a fresh namespace and return its agent_logic."""
+        module = types.ModuleType("agent_module")
+        module.__file__ = self.code.co_filename
+        exec(self.code, module.__dict__)
+
+        agent_logic = getattr(module, "agent_logic", None)
+        if not callable(agent_logic):
+            raise AgentValidationError("Agent code must contain an 'agent_logic' function")
+        return agent_logic
+
+
+def compile_agent(agent_code: str, digest: Optional[str] = None) -> CompiledAgent:
+    """Syntax check and compile agent source, raising AgentValidationError if it's broken."""
+    digest = digest or agent_hash(agent_code)
+    filename = f"<agent {digest[:12]}>"
+    try:
+        tree = ast.parse(agent_code, filename=filename)
+    except SyntaxError as e:
+        raise AgentValidationError(f"Syntax error on line {e.lineno}: {e.msg}")
+
+    if not _defines_agent_logic(tree):
+        raise AgentValidationError("Agent code must contain an 'agent_logic' function")
+
+    # The parser accepts some code only the compiler rejects, e.g. a module-level
+    # ``return``, ``nonlocal`` or ``await``
+    try:
+        code = compile(tree, filename, "exec")
+    except SyntaxError as e:
+        raise AgentValidationError(f"Syntax error on line {e.lineno}: {e.msg}")
+    except ValueError as e:
+        raise AgentValidationError(f"Invalid agent code: {e}")
+    return CompiledAgent(digest, code)
+
+
+class AgentRegistry:
+    """Thread-safe LRU of compiled agents keyed by source hash."""
+
+    def __init__(self, max_size=AGENT_CACHE_SIZE):
+        self.max_size = max_size
+        self._agents = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, agent_code: str) -> CompiledAgent:
+        """Return the compiled agent for ``agent_code``, compiling it on a miss."""
+        digest = agent_hash(agent_code)
+        with self._lock:
+            agent = self._agents.get(digest)
+            if agent is not None:
+                self._agents.move_to_end(digest)
+                self.hits += 1
+                return agent
+
+        # Compile outside the lock; a concurrent miss for the same agent is harmless
+        agent = compile_agent(agent_code, digest)
+        with self._lock:
+            self.misses += 1
+            self._agents[digest] = agent
+            self._agents.move_to_end(digest)
+            while len(self._agents) > self.max_size:
+                self._agents.popitem(last=False)
+        return agent
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._agents),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_registry: Optional[AgentRegistry] = None
+
+
+def get_registry() -> AgentRegistry:
+    """Return the process-wide agent registry, creating it on first use."""
+    global _registry
+    if _registry is None:
+        _registry = AgentRegistry()
+    return _registry
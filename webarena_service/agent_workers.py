@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Process-isolated agent execution.
+
+``agent_logic`` runs in worker processes started from a ``forkserver`` rather
+than inside the FastAPI process, so a CPU-heavy agent doesn't hold the
+service's GIL and a runaway one can only take down its own worker. Every call
+is bounded by a CPU-time limit (``RLIMIT_CPU``), a wall-clock limit enforced
+by the parent, and an RSS limit enforced by a watchdog thread in the worker
+(measured from the worker's RSS when it starts, preloaded packages included).
+
+Workers are pre-forked and kept idle until an evaluation leases one. Each
+worker serves a single evaluation: the compiled agent (a marshalled code
+object from the agent registry) is executed once in a fresh namespace, and
+observations and actions travel over a ``multiprocessing`` pipe. When the
+evaluation ends the worker is discarded and a replacement is forked, so no
+state leaks between evaluations.
+
+The forkserver imports ``agent_preload`` before forking, so heavy packages
+agents typically use are already imported in every worker.
+
+On platforms without ``forkserver`` (or with ``AGENT_EXECUTION=inline``)
+agents run in-process as before.
+"""
+
+import marshal
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from agent_registry import CompiledAgent
+from scheduler import EVAL_CONCURRENCY
+
+AGENT_EXECUTION = os.environ.get(
+    "AGENT_EXECUTION",
+    "process" if "forkserver" in multiprocessing.get_all_start_methods() else "inline",
+)
+# One idle worker per scheduler slot, so every running evaluation can lease one without a fork
+AGENT_WORKERS = int(os.environ.get("AGENT_WORKERS", str(EVAL_CONCURRENCY)))
+AGENT_CPU_LIMIT = int(os.environ.get("AGENT_CPU_LIMIT", "10"))
+AGENT_WALL_LIMIT = float(os.environ.get("AGENT_WALL_LIMIT", "30"))
+# Counted from the worker's RSS once forked, so the preloaded packages don't use it up
+AGENT_MEMORY_LIMIT_MB = int(os.environ.get("AGENT_MEMORY_LIMIT_MB", "1024"))
+# Time allowed for executing the agent module body (its imports included)
+AGENT_LOAD_TIMEOUT = float(os.environ.get("AGENT_LOAD_TIMEOUT", "60"))
+
+
+class AgentError(Exception):
+    """The agent raised, exceeded a limit, or its worker died."""
+
+
+class AgentLimitExceeded(AgentError):
+    """The agent went over its CPU, wall-clock or memory limit."""
+
+
+class _CPULimitExceeded(BaseException):
+    """Raised inside the worker by the SIGXCPU handler."""
+
+
+def _rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _watch_memory(conn, send_lock, limit_bytes):
+    """Kill the worker as soon as its resident set grows by more than the limit.
+
+    The limit applies on top of the RSS the worker starts with, which already
+    holds everything ``agent_preload`` imported in the forkserver.
+    """
+    try:
+        baseline = _rss_bytes()
+    except OSError:
+        return
+    while True:
+        time.sleep(0.05)
+        try:
+            rss = _rss_bytes()
+        except OSError:
+            return
+        if rss - baseline > limit_bytes:
+            with send_lock:
+                try:
+                    conn.send(("limit", f"Agent exceeded memory limit of {limit_bytes // 2**20} MB"))
+                except Exception:
+                    pass
+            os._exit(1)
+
+
+def _on_sigxcpu(signum, frame):
+    raise _CPULimitExceeded()
+
+
+def _set_cpu_limit(seconds):
+    """Set the soft CPU limit ``seconds`` past what the worker has used so far."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if seconds is None:
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = usage.ru_utime + usage.ru_stime
+    limit = int(used + seconds) + 1
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+
+
+def _worker_main(conn, memory_limit_mb):
+    """Entry point of a worker process: load one agent, then serve calls."""
+    send_lock = threading.Lock()
+
+    def reply(*msg):
+        with send_lock:
+            conn.send(msg)
+
+    signal.signal(signal.SIGXCPU, _on_sigxcpu)
+    if memory_limit_mb:
+        threading.Thread(
+            target=_watch_memory, args=(conn, send_lock, memory_limit_mb * 2**20), daemon=True
+        ).start()
+
+    agent_logic = None
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            return
+
+        if msg[0] == "load":
+            started = time.perf_counter()
+            try:
+                agent_logic = CompiledAgent(msg[1], marshal.loads(msg[2])).load()
+            except BaseException as e:
+                reply("error", f"{type(e).__name__}: {e}", traceback.format_exc())
+                continue
+            preload = sys.modules.get("agent_preload")
+            reply("ok", time.perf_counter() - started, getattr(preload, "preload_report", None))
+
+        elif msg[0] == "call":
+            _, obs_text, cpu_limit = msg
+            started = time.perf_counter()
+            try:
+                _set_cpu_limit(cpu_limit)
+                try:
+                    actions = agent_logic(obs_text)
+                finally:
+                    _set_cpu_limit(None)
+                reply("ok", actions, time.perf_counter() - started)
+            except _CPULimitExceeded:
+                reply("limit", f"Agent exceeded CPU time limit of {cpu_limit}s", None)
+            except BaseException as e:
+                # Includes actions that can't be pickled
+                reply("error", f"{type(e).__name__}: {e}", traceback.format_exc())
+
+
+class AgentWorker:
+    """Parent-side handle on one worker process."""
+
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, AGENT_MEMORY_LIMIT_MB),
+            name="agent-worker",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+
+    def request(self, msg, timeout):
+        """Send a message and wait up to ``timeout`` seconds for the reply."""
+        try:
+            self.conn.send(msg)
+            if not self.conn.poll(timeout):
+                self.kill()
+                raise AgentLimitExceeded(f"Agent exceeded wall-clock limit of {timeout}s")
+            reply = self.conn.recv()
+        except (EOFError, OSError, BrokenPipeError):
+            self.kill()
+            raise AgentError(f"Agent worker died (exit code {self.process.exitcode})")
+
+        if reply[0] == "limit":
+            self.kill()
+            raise AgentLimitExceeded(reply[1])
+        if reply[0] == "error":
+            raise AgentError(reply[1])
+        return reply[1:]
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class ProcessAgentSession:
+    """One evaluation's agent, running in a leased worker process."""
+
+    def __init__(self, pool, worker, agent: CompiledAgent):
+        self.pool = pool
+        self.worker = worker
+        # Time spent executing the agent module body, its imports included
+        self.load_time, pool.preload_report = worker.request(
+            ("load", agent.hash, marshal.dumps(agent.code)), AGENT_LOAD_TIMEOUT
+        )
+
+    def call(self, obs_text):
+        actions, _elapsed = self.worker.request(
+            ("call", obs_text, AGENT_CPU_LIMIT), AGENT_WALL_LIMIT
+        )
+        return actions
+
+    def close(self):
+        self.worker.kill()
+        self.pool._replenish()
+
+
+class InlineAgentSession:
+    """Agent running in the service process (no isolation)."""
+
+    def __init__(self, agent: CompiledAgent):
+        started = time.perf_counter()
+        self.agent_logic = agent.load()
+        self.load_time = time.perf_counter() - started
+
+    def call(self, obs_text):
+        return self.agent_logic(obs_text)
+
+    def close(self):
+        pass
+
+
+class AgentWorkerPool:
+    """Keeps ``size`` idle, pre-forked worker processes ready for new evaluations."""
+
+    def __init__(self, size=AGENT_WORKERS):
+        self.size = size
+        self._ctx = None
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        # What the forkserver preloaded, as reported by the last worker
+        self.preload_report = None
+
+    def start(self):
+        with self._lock:
+            if self._ctx is not None:
+                return
+            self._ctx = multiprocessing.get_context("forkserver")
+            # Must be set before the forkserver starts, i.e. before the first worker
+            self._ctx.set_forkserver_preload(["agent_preload", "agent_registry", "agent_workers", "ax_tree"])
+            # The forkserver doesn't apply our sys.path before preloading, so make
+            # this directory importable through the environment it inherits
+            service_dir = os.path.dirname(os.path.abspath(__file__))
+            python_path = os.environ.get("PYTHONPATH", "")
+            if service_dir not in python_path.split(os.pathsep):
+                os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [service_dir, python_path]))
+        for _ in range(self.size):
+            self._idle.put(AgentWorker(self._ctx))
+
+    def _replenish(self):
+        if self._idle.qsize() < self.size:
+            self._idle.put(AgentWorker(self._ctx))
+
+    def session(self, agent: CompiledAgent) -> ProcessAgentSession:
+        """Lease an idle worker (forking one if none is ready) and load the agent into it."""
+        self.start()
+        try:
+            worker = self._idle.get_nowait()
+        except queue.Empty:
+            worker = AgentWorker(self._ctx)
+        if not worker.process.is_alive():
+            worker.kill()
+            worker = AgentWorker(self._ctx)
+
+        try:
+            return ProcessAgentSession(self, worker, agent)
+        except Exception:
+            worker.kill()
+            self._replenish()
+            raise
+
+    def stats(self):
+        return {
+            "execution": AGENT_EXECUTION,
+            "idle": self._idle.qsize(),
+            "preload": self.preload_report,
+        }
+
+    def shutdown(self):
+        while True:
+            try:
+                self._idle.get_nowait().kill()
+            except queue.Empty:
+                return
+
+
+_pool: Optional[AgentWorkerPool] = None
+
+
+def get_worker_pool() -> AgentWorkerPool:
+    """Return the process-wide worker pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        _pool = AgentWorkerPool()
+    return _pool
+
+
+def open_agent_session(agent: CompiledAgent):
+    """Start running ``agent`` for one evaluation, isolated unless configured otherwise."""
+    if AGENT_EXECUTION == "process":
+        return get_worker_pool().session(agent)
+    return InlineAgentSession(agent)
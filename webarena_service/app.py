@@ -5,129 +5,128 @@ WebArena Tester that properly waits for the full application load
 
 import os
 import sys
-import re
+import json
 import time
-import tempfile
-import importlib.util
-import traceback
-from typing import Any, Dict, List, Optional, Callable
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
+import uuid
+from collections.abc import Mapping
+from typing import Any, Dict, List, Optional, Callable, Union
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import requests
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+
+from browser_pool import get_pool
+from async_engine import (
+    get_engine, AsyncActivityMonitor, BROWSER_ENGINE,
+    wait_for_page_ready as wait_for_page_ready_async, wait_for_settle as wait_for_settle_async,
+)
+from scheduler import get_scheduler, QueueFull
+from batches import get_batches, BATCH_MAX_EVALUATIONS
+from trials import get_trials, TRIALS_MAX
+from agent_registry import get_registry, agent_hash, AgentValidationError
+from agent_workers import open_agent_session, get_worker_pool, AgentError, AGENT_EXECUTION
+from callback_outbox import get_outbox
+from events import get_event_bus, format_sse
+from metrics import (
+    PhaseTimer, render_latest, EVALUATIONS, EVALUATION_SECONDS, EVALUATIONS_REJECTED, AGENT_ACTIONS,
+    ACTIONS_REJECTED, QUEUE_DEPTH, RUNNING_EVALUATIONS, ACTIVE_BROWSERS, READY_BROWSERS, CALLBACKS_PENDING,
+)
+from readiness import PageActivityMonitor, wait_for_page_ready, wait_for_settle, READY_TIMEOUT
+from observation import LazyObservation, run_action
+from action_validation import validate_action
+from criteria import compile_criteria, CriteriaError, CRITERIA_EVERY_ACTION
+from network_archive import NetworkArchive, NetworkArchiveError, NETWORK_MODES, archive_sizes, has_archive
+from snapshots import get_snapshots, snapshot_key
+from routing import RequestRouter, RoutingPolicyError, parse_policy
+from eval_trace import TraceWriter, open_trace
+from obs_diff import ObservationTracker, split_pseudo_actions, OBSERVATION_MODES
+from service_log import get_logger, evaluation_logger, dump_observation, shutdown_logging
 
 # Add WebArena to path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'webarena'))
 
-# Terminal colors for better readability
-RESET = "\033[0m"
-RED = "\033[31m"
-GREEN = "\033[32m"
-YELLOW = "\033[33m"
-BLUE = "\033[34m"
-MAGENTA = "\033[35m"
-CYAN = "\033[36m"
-
-def color_text(text, color):
-    """Add color to terminal text."""
-    return f"{color}{text}{RESET}"
-
-def print_observation(obs, max_lines=1000):
-    """Print formatted observation for debugging."""
-    print(color_text("\n=== PAGE OBSERVATION ===", CYAN))
-    if isinstance(obs, dict) and "text" in obs:
-        text = obs["text"]
-        lines = text.split('\n')
-        total_lines = len(lines)
-        
-        # Print the first part
-        for i, line in enumerate(lines[:max_lines]):
-            # Highlight element IDs
-            highlighted = re.sub(r'\[(\d+)\]', color_text(r'[\1]', GREEN), line)
-            print(f"{i+1:3d}: {highlighted}")
-        
-        # If observation is longer, print a summary
-        if total_lines > max_lines:
-            print(color_text(f"... ({total_lines - max_lines} more lines) ...", YELLOW))
-    else:
-        print(obs)
-    print(color_text("=======================\n", CYAN))
+log = get_logger("service")
 
-def wait_for_full_application_load(env, timeout=60):
-    """
-    Wait for the application to fully load by checking for the loading indicator
-    and waiting for it to disappear.
-    """
-    from browser_env import create_id_based_action, create_playwright_action
-    
-    print(color_text(f"Waiting up to {timeout} seconds for full application load...", BLUE))
-    start_time = time.time()
-    check_interval = 1  # seconds between checks
-    
-    while time.time() - start_time < timeout:
-        # Get current observation
-        try:
-            # Try using a "noop" action to refresh the observation
-            try:
-                action = create_playwright_action('page.evaluate("window.scrollBy(0, 0)")')
-                obs, _, _, _, _ = env.step(action)
-            except Exception:
-                # If that fails, try a minimal click that shouldn't do anything
-                try:
-                    action = create_id_based_action("click [6]")  # Root WebArea
-                    obs, _, _, _, _ = env.step(action)
-                except:
-                    # Last resort - wait and use whatever observation we have
-                    pass
-            
-            text_obs = obs.get("text", "")
-            
-            # Check for loading indicators
-            loading_indicators = [
-                "Loading application",
-                "progressbar",
-                "loading",
-                "please wait"
-            ]
-            
-            if any(indicator.lower() in text_obs.lower() for indicator in loading_indicators):
-                elapsed = time.time() - start_time
-                print(color_text(f"Still loading ({elapsed:.1f}s elapsed)...", YELLOW))
-                time.sleep(check_interval)
-                continue
-            
-            # Check if we have substantial content (more than just loading elements)
-            if len(text_obs.split('\n')) > 15:  # Arbitrary threshold for "substantial content"
-                elapsed = time.time() - start_time
-                print(color_text(f"Application appears fully loaded after {elapsed:.1f}s", GREEN))
-                print_observation(obs)
-                return obs
-            
-            print(color_text("Waiting for more content...", YELLOW))
-            time.sleep(check_interval)
-            
-        except Exception as e:
-            print(color_text(f"Error checking load status: {e}", RED))
-            time.sleep(check_interval)
-    
-    print(color_text(f"Warning: Timeout after {timeout}s waiting for full load", RED))
-    return obs
+MAX_STEPS = 25
+
+# Evaluation ids name trace and log files, so they are restricted to safe characters
+EVALUATION_ID_PATTERN = r"^[A-Za-z0-9_-]{1,128}$"
 
 class EvaluationRequest(BaseModel):
-    evaluation_id: str
+    evaluation_id: str = Field(pattern=EVALUATION_ID_PATTERN)
     agent_code: str
     challenge_url: str
     success_criteria: str
     callback_url: str
+    ready_selectors: Optional[List[str]] = None
+    observation_mode: Optional[str] = "full"
+    network_mode: Optional[str] = "live"
+    use_snapshot: bool = False
+    challenge_version: Optional[str] = None
+    routing_policy: Optional[Dict] = None
+    trials: int = 1
 
 class EvaluationResponse(BaseModel):
     evaluation_id: str
     status: str
-    score: Optional[int] = None
+    # The mean score of a multi-trial evaluation isn't a whole number
+    score: Optional[Union[int, float]] = None
     steps_taken: Optional[int] = None
     result: Optional[Dict] = None
     message: Optional[str] = None
     logs: Optional[List[str]] = None
+    queue_position: Optional[int] = None
+    queue_depth: Optional[int] = None
+    load_time: Optional[float] = None
+    step_timings: Optional[List[Dict]] = None
+    agent_load_time: Optional[float] = None
+    phase_timings: Optional[Dict[str, float]] = None
+    snapshot: Optional[str] = None
+    routing: Optional[Dict] = None
+    trace: Optional[str] = None
+    trials: Optional[Dict] = None
+
+class BatchAgent(BaseModel):
+    agent_code: str
+    observation_mode: Optional[str] = "full"
+
+class BatchChallenge(BaseModel):
+    challenge_url: str
+    success_criteria: str
+    ready_selectors: Optional[List[str]] = None
+    network_mode: Optional[str] = "live"
+    use_snapshot: bool = False
+    challenge_version: Optional[str] = None
+    routing_policy: Optional[Dict] = None
+
+class BatchEvaluation(BaseModel):
+    evaluation_id: str = Field(pattern=EVALUATION_ID_PATTERN)
+    agent_id: str
+    challenge_id: str
+    callback_url: str
+
+class BatchEvaluationRequest(BaseModel):
+    batch_id: Optional[str] = None
+    # Each agent and challenge is sent once, however many evaluations use it
+    agents: Dict[str, BatchAgent]
+    challenges: Dict[str, BatchChallenge]
+    evaluations: List[BatchEvaluation]
+
+class BatchEvaluationResponse(BaseModel):
+    batch_id: str
+    status: str
+    total: int
+    message: Optional[str] = None
+    queue_position: Optional[int] = None
+    queue_depth: Optional[int] = None
+
+class AgentValidationRequest(BaseModel):
+    agent_code: str
+
+class AgentValidationResponse(BaseModel):
+    agent_hash: str
+    valid: bool
+    error: Optional[str] = None
 
 def init_webarena_env(headless=True):
     from browser_env import ScriptBrowserEnv
@@ -138,26 +137,8 @@ def init_webarena_env(headless=True):
         viewport_size={"width": 1280, "height": 720},
     )
 
-def load_agent_function(agent_code: str):
-    with tempfile.NamedTemporaryFile(suffix='.py', delete=False) as f:
-        f.write(agent_code.encode('utf-8'))
-        temp_module_path = f.name
-    
-    spec = importlib.util.spec_from_file_location("agent_module", temp_module_path)
-    agent_module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(agent_module)
-    
-    if not hasattr(agent_module, 'agent_logic'):
-        raise ValueError("Agent code must contain an 'agent_logic' function")
-    
-    os.unlink(temp_module_path)
-    return agent_module.agent_logic
-
-def successful(obs, success_criteria):
-    return success_criteria in obs.get('text', '')
-
 def callback(callback_url: str, response: EvaluationResponse):
-    print(color_text(f"Callback received: {response}", BLUE))
+    """Queue the result for delivery to the backend; never waits on the backend."""
     try:
         response_dict = response.model_dump()
         
@@ -169,16 +150,181 @@ def callback(callback_url: str, response: EvaluationResponse):
             # Option 2: Remove the image
             del response_dict['result']['image']
             
-        print(color_text(f"Sending callback to {callback_url}: {response_dict}", BLUE))
-        response = requests.post(callback_url, json=response_dict)
-    except Exception as e:
-        print(color_text(f"Error sending callback: {e}", RED))
+        log.info("Queueing callback", extra={
+            "evaluation_id": response.evaluation_id,
+            "callback_url": callback_url,
+            "status": response.status,
+        })
+        get_outbox().enqueue(callback_url, response_dict)
+    except Exception:
+        log.exception("Error queueing callback", extra={"evaluation_id": response.evaluation_id})
         return
 
+def summarize_observation(obs, url):
+    """Small summary of an observation for progress events."""
+    text = obs.get("text", "") if isinstance(obs, Mapping) else str(obs)
+    return {
+        "url": url,
+        "lines": text.count("\n") + 1 if text else 0,
+        "chars": len(text),
+    }
+
+def finish_evaluation(request: EvaluationRequest, response: EvaluationResponse, timer: PhaseTimer,
+                      router: Optional[RequestRouter] = None, trace: Optional[TraceWriter] = None):
+    """Announce the end of an evaluation and report its result to the backend."""
+    response.phase_timings = timer.as_dict()
+    if router is not None:
+        response.routing = router.report()
+    if trace is not None:
+        response.trace = trace.name
+        trace.finish(response)
+    EVALUATIONS.labels(status=response.status).inc()
+    get_batches().finished(request.evaluation_id, response.status, response.score, response.steps_taken)
+    EVALUATION_SECONDS.labels(status=response.status).observe(timer.elapsed())
+    finished = {
+        "status": response.status,
+        "score": response.score,
+        "steps_taken": response.steps_taken,
+        "message": response.message,
+    }
+    # A trial reports to its evaluation, which calls back once all its trials are done
+    if get_trials().record(request.evaluation_id, response, timer.elapsed()) is None:
+        with timer.phase("callback"):
+            callback(request.callback_url, response)
+    # Only once the result is on its way to the backend, so a subscriber reloading
+    # the evaluation on "finished" doesn't race its callback as much
+    get_event_bus().publish(request.evaluation_id, "finished", finished)
+
+def finish_trials(request: EvaluationRequest, trial_set):
+    """Report a multi-trial evaluation once its last trial has finished."""
+    summary = trial_set.summary()
+    runs = [trial_set.results[trial][0] for trial in sorted(trial_set.results)]
+    # Result and actions of the first successful trial, if any
+    shown = next((run for run in runs if run.status == "completed"), runs[0])
+    steps = summary["steps_taken"]
+    response = EvaluationResponse(
+        evaluation_id=request.evaluation_id,
+        status="completed" if summary["completed"] else "failed",
+        score=summary["mean_score"],
+        steps_taken=round(steps["p50"]) if steps else 0,
+        result=shown.result,
+        logs=shown.logs,
+        message=f"{summary['completed']}/{summary['trials']} trials succeeded",
+        trials=summary,
+    )
+    callback(request.callback_url, response)
+    get_event_bus().publish(request.evaluation_id, "finished", {
+        "status": response.status,
+        "score": response.score,
+        "steps_taken": response.steps_taken,
+        "message": response.message,
+        "success_rate": summary["success_rate"],
+    })
+
+def runs_on_async_engine(request: EvaluationRequest):
+    """Whether the async engine supports everything the evaluation uses."""
+    return (request.network_mode or "live") == "live" and not request.use_snapshot
+
+def evaluate_on_engine(request: EvaluationRequest):
+    """Run an evaluation on the configured browser engine."""
+    if BROWSER_ENGINE == "async" and runs_on_async_engine(request):
+        return evaluate_async(request)
+    return test_interactive_elements(request)
+
+def run_batch_evaluation(request: EvaluationRequest):
+    """Run one evaluation of a batch, keeping the batch's progress up to date."""
+    batches = get_batches()
+    batches.started(request.evaluation_id)
+    try:
+        evaluate_on_engine(request)
+    finally:
+        # Only takes effect if the evaluation ended without reporting a result
+        batches.finished(request.evaluation_id, "failed")
+
+def run_trial(request: EvaluationRequest):
+    """Run one trial of a multi-trial evaluation."""
+    started = time.perf_counter()
+    try:
+        evaluate_on_engine(request)
+    finally:
+        # Only takes effect if the trial ended without reporting a result
+        get_trials().record(request.evaluation_id, EvaluationResponse(
+            evaluation_id=request.evaluation_id,
+            status="failed",
+            score=0,
+            steps_taken=0,
+            message="Trial ended without a result",
+        ), time.perf_counter() - started)
+
+def snapshot_jobs(requests: List[EvaluationRequest], fn: Callable):
+    """Scheduler batch jobs running ``fn(request)``, and how many of them capture a snapshot.
+
+    Of the requests starting from a challenge snapshot that doesn't exist yet,
+    the first captures it and the challenge's others wait for it to finish.
+    """
+    leads, jobs, followers = {}, [], []
+    for eval_request in requests:
+        lead = None
+        if eval_request.use_snapshot:
+            key = snapshot_key(
+                eval_request.challenge_url, eval_request.success_criteria,
+                eval_request.ready_selectors, eval_request.challenge_version,
+            )
+            if key in leads:
+                lead = leads[key]
+            elif get_snapshots().get(key) is None:
+                leads[key] = eval_request.evaluation_id
+        job = (eval_request.evaluation_id, fn, (eval_request,), {}, lead)
+        (jobs if lead is None else followers).append(job)
+    return jobs + followers, len(leads)
+
+def submit_trials(eval_request: EvaluationRequest):
+    """Queue an evaluation's trials as one batch, raising ``QueueFull`` like ``submit``."""
+    trials = get_trials()
+    ids = trials.create(
+        eval_request.evaluation_id, eval_request.trials,
+        lambda trial_set: finish_trials(eval_request, trial_set),
+    )
+    trial_requests = [eval_request.model_copy(update={"evaluation_id": i, "trials": 1}) for i in ids]
+    jobs, _ = snapshot_jobs(trial_requests, run_trial)
+    try:
+        admission = get_scheduler().submit_batch(eval_request.evaluation_id, jobs)
+    except QueueFull:
+        trials.discard(eval_request.evaluation_id, eval_request.trials)
+        raise
+    # Each trial has its own events from the start
+    for trial_request in trial_requests:
+        get_event_bus().publish(trial_request.evaluation_id, "queued", {"trial_of": eval_request.evaluation_id})
+    return admission
+
 def test_interactive_elements(request: EvaluationRequest):
+    """Run an evaluation on the next free environment from the warm browser pool."""
+    return get_pool().run(run_with_network_mode, request, PhaseTimer())
+
+def evaluate_async(request: EvaluationRequest):
+    """Run an evaluation as a coroutine on the async engine."""
+    return get_engine().run(run_evaluation_async, request, PhaseTimer())
+
+def run_with_network_mode(env, request: EvaluationRequest, timer: PhaseTimer):
+    """Run the evaluation on live traffic, or record or replay it through a HAR archive."""
+    archive = NetworkArchive(request.network_mode or "live", request.challenge_url)
+    try:
+        archive.attach(env.context)
+    except NetworkArchiveError as e:
+        response = EvaluationResponse(
+            evaluation_id=request.evaluation_id, status="failed", score=0, steps_taken=0, message=str(e)
+        )
+        finish_evaluation(request, response, timer)
+        return
+    try:
+        run_evaluation(env, request, timer)
+    finally:
+        archive.finish(env)
+
+def run_evaluation(env, request: EvaluationRequest, timer: PhaseTimer):
     # Import WebArena components
-    from browser_env import ScriptBrowserEnv, create_id_based_action, create_playwright_action
-    print(color_text("Successfully imported WebArena components", GREEN))
+    from browser_env import create_id_based_action
+    elog = evaluation_logger("evaluation", request.evaluation_id)
 
     response = EvaluationResponse(
         evaluation_id=request.evaluation_id,
@@ -187,90 +333,450 @@ def test_interactive_elements(request: EvaluationRequest):
         steps_taken=0,
         result=None,
         logs=[],
+        step_timings=[],
         )
+    # Time spent waiting for a free browser
+    timer.record("browser_checkout", timer.elapsed())
     
-    # Initialize environment
-    print(color_text("Initializing WebArena environment...", BLUE))
-    env = ScriptBrowserEnv(
-        headless=False,  # Make browser visible for debugging
-        slow_mo=300,     # Slow down for visibility
-        observation_type="accessibility_tree",
-        current_viewport_only=True,
-        viewport_size={"width": 1280, "height": 720},
-    )
-    print(color_text("Environment initialized", GREEN))
-    
-    # First reset without URL
-    obs, info = env.reset()
+    events = get_event_bus()
+    events.publish(request.evaluation_id, "started", {
+        "challenge_url": request.challenge_url,
+        "network_mode": request.network_mode,
+    })
+    trace = open_trace(request.evaluation_id)
+    trace.start(request)
 
-    print(color_text(f"Navigating to {request.challenge_url} using id_based_action", BLUE))
-    try:
-        obs, reward, terminated, truncated, info = env.step(
-            create_id_based_action(f"goto [{request.challenge_url}]")
+    # The pooled env is already reset onto a clean browser context; watch it
+    # for network and DOM activity before navigating
+    monitor = PageActivityMonitor(env.context)
+
+    # Installed after any HAR routes so blocked requests never reach the archive
+    router = None
+    policy = parse_policy(request.routing_policy)
+    if policy is not None:
+        router = RequestRouter(policy, archive_sizes(request.challenge_url))
+        router.attach(env.context)
+
+    # Start from the challenge's snapshot, if it has one, instead of its entry URL
+    start_url = request.challenge_url
+    snapshot = None
+    if request.use_snapshot:
+        key = snapshot_key(
+            request.challenge_url, request.success_criteria, request.ready_selectors, request.challenge_version
         )
-        print(color_text("Navigation initiated successfully", GREEN))
+        snapshot = get_snapshots().get(key, restoring=True)
+        if snapshot is not None:
+            with timer.phase("snapshot_restore"):
+                snapshot.apply(env.context)
+            start_url = snapshot.url
+            response.snapshot = "restored"
+
+    elog.info("Navigating", extra={"url": start_url, "snapshot": response.snapshot})
+    try:
+        with timer.phase("goto"):
+            _, navigated, error = run_action(
+                env, create_id_based_action(f"goto [{start_url}]")
+            )
+        if not navigated:
+            elog.warning("Navigation failed", extra={"error": error})
     except Exception as e:
-        print(color_text(f"Error during navigation: {e}", RED))
-        print(traceback.format_exc())
-        env.close()
+        elog.exception("Error during navigation")
+        response.message = f"Error during navigation: {e}"
+        finish_evaluation(request, response, timer, router, trace)
         return
-    
+
     # Wait for full application load
-    obs = wait_for_full_application_load(env, timeout=60)
-    
-    # Try interacting with the page after it's loaded
-    print(color_text("\nTrying to identify interactable elements...", BLUE))
+    with timer.phase("readiness"):
+        readiness = wait_for_page_ready(
+            monitor, env.page, timeout=READY_TIMEOUT, ready_selectors=request.ready_selectors
+        )
+    response.load_time = readiness.load_time
+    if readiness.ready:
+        elog.info("Application loaded", extra={"load_time": readiness.load_time})
+        if request.use_snapshot and snapshot is None:
+            with timer.phase("snapshot_capture"):
+                get_snapshots().capture(key, env.context, env.page)
+            response.snapshot = "captured"
+    else:
+        elog.warning("Application not ready", extra={"reason": readiness.reason, "load_time": readiness.load_time})
+    obs = LazyObservation(env, timer)
+    dump_observation(elog, "initial observation", obs)
+    trace.observation(0, env.page.url, obs)
+    events.publish(request.evaluation_id, "loaded", {
+        "ready": readiness.ready,
+        "load_time": readiness.load_time,
+        **summarize_observation(obs, env.page.url),
+    })
 
-    agent_logic = load_agent_function(request.agent_code)
+    # Run the agent in an isolated worker process for the rest of the evaluation
+    try:
+        with timer.phase("agent_startup"):
+            agent = open_agent_session(get_registry().get(request.agent_code))
+        timer.record("agent_load", agent.load_time)
+        response.agent_load_time = agent.load_time
+        elog.info("Agent loaded", extra={"agent_load_time": agent.load_time})
+    except AgentError as e:
+        elog.warning("Error loading agent", extra={"error": str(e)})
+        response.message = f"Error loading agent: {e}"
+        finish_evaluation(request, response, timer, router, trace)
+        return
 
-    max_steps = 25
-    for step in range(max_steps):
-        print(color_text(f"\n--- Step {step+1}/{max_steps} ---", MAGENTA))
+    # Compiled (and validated) when the evaluation was admitted
+    criteria = compile_criteria(request.success_criteria)
 
-        print(color_text("Getting actions from agent...", BLUE))
-        try:
-            actions = agent_logic(obs['text'])
-            if not isinstance(actions, list):
-                print(color_text("Actions from agent are not a list", YELLOW))
-                actions = [actions]
-            else:
-                print(color_text(f"Actions from agent are a list of {len(actions)} actions", GREEN))
+    # Full trees, or diffs against the previous step in "diff" mode
+    tracker = ObservationTracker(request.observation_mode or "full")
+
+    # Actions rejected in the previous step, shown to the agent with its next observation
+    rejected = []
+
+    try:
+        max_steps = MAX_STEPS
+        for step in range(max_steps):
+            obs_text = tracker.render(obs, errors=rejected)
+            # Action element ids refer to the tree the agent is given
+            agent_tree = obs.tree
+            rejected = []
+            events.publish(request.evaluation_id, "step_started", {
+                "step": step + 1,
+                "max_steps": max_steps,
+                "observation_chars": len(obs_text),
+            })
+
+            try:
+                agent_started = time.perf_counter()
+                with timer.phase("agent_call"):
+                    actions = agent.call(obs_text)
+                if not isinstance(actions, list):
+                    actions = [actions]
+                trace.agent(step + 1, actions, time.perf_counter() - agent_started)
+                actions = split_pseudo_actions(actions, tracker)
+                elog.debug("Agent returned actions", extra={"step": step + 1, "actions": actions, "sample": True})
+
+                success = False
+                if actions and len(actions) > 0:
+                    for i, action in enumerate(actions):
+                        # Reject invalid actions without a browser round-trip
+                        rejection = validate_action(action, agent_tree)
+                        if rejection is None:
+                            try:
+                                action_command = create_id_based_action(action)
+                            except Exception as e:
+                                rejection = {"action": action, "code": "malformed", "error": str(e)}
+                        if rejection is not None:
+                            rejection["skipped"] = len(actions) - i - 1
+                            rejected.append(rejection)
+                            ACTIONS_REJECTED.labels(code=rejection["code"]).inc()
+                            events.publish(request.evaluation_id, "action_rejected", {"step": step + 1, **rejection})
+                            elog.warning("Action rejected", extra={"step": step + 1, **rejection})
+                            trace.rejected(step + 1, rejection)
+                            break
+
+                        response.logs.append(action)
+                        step_started = time.perf_counter()
+                        # The observation is only extracted if something reads it
+                        obs, succeeded, error = run_action(env, action_command, timer)
+                        step_time = time.perf_counter() - step_started
+                        timer.record("env_step", step_time)
+                        AGENT_ACTIONS.inc()
+                        if not succeeded:
+                            elog.warning("Action failed", extra={"step": step + 1, "action": action, "error": error})
+
+                        # Wait only as long as the page keeps changing
+                        settle = wait_for_settle(monitor, env.page)
+                        timer.record("settle", settle.settle_time)
+                        # An observation env.step already extracted predates the settle wait
+                        if settle.changed and obs.materialized:
+                            obs = LazyObservation(env, timer)
+                        trace.action(step + 1, action, succeeded, error, env.page.url, step_time, settle.settle_time)
+                        response.step_timings.append({
+                            "step": step + 1,
+                            "action": action,
+                            "step_time": step_time,
+                            "settle_time": settle.settle_time,
+                        })
+                        events.publish(request.evaluation_id, "action_executed", {
+                            "step": step + 1,
+                            "action": action,
+                            "settle_time": settle.settle_time,
+                            "url": env.page.url,
+                        })
+                        elog.info("Action executed", extra={
+                            "step": step + 1,
+                            "action": action,
+                            "step_time": step_time,
+                            "settle_time": settle.settle_time,
+                            "sample": True,
+                        })
+
+                        # Stop the batch as soon as the criteria are met; URL-only
+                        # criteria never need the tree, so they are always checked
+                        if i < len(actions) - 1 and (CRITERIA_EVERY_ACTION or not criteria.needs_tree):
+                            if criteria.needs_tree:
+                                obs.materialize()
+                            with timer.phase("criteria"):
+                                success = criteria.matches(env.page.url, obs)
+                            if success:
+                                elog.info("Success criteria met mid-batch", extra={
+                                    "step": step + 1,
+                                    "skipped_actions": len(actions) - i - 1,
+                                })
+                                break
+                else:
+                    elog.info("No actions from agent", extra={"step": step + 1, "sample": True})
+
+                # Extract the tree outside the criteria timing
+                obs.materialize()
+                dump_observation(elog, f"step {step + 1} observation", obs)
+                trace.observation(step + 1, env.page.url, obs)
+                if not success:
+                    with timer.phase("criteria"):
+                        success = criteria.matches(env.page.url, obs)
+                events.publish(request.evaluation_id, "observation", {
+                    "step": step + 1,
+                    "success": success,
+                    **summarize_observation(obs, env.page.url),
+                })
+
+                if success:
+                    response.status = "completed"
+                    response.score = 100
+                    response.steps_taken = step + 1
+                    response.result = obs.to_dict()
+                    break
+
+            except AgentError as e:
+                elog.warning("Error executing agent", extra={"step": step + 1, "error": str(e)})
+                response.message = f"Error executing agent: {e}"
+                break
+            except Exception as e:
+                elog.exception("Error executing agent", extra={"step": step + 1})
+                response.message = f"Error executing agent: {e}"
+                break
+    finally:
+        agent.close()
+
+    finish_evaluation(request, response, timer, router, trace)
+    elog.info("Evaluation finished", extra={
+        "status": response.status,
+        "score": response.score,
+        "steps_taken": response.steps_taken,
+        "duration": timer.elapsed(),
+    })
+    return None
+
+async def observe_async(session, timer: PhaseTimer) -> LazyObservation:
+    """Observe the page and parse its tree on the engine's threads, so ``obs.tree`` is free afterwards."""
+    obs = LazyObservation.of(await session.observe(timer), timer)
+    await session.blocking(lambda: obs.tree)
+    return obs
+
+async def run_evaluation_async(session, request: EvaluationRequest, timer: PhaseTimer):
+    """``run_evaluation`` on an ``AsyncSession``; blocking calls go to the engine's threads."""
+    elog = evaluation_logger("evaluation", request.evaluation_id)
+    response = EvaluationResponse(
+        evaluation_id=request.evaluation_id,
+        status="failed",
+        score=0,
+        steps_taken=0,
+        result=None,
+        logs=[],
+        step_timings=[],
+    )
+    timer.record("browser_checkout", timer.elapsed())
+
+    events = get_event_bus()
+    events.publish(request.evaluation_id, "started", {
+        "challenge_url": request.challenge_url,
+        "network_mode": request.network_mode,
+    })
+    trace = open_trace(request.evaluation_id)
+    trace.start(request, engine="async")
+
+    router = None
+    policy = parse_policy(request.routing_policy)
+    # Like the sync engine, a challenge that fails to load still finishes the evaluation
+    try:
+        monitor = AsyncActivityMonitor(session.context)
+        await monitor.install()
+        if policy is not None:
+            router = RequestRouter(policy, await session.blocking(archive_sizes, request.challenge_url))
+            await router.attach(session.context)
+
+        elog.info("Navigating", extra={"url": request.challenge_url, "engine": "async"})
+        with timer.phase("goto"):
+            navigated, error = await session.execute(f"goto [{request.challenge_url}]")
+        if not navigated:
+            elog.warning("Navigation failed", extra={"error": error})
+
+        with timer.phase("readiness"):
+            readiness = await wait_for_page_ready_async(
+                monitor, session.page, timeout=READY_TIMEOUT, ready_selectors=request.ready_selectors
+            )
+        response.load_time = readiness.load_time
+        if readiness.ready:
+            elog.info("Application loaded", extra={"load_time": readiness.load_time})
+        else:
+            elog.warning("Application not ready", extra={"reason": readiness.reason, "load_time": readiness.load_time})
+        obs = await observe_async(session, timer)
+    except Exception as e:
+        elog.exception("Error during navigation")
+        response.message = f"Error during navigation: {e}"
+        await session.blocking(finish_evaluation, request, response, timer, router, trace)
+        return
+    dump_observation(elog, "initial observation", obs)
+    await session.blocking(trace.observation, 0, session.page.url, obs)
+    events.publish(request.evaluation_id, "loaded", {
+        "ready": readiness.ready,
+        "load_time": readiness.load_time,
+        **summarize_observation(obs, session.page.url),
+    })
+
+    try:
+        with timer.phase("agent_startup"):
+            agent = await session.blocking(
+                lambda: open_agent_session(get_registry().get(request.agent_code))
+            )
+        timer.record("agent_load", agent.load_time)
+        response.agent_load_time = agent.load_time
+        elog.info("Agent loaded", extra={"agent_load_time": agent.load_time})
+    except AgentError as e:
+        elog.warning("Error loading agent", extra={"error": str(e)})
+        response.message = f"Error loading agent: {e}"
+        await session.blocking(finish_evaluation, request, response, timer, router, trace)
+        return
+
+    criteria = compile_criteria(request.success_criteria)
+    tracker = ObservationTracker(request.observation_mode or "full")
+    rejected = []
+
+    async def check_criteria(obs):
+        with timer.phase("criteria"):
+            if not criteria.needs_tree:
+                return criteria.matches(session.page.url, obs)
+            return await session.blocking(criteria.matches, session.page.url, obs)
+
+    try:
+        for step in range(MAX_STEPS):
+            try:
+                # Diffing trees is CPU work; the tree itself was parsed by observe_async
+                obs_text = await session.blocking(tracker.render, obs, rejected)
+                agent_tree = obs.tree
+                rejected = []
+                events.publish(request.evaluation_id, "step_started", {
+                    "step": step + 1,
+                    "max_steps": MAX_STEPS,
+                    "observation_chars": len(obs_text),
+                })
+
+                agent_started = time.perf_counter()
+                with timer.phase("agent_call"):
+                    actions = await session.blocking(agent.call, obs_text)
+                if not isinstance(actions, list):
+                    actions = [actions]
+                trace.agent(step + 1, actions, time.perf_counter() - agent_started)
+                actions = split_pseudo_actions(actions, tracker)
+                elog.debug("Agent returned actions", extra={"step": step + 1, "actions": actions, "sample": True})
+
+                success = False
+                # Observations are extracted eagerly here, so only when needed
+                fresh = True
                 for i, action in enumerate(actions):
-                    print(color_text(f"Action {i+1}/{len(actions)}: {action}", BLUE))
-            
-            if actions and len(actions) > 0:
-                for action in actions:
+                    rejection = validate_action(action, agent_tree)
+                    if rejection is not None:
+                        rejection["skipped"] = len(actions) - i - 1
+                        rejected.append(rejection)
+                        ACTIONS_REJECTED.labels(code=rejection["code"]).inc()
+                        events.publish(request.evaluation_id, "action_rejected", {"step": step + 1, **rejection})
+                        elog.warning("Action rejected", extra={"step": step + 1, **rejection})
+                        trace.rejected(step + 1, rejection)
+                        break
+
                     response.logs.append(action)
-                    action_command = create_id_based_action(action)
-                    print(color_text(f"Processing action: {action}", BLUE))
-                    obs, reward, terminated, truncated, info = env.step(action_command)
-                    print(color_text(f"✓ Action succeeded: {action}", GREEN))
-            else:
-                print(color_text("No actions from agent", YELLOW))
-            
-            print_observation(obs)
-
-            if successful(obs, request.success_criteria):
-                print(color_text("Success criteria met!", GREEN))
-                response.status = "completed"
-                response.score = 100
-                response.steps_taken = step + 1
-                response.result = obs
-                break
-            else:
-                print(color_text("Success criteria not met :(", RED))
+                    step_started = time.perf_counter()
+                    succeeded, error = await session.execute(action)
+                    step_time = time.perf_counter() - step_started
+                    timer.record("env_step", step_time)
+                    AGENT_ACTIONS.inc()
+                    if not succeeded:
+                        elog.warning("Action failed", extra={"step": step + 1, "action": action, "error": error})
 
-            time.sleep(1)
+                    settle = await wait_for_settle_async(monitor, session.page)
+                    timer.record("settle", settle.settle_time)
+                    fresh = False
+                    trace.action(step + 1, action, succeeded, error, session.page.url, step_time, settle.settle_time)
+                    response.step_timings.append({
+                        "step": step + 1,
+                        "action": action,
+                        "step_time": step_time,
+                        "settle_time": settle.settle_time,
+                    })
+                    events.publish(request.evaluation_id, "action_executed", {
+                        "step": step + 1,
+                        "action": action,
+                        "settle_time": settle.settle_time,
+                        "url": session.page.url,
+                    })
+                    elog.info("Action executed", extra={
+                        "step": step + 1,
+                        "action": action,
+                        "step_time": step_time,
+                        "settle_time": settle.settle_time,
+                        "sample": True,
+                    })
 
-        except Exception as e:
-            print(color_text(f"Error executing agent: {str(e)}", RED))
-            print(color_text(traceback.format_exc(), RED))
-            break
+                    if i < len(actions) - 1 and (CRITERIA_EVERY_ACTION or not criteria.needs_tree):
+                        if criteria.needs_tree:
+                            obs = await observe_async(session, timer)
+                            fresh = True
+                        success = await check_criteria(obs)
+                        if success:
+                            elog.info("Success criteria met mid-batch", extra={
+                                "step": step + 1,
+                                "skipped_actions": len(actions) - i - 1,
+                            })
+                            break
+                if not actions:
+                    elog.info("No actions from agent", extra={"step": step + 1, "sample": True})
 
-    callback(request.callback_url, response)
-    env.close()
-    print(color_text("Test complete", GREEN))
-    return None
+                if not fresh:
+                    obs = await observe_async(session, timer)
+                dump_observation(elog, f"step {step + 1} observation", obs)
+                await session.blocking(trace.observation, step + 1, session.page.url, obs)
+                if not success:
+                    success = await check_criteria(obs)
+                events.publish(request.evaluation_id, "observation", {
+                    "step": step + 1,
+                    "success": success,
+                    **summarize_observation(obs, session.page.url),
+                })
+
+                if success:
+                    response.status = "completed"
+                    response.score = 100
+                    response.steps_taken = step + 1
+                    response.result = obs.to_dict()
+                    break
+
+            except AgentError as e:
+                elog.warning("Error executing agent", extra={"step": step + 1, "error": str(e)})
+                response.message = f"Error executing agent: {e}"
+                break
+            except Exception as e:
+                elog.exception("Error executing agent", extra={"step": step + 1})
+                response.message = f"Error executing agent: {e}"
+                break
+    finally:
+        await session.blocking(agent.close)
+
+    await session.blocking(finish_evaluation, request, response, timer, router, trace)
+    elog.info("Evaluation finished", extra={
+        "status": response.status,
+        "score": response.score,
+        "steps_taken": response.steps_taken,
+        "duration": timer.elapsed(),
+        "engine": "async",
+    })
 
 # FastAPI setup
 app = FastAPI(title="WebArena Evaluation Service")
@@ -282,31 +788,88 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def start_browser_pool():
+    """Launch the warm browser pool so the first evaluation doesn't pay for it."""
+    # The sync pool still starts on demand for evaluations the async engine doesn't support
+    browsers = get_engine() if BROWSER_ENGINE == "async" else get_pool()
+    browsers.start()
+    get_scheduler().start()
+    get_outbox().start()
+    QUEUE_DEPTH.set_function(lambda: get_scheduler().stats()["queued"])
+    RUNNING_EVALUATIONS.set_function(lambda: get_scheduler().stats()["running"])
+    ACTIVE_BROWSERS.set_function(lambda: browsers.stats()["active"])
+    READY_BROWSERS.set_function(lambda: browsers.stats()["ready"])
+    CALLBACKS_PENDING.set_function(lambda: get_outbox().stats()["pending"])
+    if AGENT_EXECUTION == "process":
+        get_worker_pool().start()
+
+@app.on_event("shutdown")
+def stop_browser_pool():
+    get_scheduler().shutdown()
+    get_pool().shutdown()
+    get_engine().shutdown()
+    get_outbox().stop()
+    if AGENT_EXECUTION == "process":
+        get_worker_pool().shutdown()
+    shutdown_logging()
+
+def check_challenge(eval_request):
+    """Reject a request whose challenge settings can't be run, with a 400."""
+    if eval_request.network_mode not in NETWORK_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"network_mode must be one of: {', '.join(NETWORK_MODES)}",
+        )
+    if eval_request.network_mode == "replay" and not has_archive(eval_request.challenge_url):
+        raise HTTPException(
+            status_code=400,
+            detail=f"No recorded archive for {eval_request.challenge_url}; run it with network_mode \"record\" first",
+        )
+
+    try:
+        parse_policy(eval_request.routing_policy)
+    except RoutingPolicyError as e:
+        EVALUATIONS_REJECTED.labels(reason="invalid_routing_policy").inc()
+        raise HTTPException(status_code=400, detail=f"Invalid routing policy: {e}")
+
+    try:
+        compile_criteria(eval_request.success_criteria)
+    except CriteriaError as e:
+        EVALUATIONS_REJECTED.labels(reason="invalid_criteria").inc()
+        raise HTTPException(status_code=400, detail=f"Invalid success criteria: {e}")
+
+def check_agent(eval_request):
+    """Reject a request whose agent can't be run, with a 400; compiles and caches the agent."""
+    if eval_request.observation_mode not in OBSERVATION_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"observation_mode must be one of: {', '.join(OBSERVATION_MODES)}",
+        )
+
+    # Reject broken agents before a browser is allocated
+    try:
+        get_registry().get(eval_request.agent_code)
+    except AgentValidationError as e:
+        EVALUATIONS_REJECTED.labels(reason="invalid_agent").inc()
+        raise HTTPException(status_code=400, detail=f"Invalid agent code: {e}")
+
 @app.post("/api/evaluate")
-async def evaluate(request: Request, background_tasks: BackgroundTasks):
-    # Debug the raw request
-    print(color_text("\n=== DEBUG: RECEIVED REQUEST ===", RED))
+async def evaluate(request: Request):
     body = await request.body()
-    print(f"Raw request body (first 100 chars): {body[:100]}")
-    
+
     try:
-        # Try to decode and pretty print for debugging
         text_body = body.decode('utf-8')
-        print(f"Body length: {len(text_body)} characters")
-        print(f"First 100 chars: {text_body[:100]}")
-        print(f"Characters around position 78: {text_body[70:90]}")
-        
-        # Try to parse as JSON
-        import json
         try:
             data = json.loads(text_body)
-            print("JSON parsing successful")
         except json.JSONDecodeError as e:
-            print(f"JSON decode error: {e}")
-            # Print the problematic section
+            # Log the problematic section
             error_pos = e.pos
-            print(f"Error at position {error_pos}")
-            print(f"Characters around error: {text_body[max(0, error_pos-10):min(len(text_body), error_pos+10)]}")
+            log.warning("Invalid JSON in evaluation request", extra={
+                "error": str(e),
+                "body_length": len(text_body),
+                "context": text_body[max(0, error_pos-10):min(len(text_body), error_pos+10)],
+            })
             raise HTTPException(status_code=400, detail=f"Invalid JSON: {str(e)}")
         
         # Parse the request data
@@ -315,34 +878,234 @@ async def evaluate(request: Request, background_tasks: BackgroundTasks):
             agent_code=data["agent_code"],
             challenge_url=data["challenge_url"],
             success_criteria=data["success_criteria"],
-            callback_url=data["callback_url"]
+            callback_url=data["callback_url"],
+            ready_selectors=data.get("ready_selectors"),
+            observation_mode=data.get("observation_mode") or "full",
+            network_mode=data.get("network_mode") or "live",
+            use_snapshot=bool(data.get("use_snapshot")),
+            challenge_version=data.get("challenge_version"),
+            routing_policy=data.get("routing_policy"),
+            trials=data.get("trials") or 1,
         )
+        check_challenge(eval_request)
+        check_agent(eval_request)
+        max_trials = min(TRIALS_MAX, get_scheduler().max_queue)
+        if not 1 <= eval_request.trials <= max_trials:
+            raise HTTPException(status_code=400, detail=f"trials must be between 1 and {max_trials}")
+        
+        # Queue the evaluation, rejecting it if the scheduler is saturated
+        try:
+            if eval_request.trials > 1:
+                admission = submit_trials(eval_request)
+            else:
+                admission = get_scheduler().submit(
+                    eval_request.evaluation_id, evaluate_on_engine, eval_request
+                )
+        except QueueFull as e:
+            EVALUATIONS_REJECTED.labels(reason="queue_full").inc()
+            log.warning("Rejecting evaluation, queue full", extra={
+                "evaluation_id": eval_request.evaluation_id,
+                "queue_depth": e.depth,
+                "retry_after": e.retry_after,
+            })
+            raise HTTPException(
+                status_code=429,
+                detail=str(e),
+                headers={"Retry-After": str(e.retry_after)},
+            )
         
-        # Start the evaluation in the background
-        background_tasks.add_task(test_interactive_elements, eval_request)
+        get_event_bus().publish(eval_request.evaluation_id, "queued", {
+            "queue_position": admission.position,
+            "queue_depth": admission.depth,
+        })
         
         # Return a success response
         return EvaluationResponse(
             evaluation_id=eval_request.evaluation_id,
-            status="running",
-            message="Evaluation started successfully"
+            status="running" if admission.started else "queued",
+            message="Evaluation started successfully" if admission.started else "Evaluation queued",
+            queue_position=admission.position,
+            queue_depth=admission.depth,
         )
     
+    except HTTPException:
+        raise
+    
+    except ValidationError as e:
+        error = e.errors()[0]
+        field = ".".join(str(part) for part in error["loc"])
+        log.warning("Invalid evaluation request", extra={"field": field, "error": error["msg"]})
+        raise HTTPException(status_code=400, detail=f"Invalid {field}: {error['msg']}")
+
     except KeyError as e:
         # Missing required field
-        print(f"Missing required field: {e}")
+        log.warning("Missing required field", extra={"field": str(e)})
         raise HTTPException(status_code=400, detail=f"Missing required field: {str(e)}")
-    
+
     except Exception as e:
         # Unexpected error
-        print(f"Unexpected error: {e}")
-        print(traceback.format_exc())
+        log.exception("Unexpected error handling evaluation request")
         raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
 
+@app.post("/api/evaluate/batch", response_model=BatchEvaluationResponse)
+def evaluate_batch(batch: BatchEvaluationRequest):
+    """Queue a matrix of agents x challenges as one unit of the scheduler."""
+    if not batch.evaluations:
+        raise HTTPException(status_code=400, detail="A batch needs at least one evaluation")
+    # A batch bigger than the whole queue could never be admitted
+    max_evaluations = min(BATCH_MAX_EVALUATIONS, get_scheduler().max_queue)
+    if len(batch.evaluations) > max_evaluations:
+        EVALUATIONS_REJECTED.labels(reason="batch_too_large").inc()
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch may contain at most {max_evaluations} evaluations",
+        )
+    evaluation_ids = [e.evaluation_id for e in batch.evaluations]
+    if len(set(evaluation_ids)) != len(evaluation_ids):
+        raise HTTPException(status_code=400, detail="Duplicate evaluation_id in batch")
+    batch_id = batch.batch_id or uuid.uuid4().hex
+    if get_batches().get(batch_id) is not None:
+        raise HTTPException(status_code=409, detail=f"Batch {batch_id} already exists")
+
+    requests = []
+    for evaluation in batch.evaluations:
+        agent = batch.agents.get(evaluation.agent_id)
+        challenge = batch.challenges.get(evaluation.challenge_id)
+        if agent is None or challenge is None:
+            missing = "agent" if agent is None else "challenge"
+            raise HTTPException(
+                status_code=400,
+                detail=f"Evaluation {evaluation.evaluation_id} refers to unknown {missing} "
+                       f"{evaluation.agent_id if agent is None else evaluation.challenge_id}",
+            )
+        requests.append(EvaluationRequest(
+            evaluation_id=evaluation.evaluation_id,
+            agent_code=agent.agent_code,
+            challenge_url=challenge.challenge_url,
+            success_criteria=challenge.success_criteria,
+            callback_url=evaluation.callback_url,
+            ready_selectors=challenge.ready_selectors,
+            observation_mode=agent.observation_mode or "full",
+            network_mode=challenge.network_mode or "live",
+            use_snapshot=challenge.use_snapshot,
+            challenge_version=challenge.challenge_version,
+            routing_policy=challenge.routing_policy,
+        ))
+
+    # Every agent is compiled and every challenge checked once for the whole batch
+    checked_agents, checked_challenges = set(), set()
+    for evaluation, eval_request in zip(batch.evaluations, requests):
+        try:
+            if evaluation.challenge_id not in checked_challenges:
+                checked_challenges.add(evaluation.challenge_id)
+                check_challenge(eval_request)
+            if evaluation.agent_id not in checked_agents:
+                checked_agents.add(evaluation.agent_id)
+                check_agent(eval_request)
+        except HTTPException as e:
+            raise HTTPException(status_code=e.status_code, detail=f"{evaluation.evaluation_id}: {e.detail}")
+
+    # Evaluations restoring a snapshot another one of the batch captures wait for it
+    jobs, captures = snapshot_jobs(requests, run_batch_evaluation)
+
+    get_batches().create(batch_id, [e.model_dump() for e in batch.evaluations])
+    try:
+        admission = get_scheduler().submit_batch(batch_id, jobs)
+    except QueueFull as e:
+        EVALUATIONS_REJECTED.labels(reason="queue_full").inc()
+        get_batches().discard(batch_id)
+        log.warning("Rejecting batch, queue full", extra={
+            "batch_id": batch_id,
+            "evaluations": len(requests),
+            "queue_depth": e.depth,
+            "retry_after": e.retry_after,
+        })
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    events = get_event_bus()
+    for evaluation_id in evaluation_ids:
+        events.publish(evaluation_id, "queued", {"batch_id": batch_id, "queue_depth": admission.depth})
+    log.info("Batch queued", extra={
+        "batch_id": batch_id,
+        "evaluations": len(requests),
+        "agents": len(checked_agents),
+        "challenges": len(checked_challenges),
+        "snapshot_captures": captures,
+    })
+    return BatchEvaluationResponse(
+        batch_id=batch_id,
+        status="running" if admission.started else "queued",
+        total=len(requests),
+        message="Batch started successfully" if admission.started else "Batch queued",
+        queue_position=admission.position,
+        queue_depth=admission.depth,
+    )
+
+@app.get("/api/batches/{batch_id}")
+def batch_status(batch_id: str):
+    """A batch's progress, aggregate results per agent and per challenge, and its evaluations."""
+    summary = get_batches().get(batch_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return summary
+
+@app.get("/api/evaluations/{evaluation_id}/events")
+async def evaluation_events(evaluation_id: str, request: Request):
+    """Stream an evaluation's progress as Server-Sent Events."""
+    if not get_event_bus().exists(evaluation_id):
+        raise HTTPException(status_code=404, detail="No events for this evaluation")
+    try:
+        last_event_id = int(request.headers.get("last-event-id", "0"))
+    except ValueError:
+        last_event_id = 0
+
+    async def stream():
+        async for event in get_event_bus().subscribe(evaluation_id, last_event_id):
+            if await request.is_disconnected():
+                break
+            yield format_sse(event)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/api/agents/validate", response_model=AgentValidationResponse)
+def validate_agent(request: AgentValidationRequest):
+    """Pre-compile and validate agent code so it is cached before its first evaluation."""
+    digest = agent_hash(request.agent_code)
+    try:
+        get_registry().get(request.agent_code)
+    except AgentValidationError as e:
+        return AgentValidationResponse(agent_hash=digest, valid=False, error=str(e))
+    return AgentValidationResponse(agent_hash=digest, valid=True)
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "browser_pool": get_pool().stats(),
+        "async_engine": get_engine().stats() if BROWSER_ENGINE == "async" else None,
+        "scheduler": get_scheduler().stats(),
+        "agent_cache": get_registry().stats(),
+        "agent_workers": get_worker_pool().stats(),
+        "callbacks": get_outbox().stats(),
+        "snapshots": get_snapshots().stats(),
+        "batches": get_batches().stats(),
+        "trials": get_trials().stats(),
+    }
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics."""
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+"""
+Asyncio browser engine running many evaluations on one event loop.
+
+The default ``sync`` engine (``browser_pool``) gives every concurrent
+evaluation its own thread, Chromium process and ``ScriptBrowserEnv``, each
+blocking on its own Playwright calls. With ``BROWSER_ENGINE=async``
+evaluations are coroutines on a single event loop thread driving
+``async_playwright``: ``ASYNC_BROWSERS`` Chromium processes each host up to
+``ASYNC_CONTEXTS_PER_BROWSER`` evaluations, one fresh browser context each.
+Blocking work (agent calls, which wait on a worker process, and callbacks)
+runs on a thread pool so it never stalls the loop.
+
+``ScriptBrowserEnv`` only has a sync API, so the engine extracts observations
+itself. The accessibility tree is fetched over CDP with the per-node bounding
+box queries pipelined instead of one round-trip at a time, filtered to the
+viewport like WebArena does, and rendered by WebArena's
+``TextObervationProcessor``, so agents see the same text. Actions are executed
+from their text the way ``execute_action`` runs id-based actions.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from action_validation import parse_action
+from browser_pool import BROWSER_HEADLESS, BROWSER_MAX_USES, BROWSER_SLOW_MO, VIEWPORT_SIZE
+from metrics import observe_phase
+from readiness import (
+    PageActivityMonitor, ReadinessResult, SettleResult, MUTATION_TRACKER_JS, PAGE_STATE_JS,
+    READY_TIMEOUT, READY_QUIET_MS, NETWORK_IDLE_MS, READY_POLL_MS,
+    SETTLE_TIMEOUT, SETTLE_QUIET_MS, SETTLE_NETWORK_IDLE_MS,
+)
+from service_log import get_logger
+
+BROWSER_ENGINE = os.environ.get("BROWSER_ENGINE", "sync")
+ASYNC_BROWSERS = int(os.environ.get("ASYNC_BROWSERS", "2"))
+ASYNC_CONTEXTS_PER_BROWSER = int(os.environ.get("ASYNC_CONTEXTS_PER_BROWSER", "4"))
+ASYNC_CAPACITY = ASYNC_BROWSERS * ASYNC_CONTEXTS_PER_BROWSER
+# Threads for blocking work started from the loop (agent calls, callbacks)
+ASYNC_BLOCKING_THREADS = int(os.environ.get("ASYNC_BLOCKING_THREADS", str(ASYNC_CAPACITY)))
+
+BROWSER_ENGINES = ("sync", "async")
+
+# Same function WebArena's TextObervationProcessor runs on every node
+BOUNDING_RECT_JS = """
+function() {
+    if (this.nodeType == 3) {
+        var range = document.createRange();
+        range.selectNode(this);
+        var rect = range.getBoundingClientRect().toJSON();
+        range.detach();
+        return rect;
+    } else {
+        return this.getBoundingClientRect().toJSON();
+    }
+}
+"""
+WINDOW_JS = """
+() => ({
+    top: window.pageYOffset,
+    left: window.pageXOffset,
+    width: window.screen.width,
+    height: window.screen.height,
+    ratio: window.devicePixelRatio,
+})
+"""
+SCROLL_JS = {
+    "up": "(document.scrollingElement || document.body).scrollTop = (document.scrollingElement || document.body).scrollTop - window.innerHeight;",
+    "down": "(document.scrollingElement || document.body).scrollTop = (document.scrollingElement || document.body).scrollTop + window.innerHeight;",
+}
+
+log = get_logger("async_engine")
+
+
+async def _bounding_rect(client, node):
+    if "backendDOMNodeId" not in node:
+        return None
+    if node["role"]["value"] == "RootWebArea":
+        return [0.0, 0.0, 10.0, 10.0]
+    try:
+        remote = await client.send("DOM.resolveNode", {"backendNodeId": int(node["backendDOMNodeId"])})
+        response = await client.send("Runtime.callFunctionOn", {
+            "objectId": remote["object"]["objectId"],
+            "functionDeclaration": BOUNDING_RECT_JS,
+            "returnByValue": True,
+        })
+    except Exception:
+        return None
+    if response.get("result", {}).get("subtype", "") == "error":
+        return None
+    rect = response["result"]["value"]
+    return [rect["x"], rect["y"], rect["width"], rect["height"]]
+
+
+def _remove_node(nodes, cursors, node):
+    """Drop a node from the tree, handing its children to its parent in its place."""
+    parent = nodes[cursors[node["parentId"]]]
+    index = parent["childIds"].index(node["nodeId"])
+    parent["childIds"][index:index + 1] = node["childIds"]
+    for child_id in node["childIds"]:
+        nodes[cursors[child_id]]["parentId"] = node["parentId"]
+    node["parentId"] = "[REMOVED]"
+
+
+async def fetch_accessibility_tree(page, client, current_viewport_only=True):
+    """The page's accessibility tree as WebArena's processor builds it, with bounds fetched concurrently."""
+    from browser_env.processors import TextObervationProcessor, IN_VIEWPORT_RATIO_THRESHOLD
+
+    nodes = []
+    seen = set()
+    # A few nodes are repeated in the accessibility tree
+    for node in (await client.send("Accessibility.getFullAXTree", {}))["nodes"]:
+        if node["nodeId"] not in seen:
+            seen.add(node["nodeId"])
+            nodes.append(node)
+    bounds = await asyncio.gather(*(_bounding_rect(client, node) for node in nodes))
+    cursors = {}
+    for cursor, (node, bound) in enumerate(zip(nodes, bounds)):
+        cursors[node["nodeId"]] = cursor
+        node["union_bound"] = bound
+
+    if current_viewport_only:
+        window = await page.evaluate(WINDOW_JS)
+        config = {
+            "win_top_bound": window["top"],
+            "win_left_bound": window["left"],
+            "win_width": window["width"],
+            "win_height": window["height"],
+            "win_right_bound": window["left"] + window["width"],
+            "win_lower_bound": window["top"] + window["height"],
+            "device_pixel_ratio": window["ratio"],
+        }
+        for node in nodes:
+            if node.get("parentId") is None:
+                continue
+            bound = node["union_bound"]
+            if (
+                not bound
+                or bound[2] == 0
+                or bound[3] == 0
+                or TextObervationProcessor.get_element_in_viewport_ratio(
+                    elem_left_bound=float(bound[0]),
+                    elem_top_bound=float(bound[1]),
+                    width=float(bound[2]),
+                    height=float(bound[3]),
+                    config=config,
+                ) < IN_VIEWPORT_RATIO_THRESHOLD
+            ):
+                _remove_node(nodes, cursors, node)
+        nodes = [node for node in nodes if node.get("parentId") != "[REMOVED]"]
+    return nodes
+
+
+def render_observation(tabs, nodes):
+    """Observation text and nodes' info of a fetched tree; CPU-bound, so kept off the event loop."""
+    from browser_env.processors import TextObervationProcessor
+
+    content, nodes_info = TextObervationProcessor.parse_accessibility_tree(nodes)
+    content = TextObervationProcessor.clean_accesibility_tree(content)
+    return f"{tabs}\n\n{content}", nodes_info
+
+
+async def extract_observation(page, client, current_viewport_only=True, executor=None):
+    """Return the observation text ``ScriptBrowserEnv`` would produce and its nodes' info.
+
+    The tree is rendered on ``executor`` (the loop's default one if None).
+    """
+    pages = page.context.pages
+    try:
+        titles = [await tab.title() for tab in pages]
+        current = pages.index(page)
+        tabs = " | ".join(
+            f"Tab {i} (current): {title}" if i == current else f"Tab {i}: {title}"
+            for i, title in enumerate(titles)
+        )
+    except Exception:
+        tabs = " | ".join(f"Tab {i}" for i in range(len(pages)))
+
+    nodes = await fetch_accessibility_tree(page, client, current_viewport_only)
+    return await asyncio.get_running_loop().run_in_executor(executor, render_observation, tabs, nodes)
+
+
+class AsyncActivityMonitor(PageActivityMonitor):
+    """``PageActivityMonitor`` for an async context; its page checks are coroutines."""
+
+    def __init__(self, context):
+        self._track(context)
+
+    async def install(self):
+        await self.context.add_init_script(MUTATION_TRACKER_JS)
+
+    async def page_state(self, page):
+        try:
+            state = await page.evaluate(PAGE_STATE_JS)
+        except Exception:
+            # Navigation in progress destroys the execution context
+            return {"readyState": "loading", "quietMs": 0, "mutations": 0, "tracked": False}
+        if not state["tracked"]:
+            try:
+                await page.evaluate(MUTATION_TRACKER_JS)
+            except Exception:
+                pass
+        return state
+
+    async def is_stable(self, page, quiet_ms, idle_ms):
+        state = await self.page_state(page)
+        return (
+            state["readyState"] != "loading"
+            and state["tracked"]
+            and state["quietMs"] >= quiet_ms
+            and self.network_idle_ms() >= idle_ms
+        )
+
+    async def wait_until_stable(self, page, timeout, quiet_ms=READY_QUIET_MS, idle_ms=NETWORK_IDLE_MS):
+        deadline = time.time() + timeout
+        while True:
+            if await self.is_stable(page, quiet_ms, idle_ms):
+                return True
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            await asyncio.sleep(min(READY_POLL_MS / 1000, remaining))
+
+
+async def wait_for_page_ready(monitor: AsyncActivityMonitor, page, timeout=READY_TIMEOUT,
+                              ready_selectors=None) -> ReadinessResult:
+    """Async ``readiness.wait_for_page_ready``."""
+    started = time.time()
+
+    def remaining_ms():
+        return max(1, (started + timeout - time.time()) * 1000)
+
+    try:
+        await page.wait_for_load_state("domcontentloaded", timeout=remaining_ms())
+    except Exception:
+        return ReadinessResult(False, time.time() - started, "document did not load")
+
+    for selector in ready_selectors or []:
+        try:
+            await page.wait_for_selector(selector, state="visible", timeout=remaining_ms())
+        except Exception:
+            return ReadinessResult(False, time.time() - started, f"selector not visible: {selector}")
+
+    if not await monitor.wait_until_stable(page, remaining_ms() / 1000):
+        return ReadinessResult(False, time.time() - started, "page did not settle")
+
+    return ReadinessResult(True, time.time() - started, "stable")
+
+
+async def wait_for_settle(monitor: AsyncActivityMonitor, page, ceiling=SETTLE_TIMEOUT) -> SettleResult:
+    """Async ``readiness.wait_for_settle``."""
+    started = time.time()
+    url = page.url
+    before = await monitor.page_state(page)
+    requests_before = monitor.requests_seen
+
+    settled = await monitor.wait_until_stable(
+        page, ceiling, quiet_ms=SETTLE_QUIET_MS, idle_ms=SETTLE_NETWORK_IDLE_MS
+    )
+
+    after = await monitor.page_state(page)
+    changed = (
+        page.url != url
+        or monitor.requests_seen != requests_before
+        or after["mutations"] != before["mutations"]
+    )
+    return SettleResult(settled, time.time() - started, changed)
+
+
+class AsyncSession:
+    """One evaluation's browser context on the async engine."""
+
+    def __init__(self, engine, context, page):
+        self.engine = engine
+        self.context = context
+        self.page = page
+        self._clients = {}
+        # Element id -> node info of the last observation, for id-based actions
+        self.obs_nodes_info = {}
+
+    async def _client(self):
+        client = self._clients.get(self.page)
+        if client is None:
+            client = await self.context.new_cdp_session(self.page)
+            await client.send("Accessibility.enable")
+            self._clients[self.page] = client
+        return client
+
+    async def observe(self, timer=None):
+        """Extract an observation of the current page, like ``env._get_obs()`` without the screenshot."""
+        started = time.perf_counter()
+        text, self.obs_nodes_info = await extract_observation(
+            self.page, await self._client(), executor=self.engine._executor
+        )
+        if timer is not None:
+            timer.record("observation", time.perf_counter() - started)
+        return {"text": text}
+
+    async def execute(self, action: str):
+        """Run an action ``validate_action`` accepted; returns ``(success, error)`` like ``run_action``."""
+        try:
+            await self._execute(*parse_action(action))
+        except Exception as e:
+            return False, str(e)
+        return True, ""
+
+    def _center(self, element_id):
+        x, y, width, height = self.obs_nodes_info[element_id]["union_bound"]
+        return x + width / 2, y + height / 2
+
+    async def _execute(self, action_type, arguments):
+        page = self.page
+        if action_type in ("click", "type"):
+            await page.mouse.click(*self._center(arguments[0]))
+            if action_type == "type":
+                text = arguments[1] + ("\n" if arguments[2] == "1" else "")
+                await page.keyboard.type(text)
+        elif action_type == "hover":
+            await page.mouse.move(*self._center(arguments[0]))
+        elif action_type == "press":
+            await page.keyboard.press(arguments[0])
+        elif action_type == "scroll":
+            await page.evaluate(SCROLL_JS[arguments[0]])
+        elif action_type == "goto":
+            await page.goto(arguments[0])
+        elif action_type == "go_back":
+            await page.go_back()
+        elif action_type == "go_forward":
+            await page.go_forward()
+        elif action_type == "new_tab":
+            self.page = await self.context.new_page()
+        elif action_type == "close_tab":
+            await page.close()
+            self._clients.pop(page, None)
+            pages = self.context.pages
+            self.page = pages[-1] if pages else await self.context.new_page()
+        elif action_type == "tab_focus":
+            self.page = self.context.pages[int(arguments[0])]
+            await self.page.bring_to_front()
+        # stop and noop don't touch the page
+
+    async def blocking(self, fn: Callable[..., Any], *args):
+        """Run a blocking call on the engine's thread pool."""
+        return await self.engine.blocking(fn, *args)
+
+
+class _Browser:
+    def __init__(self, browser):
+        self.browser = browser
+        self.active = 0
+        self.uses = 0
+
+
+class AsyncBrowserEngine:
+    """
+    Event loop thread multiplexing evaluations over a few Chromium processes.
+
+    At most ``browsers * contexts_per_browser`` evaluations run at once; each
+    goes to the browser with the fewest active contexts. A browser is
+    relaunched once it has served ``max_uses`` evaluations, or has died, and
+    no evaluation is using it.
+    """
+
+    def __init__(self, browsers=ASYNC_BROWSERS, contexts_per_browser=ASYNC_CONTEXTS_PER_BROWSER,
+                 max_uses=BROWSER_MAX_USES, headless=BROWSER_HEADLESS, slow_mo=BROWSER_SLOW_MO):
+        self.browsers = browsers
+        self.capacity = browsers * contexts_per_browser
+        self.max_uses = max_uses
+        self.headless = headless
+        self.slow_mo = slow_mo
+        self._loop = None
+        self._thread = None
+        self._started = threading.Event()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(ASYNC_BLOCKING_THREADS, thread_name_prefix="async-engine-blocking")
+        self._playwright = None
+        self._slots = None
+        self._browsers = []
+
+    def start(self):
+        """Start the event loop thread and launch the browsers."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run_loop, name="async-engine", daemon=True)
+            self._thread.start()
+        self._started.wait()
+
+    def _run_loop(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._slots = asyncio.Semaphore(self.capacity)
+        try:
+            self._loop.run_until_complete(self._launch_all())
+        except Exception:
+            log.exception("Failed to launch browsers")
+        self._started.set()
+        self._loop.run_forever()
+
+    async def _launch_all(self):
+        from playwright.async_api import async_playwright
+
+        self._playwright = await async_playwright().start()
+        for _ in range(self.browsers):
+            self._browsers.append(await self._launch())
+
+    async def _launch(self):
+        started = time.time()
+        browser = await self._playwright.chromium.launch(headless=self.headless, slow_mo=self.slow_mo)
+        elapsed = time.time() - started
+        observe_phase("browser_launch", elapsed)
+        log.info("Browser launched", extra={"engine": "async", "launch_time": elapsed})
+        return _Browser(browser)
+
+    async def _pick_browser(self) -> _Browser:
+        if not self._browsers:
+            self._browsers.append(await self._launch())
+        for i, slot in enumerate(self._browsers):
+            if slot.active == 0 and (slot.uses >= self.max_uses or not slot.browser.is_connected()):
+                log.info("Relaunching browser", extra={"engine": "async", "uses": slot.uses})
+                try:
+                    await slot.browser.close()
+                except Exception:
+                    pass
+                self._browsers[i] = await self._launch()
+        live = [slot for slot in self._browsers if slot.browser.is_connected()]
+        return min(live or self._browsers, key=lambda slot: (slot.uses >= self.max_uses, slot.active))
+
+    async def _run(self, fn, args, kwargs):
+        async with self._slots:
+            slot = await self._pick_browser()
+            slot.active += 1
+            context = None
+            try:
+                started = time.time()
+                context = await slot.browser.new_context(viewport=VIEWPORT_SIZE, device_scale_factor=1)
+                page = await context.new_page()
+                observe_phase("context_reset", time.time() - started)
+                return await fn(AsyncSession(self, context, page), *args, **kwargs)
+            finally:
+                slot.active -= 1
+                slot.uses += 1
+                if context is not None:
+                    try:
+                        await context.close()
+                    except Exception:
+                        pass
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Run the coroutine function ``fn(session, *args, **kwargs)`` on a fresh context."""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self._run(fn, args, kwargs), self._loop)
+
+    def run(self, fn: Callable[..., Any], *args, **kwargs):
+        """Like ``submit`` but block until the evaluation finishes and return its result."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    async def blocking(self, fn: Callable[..., Any], *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def stats(self):
+        return {
+            "engine": "async",
+            "browsers": len(self._browsers),
+            "capacity": self.capacity,
+            "active": sum(slot.active for slot in self._browsers),
+            "ready": sum(1 for slot in self._browsers if slot.browser.is_connected()),
+        }
+
+    async def _close(self):
+        for slot in self._browsers:
+            try:
+                await slot.browser.close()
+            except Exception:
+                pass
+        self._browsers = []
+        if self._playwright is not None:
+            await self._playwright.stop()
+
+    def shutdown(self):
+        """Close the browsers and stop the event loop."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close(), self._loop).result(timeout=30)
+        except Exception:
+            log.exception("Failed to close browsers")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        thread.join()
+        self._executor.shutdown(wait=False)
+
+
+_engine: Optional[AsyncBrowserEngine] = None
+
+
+def get_engine() -> AsyncBrowserEngine:
+    """Return the process-wide async engine, creating it on first use."""
+    global _engine
+    if _engine is None:
+        _engine = AsyncBrowserEngine()
+    return _engine
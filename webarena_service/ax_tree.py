@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Array-backed accessibility tree with indexed lookups.
+
+WebArena renders the accessibility tree as one line per node::
+
+    \\t\\t[42] button 'Send' focused: True
+
+``AXTree.parse`` reads such a text once, with a single regex pass, into
+parallel arrays (element id, role, name, properties, depth, parent row) plus
+an index by element id and by role. An index by lower-cased name token is
+built on the first name query. Agents get the tree of their observation as
+``obs_text.tree``:
+
+    send = obs_text.tree.first(role="button", name="Send")
+    boxes = obs_text.tree.find(role="textbox", words="search")
+
+``Observation`` is the ``str`` subclass agents receive, so agents that treat
+the observation as plain text keep working.
+"""
+
+import ast
+import re
+from array import array
+from collections import namedtuple
+
+_NODE_RE = re.compile(
+    r"^(\t*)\[(\d+)\] (\S+) (?:'((?:[^'\\\n]|\\.)*)'|\"((?:[^\"\\\n]|\\.)*)\")([^\n]*)$",
+    re.MULTILINE,
+)
+_TOKEN_RE = re.compile(r"\w+")
+_INDENT = "\t"
+
+AXNode = namedtuple("AXNode", ["id", "role", "name", "props", "depth", "parent"])
+
+
+def _unquote(raw, quote):
+    # Names are repr()'d by WebArena; only escaped ones need real unquoting
+    if "\\" not in raw:
+        return raw
+    try:
+        return ast.literal_eval(quote + raw + quote)
+    except (ValueError, SyntaxError):
+        return raw
+
+
+class AXTree:
+    """One observation's accessibility tree, stored column-wise."""
+
+    def __init__(self):
+        self.header = ""
+        self.ids = array("q")
+        self.depths = array("H")
+        # Row of the parent node, -1 for roots
+        self.parents = array("i")
+        self.roles = []
+        self.names = []
+        # Everything after the name, e.g. " focused: True"
+        self.props = []
+        # Element id -> row
+        self.row_by_id = {}
+        self._by_role = {}
+        self._by_token = None
+
+    @classmethod
+    def parse(cls, text: str) -> "AXTree":
+        tree = cls()
+        ids, depths, parents = tree.ids, tree.depths, tree.parents
+        roles, names, props = tree.roles, tree.names, tree.props
+        rows, by_role = tree.row_by_id, tree._by_role
+        intern = {}
+        # Rows of the current node's ancestors
+        stack = []
+        for match in _NODE_RE.finditer(text):
+            tabs, element_id, role, single, double, rest = match.groups()
+            row = len(ids)
+            depth = len(tabs)
+            while stack and depths[stack[-1]] >= depth:
+                stack.pop()
+            element_id = int(element_id)
+            ids.append(element_id)
+            depths.append(depth)
+            parents.append(stack[-1] if stack else -1)
+            role = intern.setdefault(role, role)
+            roles.append(role)
+            names.append(_unquote(single, "'") if double is None else _unquote(double, '"'))
+            props.append(rest)
+            rows[element_id] = row
+            by_role.setdefault(role, []).append(row)
+            stack.append(row)
+        # Lines before the first node, e.g. the tab list
+        first = _NODE_RE.search(text)
+        tree.header = (text[:first.start()] if first else text).strip("\n")
+        return tree
+
+    # Pickled column-wise so sending a tree to an agent worker stays cheap
+    def __getstate__(self):
+        return (
+            self.header, self.ids, self.depths, self.parents,
+            self.roles, "\x00".join(self.names), self.props,
+        )
+
+    def __setstate__(self, state):
+        self.header, self.ids, self.depths, self.parents, self.roles, names, self.props = state
+        self.names = names.split("\x00") if self.ids else []
+        self.row_by_id = {element_id: row for row, element_id in enumerate(self.ids)}
+        self._by_role = {}
+        for row, role in enumerate(self.roles):
+            self._by_role.setdefault(role, []).append(row)
+        self._by_token = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, element_id):
+        return self._row(element_id) is not None
+
+    def _row(self, element_id):
+        try:
+            return self.row_by_id.get(int(element_id))
+        except (TypeError, ValueError):
+            return None
+
+    def node(self, row) -> AXNode:
+        parent = self.parents[row]
+        return AXNode(
+            self.ids[row], self.roles[row], self.names[row], self.props[row],
+            self.depths[row], self.ids[parent] if parent >= 0 else None,
+        )
+
+    def line(self, row) -> str:
+        """The node's line as WebArena renders it."""
+        return f"{_INDENT * self.depths[row]}[{self.ids[row]}] {self.roles[row]} {self.names[row]!r}{self.props[row]}"
+
+    def get(self, element_id):
+        """Node with the given element id (int or str), or None."""
+        row = self._row(element_id)
+        return None if row is None else self.node(row)
+
+    def children(self, element_id):
+        row = self._row(element_id)
+        if row is None:
+            return []
+        depth = self.depths[row]
+        result = []
+        for child in range(row + 1, len(self.ids)):
+            if self.depths[child] <= depth:
+                break
+            if self.parents[child] == row:
+                result.append(self.node(child))
+        return result
+
+    def roles_present(self):
+        return list(self._by_role)
+
+    def by_role(self, role):
+        return [self.node(row) for row in self._by_role.get(role, ())]
+
+    def _token_index(self):
+        if self._by_token is None:
+            index = {}
+            for row, name in enumerate(self.names):
+                for token in set(_TOKEN_RE.findall(name.lower())):
+                    index.setdefault(token, []).append(row)
+            self._by_token = index
+        return self._by_token
+
+    def _candidate_rows(self, role, words):
+        candidates = None
+        if words:
+            index = self._token_index()
+            for token in _TOKEN_RE.findall(words.lower()):
+                rows = index.get(token, ())
+                candidates = set(rows) if candidates is None else candidates & set(rows)
+                if not candidates:
+                    return []
+        if role is not None:
+            rows = self._by_role.get(role, [])
+            return rows if candidates is None else [row for row in rows if row in candidates]
+        return range(len(self.ids)) if candidates is None else sorted(candidates)
+
+    def find(self, role=None, name=None, name_contains=None, words=None):
+        """Nodes matching all given conditions, in document order.
+
+        ``name`` is an exact match, ``name_contains`` a case-insensitive
+        substring and ``words`` a string whose every word must be a word of
+        the name (case-insensitive). ``role`` and ``words`` are index lookups.
+        """
+        needle = name_contains.lower() if name_contains else None
+        result = []
+        for row in self._candidate_rows(role, words):
+            if role is not None and self.roles[row] != role:
+                continue
+            if name is not None and self.names[row] != name:
+                continue
+            if needle is not None and needle not in self.names[row].lower():
+                continue
+            result.append(self.node(row))
+        return result
+
+    def first(self, role=None, name=None, name_contains=None, words=None):
+        """First node matching ``find``'s conditions, or None."""
+        found = self.find(role, name, name_contains, words)
+        return found[0] if found else None
+
+
+# Full text of the last observation this (agent worker) process received
+_received_text = None
+
+
+def _receive_full(text, errors):
+    global _received_text
+    _received_text = text
+    return Observation(text, errors=errors)
+
+
+def _receive_diff(text, delta, errors):
+    """Rebuild a diff observation's full page text from the previous one and a line delta."""
+    global _received_text
+    from eval_trace import apply_delta
+
+    _received_text = "\n".join(apply_delta(_received_text.split("\n"), delta))
+    obs = Observation(text, detached=True, errors=errors)
+    obs._full_text = _received_text
+    return obs
+
+
+class Observation(str):
+    """Observation text given to ``agent_logic``, with its parsed tree as ``.tree``.
+
+    In diff mode the text is a diff while ``.tree`` still describes the whole
+    page. Only text crosses to the agent worker: a full observation is sent as
+    is, a diff with a line delta against the previous observation's full text,
+    from which the worker rebuilds the page text. Either way the tree is only
+    parsed if the agent reads it.
+
+    ``errors`` lists the agent's actions from the previous step that were
+    rejected before reaching the browser (see ``action_validation``).
+    """
+
+    def __new__(cls, text, tree=None, detached=False, errors=None, delta=None):
+        obs = super().__new__(cls, text)
+        obs._tree = tree
+        # Whether the tree is of a different text than this one
+        obs._detached = detached
+        # Line delta from the previous observation's full text to this one's
+        obs._delta = delta
+        obs._full_text = None
+        obs.errors = errors or []
+        return obs
+
+    @property
+    def tree(self) -> AXTree:
+        if self._tree is None:
+            self._tree = AXTree.parse(self._full_text if self._detached else self)
+        return self._tree
+
+    def __reduce__(self):
+        if self._detached:
+            return (_receive_diff, (str(self), self._delta, self.errors))
+        return (_receive_full, (str(self), self.errors))
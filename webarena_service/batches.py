@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Progress and results of evaluation batches.
+
+A batch is a matrix of agents x challenges submitted in one request to
+``/api/evaluate/batch``. Each of its evaluations still runs, calls back and
+streams events like a single one; the tracker follows them as they start and
+finish so ``/api/batches/{batch_id}`` can report the batch's progress and
+aggregate scores per agent and per challenge. Batches are dropped
+``BATCH_RETENTION`` seconds after their last evaluation finished.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Most evaluations one batch may contain
+BATCH_MAX_EVALUATIONS = int(os.environ.get("BATCH_MAX_EVALUATIONS", "500"))
+BATCH_RETENTION = float(os.environ.get("BATCH_RETENTION", "3600"))
+
+FINISHED_STATUSES = ("completed", "failed")
+
+
+def _aggregate(evaluations):
+    finished = [e for e in evaluations if e["status"] in FINISHED_STATUSES]
+    completed = sum(1 for e in finished if e["status"] == "completed")
+    return {
+        "total": len(evaluations),
+        "finished": len(finished),
+        "completed": completed,
+        "success_rate": round(completed / len(finished), 4) if finished else None,
+        "mean_score": round(sum(e["score"] or 0 for e in finished) / len(finished), 2) if finished else None,
+    }
+
+
+class Batch:
+    """One batch's evaluations and their current state."""
+
+    def __init__(self, batch_id: str, evaluations: List[Dict]):
+        self.batch_id = batch_id
+        self.created_at = time.time()
+        self.finished_at = None
+        # evaluation_id -> agent_id, challenge_id, status, score, steps_taken
+        self.evaluations = {
+            e["evaluation_id"]: {
+                "evaluation_id": e["evaluation_id"],
+                "agent_id": e["agent_id"],
+                "challenge_id": e["challenge_id"],
+                "status": "queued",
+                "score": None,
+                "steps_taken": None,
+            }
+            for e in evaluations
+        }
+
+    def summary(self) -> Dict:
+        evaluations = list(self.evaluations.values())
+        counts = {status: 0 for status in ("queued", "running") + FINISHED_STATUSES}
+        for evaluation in evaluations:
+            counts[evaluation["status"]] += 1
+        by_agent, by_challenge = {}, {}
+        for evaluation in evaluations:
+            by_agent.setdefault(evaluation["agent_id"], []).append(evaluation)
+            by_challenge.setdefault(evaluation["challenge_id"], []).append(evaluation)
+        return {
+            "batch_id": self.batch_id,
+            "status": "finished" if self.finished_at else ("running" if counts["queued"] < len(evaluations) else "queued"),
+            **counts,
+            **_aggregate(evaluations),
+            "duration": round((self.finished_at or time.time()) - self.created_at, 3),
+            "by_agent": {agent_id: _aggregate(group) for agent_id, group in by_agent.items()},
+            "by_challenge": {challenge_id: _aggregate(group) for challenge_id, group in by_challenge.items()},
+            "evaluations": evaluations,
+        }
+
+
+class BatchTracker:
+    """Thread-safe registry of batches, updated by the evaluations they contain."""
+
+    def __init__(self):
+        self._batches: Dict[str, Batch] = {}
+        # evaluation_id -> batch
+        self._evaluations: Dict[str, Batch] = {}
+        self._lock = threading.Lock()
+
+    def create(self, batch_id: str, evaluations: List[Dict]) -> Batch:
+        batch = Batch(batch_id, evaluations)
+        with self._lock:
+            self._expire()
+            self._batches[batch_id] = batch
+            for evaluation_id in batch.evaluations:
+                self._evaluations[evaluation_id] = batch
+        return batch
+
+    def discard(self, batch_id: str):
+        """Forget a batch that was never queued."""
+        with self._lock:
+            batch = self._batches.pop(batch_id, None)
+            if batch is None:
+                return
+            for evaluation_id in batch.evaluations:
+                self._evaluations.pop(evaluation_id, None)
+
+    def _expire(self):
+        cutoff = time.time() - BATCH_RETENTION
+        for batch_id in [
+            bid for bid, batch in self._batches.items()
+            if batch.finished_at is not None and batch.finished_at < cutoff
+        ]:
+            batch = self._batches.pop(batch_id)
+            for evaluation_id in batch.evaluations:
+                self._evaluations.pop(evaluation_id, None)
+
+    def _update(self, evaluation_id: str, **fields):
+        with self._lock:
+            batch = self._evaluations.get(evaluation_id)
+            if batch is None:
+                return
+            evaluation = batch.evaluations[evaluation_id]
+            if evaluation["status"] in FINISHED_STATUSES:
+                return
+            evaluation.update(fields)
+            if all(e["status"] in FINISHED_STATUSES for e in batch.evaluations.values()):
+                batch.finished_at = time.time()
+
+    def started(self, evaluation_id: str):
+        self._update(evaluation_id, status="running")
+
+    def finished(self, evaluation_id: str, status: str, score=None, steps_taken=None):
+        """Record an evaluation's outcome; does nothing for evaluations outside a batch."""
+        self._update(evaluation_id, status=status if status in FINISHED_STATUSES else "failed",
+                     score=score, steps_taken=steps_taken)
+
+    def get(self, batch_id: str) -> Optional[Dict]:
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            return batch.summary() if batch is not None else None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "batches": len(self._batches),
+                "running": sum(1 for batch in self._batches.values() if batch.finished_at is None),
+            }
+
+
+_tracker: Optional[BatchTracker] = None
+
+
+def get_batches() -> BatchTracker:
+    """Return the process-wide batch tracker, creating it on first use."""
+    global _tracker
+    if _tracker is None:
+        _tracker = BatchTracker()
+    return _tracker
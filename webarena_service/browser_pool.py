@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Warm pool of reusable ScriptBrowserEnv instances.
+
+Launching Chromium and starting Playwright is the largest fixed cost of an
+evaluation, so the pool keeps a number of environments launched and reset
+ahead of time. Playwright's sync API is bound to the thread that started it,
+so every environment is owned by a dedicated worker thread and evaluations
+are run *on* that thread via ``BrowserPool.run`` / ``BrowserPool.submit``.
+
+Between checkouts an environment gets a fresh browser context (clean cookies,
+storage and pages) on the same browser process, so the next evaluation starts
+from a pre-reset state without paying for a relaunch.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+from metrics import observe_phase
+from service_log import get_logger
+
+# Pool configuration (overridable through environment variables)
+BROWSER_POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", "2"))
+BROWSER_MAX_USES = int(os.environ.get("BROWSER_MAX_USES", "50"))
+# Headed browsers and a slow_mo delay are only for watching evaluations while debugging
+BROWSER_HEADLESS = os.environ.get("BROWSER_HEADLESS", "true").lower() in ("1", "true", "yes")
+BROWSER_SLOW_MO = int(os.environ.get("BROWSER_SLOW_MO", "0"))
+
+VIEWPORT_SIZE = {"width": 1280, "height": 720}
+
+log = get_logger("browser_pool")
+
+
+def create_env(headless=BROWSER_HEADLESS, slow_mo=BROWSER_SLOW_MO):
+    """Launch a ScriptBrowserEnv and reset it so the browser is running."""
+    from browser_env import ScriptBrowserEnv
+
+    env = ScriptBrowserEnv(
+        headless=headless,
+        slow_mo=slow_mo,
+        observation_type="accessibility_tree",
+        current_viewport_only=True,
+        viewport_size=VIEWPORT_SIZE,
+    )
+    env.reset()
+    return env
+
+
+def reset_context(env):
+    """
+    Replace the env's browser context with a clean one on the same browser.
+
+    Mirrors what ``ScriptBrowserEnv.setup`` does for a new context, without
+    tearing down Playwright and relaunching Chromium.
+    """
+    try:
+        env.context.close()
+    except Exception:
+        pass
+
+    env.context = env.browser.new_context(
+        viewport=env.viewport_size,
+        device_scale_factor=1,
+    )
+    page = env.context.new_page()
+    client = page.context.new_cdp_session(page)
+    if env.text_observation_type == "accessibility_tree":
+        client.send("Accessibility.enable")
+    page.client = client
+    env.page = page
+    return env
+
+
+def is_healthy(env):
+    """Check that the browser is connected and the page still executes script."""
+    try:
+        if not env.browser.is_connected():
+            return False
+        return env.page.evaluate("1 + 1") == 2
+    except Exception:
+        return False
+
+
+def close_env(env):
+    """Close an environment, ignoring errors from an already dead browser."""
+    try:
+        env.close()
+    except Exception:
+        pass
+
+
+class _PoolWorker(threading.Thread):
+    """Thread that owns one warm environment and runs jobs against it."""
+
+    def __init__(self, pool, index):
+        super().__init__(name=f"browser-pool-{index}", daemon=True)
+        self.pool = pool
+        self.env = None
+        self.uses = 0
+        self.busy = False
+
+    def _launch(self):
+        started = time.time()
+        self.env = create_env(self.pool.headless, self.pool.slow_mo)
+        self.uses = 0
+        elapsed = time.time() - started
+        observe_phase("browser_launch", elapsed)
+        log.info("Browser launched", extra={"worker": self.name, "launch_time": elapsed})
+
+    def _recycle(self):
+        close_env(self.env)
+        self.env = None
+        self._launch()
+
+    def _prepare(self):
+        """Make sure the env is launched, healthy and sitting on a clean context."""
+        if self.env is None:
+            self._launch()
+        elif self.uses >= self.pool.max_uses:
+            log.info("Recycling browser", extra={"worker": self.name, "uses": self.uses})
+            self._recycle()
+        elif not is_healthy(self.env):
+            log.warning("Browser failed health check, relaunching", extra={"worker": self.name})
+            self._recycle()
+        else:
+            started = time.time()
+            reset_context(self.env)
+            observe_phase("context_reset", time.time() - started)
+
+    def run(self):
+        while True:
+            # Warm up before waiting so the next checkout is immediate
+            try:
+                self._prepare()
+            except Exception:
+                log.exception("Failed to prepare browser", extra={"worker": self.name})
+                close_env(self.env)
+                self.env = None
+                time.sleep(1)
+
+            job = self.pool._jobs.get()
+            if job is None:
+                break
+            future, fn, args, kwargs = job
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                # The browser may have died while the env waited for this job
+                if self.env is None:
+                    self._launch()
+                elif not is_healthy(self.env):
+                    log.warning("Browser failed health check at checkout, relaunching", extra={"worker": self.name})
+                    self._recycle()
+                self.busy = True
+                try:
+                    result = fn(self.env, *args, **kwargs)
+                finally:
+                    self.busy = False
+                    self.uses += 1
+                future.set_result(result)
+            except BaseException as e:
+                future.set_exception(e)
+
+        close_env(self.env)
+        self.env = None
+
+
+class BrowserPool:
+    """
+    Fixed-size pool of warm browser environments.
+
+    ``size`` environments are launched up front; ``max_uses`` bounds how many
+    evaluations one browser serves before it is closed and relaunched. Jobs are
+    served in FIFO order.
+    """
+
+    def __init__(self, size=BROWSER_POOL_SIZE, max_uses=BROWSER_MAX_USES,
+                 headless=BROWSER_HEADLESS, slow_mo=BROWSER_SLOW_MO):
+        self.size = size
+        self.max_uses = max_uses
+        self.headless = headless
+        self.slow_mo = slow_mo
+        self._jobs = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the worker threads, each of which launches its browser."""
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(self.size):
+                worker = _PoolWorker(self, i)
+                worker.start()
+                self._workers.append(worker)
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Run ``fn(env, *args, **kwargs)`` on the next free environment."""
+        self.start()
+        future = Future()
+        self._jobs.put((future, fn, args, kwargs))
+        return future
+
+    def run(self, fn: Callable[..., Any], *args, **kwargs):
+        """Like ``submit`` but block until the job finishes and return its result."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "active": sum(1 for w in self._workers if w.busy),
+            "waiting": self._jobs.qsize(),
+            "ready": sum(1 for w in self._workers if w.env is not None),
+        }
+
+    def shutdown(self, wait=True):
+        """Stop all workers and close their browsers."""
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for _ in workers:
+            self._jobs.put(None)
+        if wait:
+            for worker in workers:
+                worker.join()
+
+
+_pool: Optional[BrowserPool] = None
+
+
+def get_pool() -> BrowserPool:
+    """Return the process-wide pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        _pool = BrowserPool()
+    return _pool
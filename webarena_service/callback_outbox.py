@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Durable, retrying delivery of evaluation results to the backend.
+
+``enqueue`` writes the callback to a local SQLite outbox and returns at once,
+so finishing an evaluation never waits on the backend. A single dispatcher
+thread delivers entries oldest-first through a pooled ``requests.Session``
+with strict timeouts, retrying failures with exponential backoff. Because the
+outbox is on disk, results that were not delivered yet survive a restart and
+are sent when the service comes back up.
+
+Entries that are rejected outright (4xx other than 408/429) or still fail
+after ``CALLBACK_MAX_ATTEMPTS`` are moved to a ``dead_letters`` table.
+"""
+
+import contextlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import CALLBACK_DELIVERIES, observe_phase
+from service_log import get_logger
+
+CALLBACK_OUTBOX_PATH = os.environ.get(
+    "CALLBACK_OUTBOX_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "callback_outbox.sqlite3")
+)
+CALLBACK_CONNECT_TIMEOUT = float(os.environ.get("CALLBACK_CONNECT_TIMEOUT", "3"))
+CALLBACK_READ_TIMEOUT = float(os.environ.get("CALLBACK_READ_TIMEOUT", "10"))
+CALLBACK_MAX_ATTEMPTS = int(os.environ.get("CALLBACK_MAX_ATTEMPTS", "10"))
+CALLBACK_BACKOFF_BASE = float(os.environ.get("CALLBACK_BACKOFF_BASE", "1"))
+CALLBACK_BACKOFF_MAX = float(os.environ.get("CALLBACK_BACKOFF_MAX", "300"))
+
+log = get_logger("callback")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    created_at REAL NOT NULL,
+    last_error TEXT
+);
+CREATE TABLE IF NOT EXISTS dead_letters (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    failed_at REAL NOT NULL,
+    last_error TEXT
+);
+"""
+
+
+class PermanentDeliveryError(Exception):
+    """The backend rejected the callback in a way retrying won't fix."""
+
+
+class CallbackOutbox:
+    """SQLite-backed outbox drained in order by one dispatcher thread."""
+
+    def __init__(self, path=CALLBACK_OUTBOX_PATH):
+        self.path = path
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        with self._transaction() as db:
+            db.executescript(SCHEMA)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Short-lived connection for callers outside the dispatcher thread."""
+        db = self._connect()
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def enqueue(self, url: str, payload: dict):
+        """Persist a callback for delivery. Only blocks on a local SQLite insert."""
+        body = json.dumps(payload, default=str)
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(
+                "INSERT INTO outbox (url, payload, next_attempt, created_at) VALUES (?, ?, ?, ?)",
+                (url, body, now, now),
+            )
+        self._wake.set()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="callback-dispatcher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        with self._transaction() as db:
+            return {
+                "pending": db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0],
+                "dead_letters": db.execute("SELECT COUNT(*) FROM dead_letters").fetchone()[0],
+            }
+
+    def _deliver(self, url, body):
+        response = self.session.post(
+            url,
+            data=body,
+            headers={"Content-Type": "application/json"},
+            timeout=(CALLBACK_CONNECT_TIMEOUT, CALLBACK_READ_TIMEOUT),
+        )
+        if 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+            raise PermanentDeliveryError(f"HTTP {response.status_code}: {response.text[:200]}")
+        response.raise_for_status()
+
+    def _backoff(self, attempts):
+        delay = min(CALLBACK_BACKOFF_MAX, CALLBACK_BACKOFF_BASE * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _run(self):
+        db = self._connect()
+        try:
+            while not self._stopped.is_set():
+                try:
+                    self._dispatch_next(db)
+                except Exception:
+                    log.exception("Callback dispatcher error")
+                    self._stopped.wait(1)
+        finally:
+            db.close()
+
+    def _dispatch_next(self, db):
+        """Try to deliver the oldest entry, or wait until there is one that is due."""
+        self._wake.clear()
+        row = db.execute(
+            "SELECT id, url, payload, attempts, next_attempt, created_at FROM outbox ORDER BY id LIMIT 1"
+        ).fetchone()
+        if row is None:
+            self._wake.wait()
+            return
+
+        entry_id, url, body, attempts, next_attempt, created_at = row
+        delay = next_attempt - time.time()
+        if delay > 0:
+            # Later entries wait behind this one to keep delivery in order
+            self._wake.wait(delay)
+            return
+
+        attempts += 1
+        started = time.time()
+        try:
+            self._deliver(url, body)
+        except Exception as e:
+            observe_phase("callback_delivery", time.time() - started)
+            error = f"{type(e).__name__}: {e}"
+            if isinstance(e, PermanentDeliveryError) or attempts >= CALLBACK_MAX_ATTEMPTS:
+                CALLBACK_DELIVERIES.labels(outcome="dead_letter").inc()
+                log.error("Giving up on callback", extra={"url": url, "attempts": attempts, "error": error})
+                with db:
+                    db.execute(
+                        "INSERT INTO dead_letters VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (entry_id, url, body, attempts, created_at, time.time(), error),
+                    )
+                    db.execute("DELETE FROM outbox WHERE id = ?", (entry_id,))
+            else:
+                CALLBACK_DELIVERIES.labels(outcome="retry").inc()
+                retry_in = self._backoff(attempts)
+                log.warning("Callback delivery failed, retrying", extra={"url": url, "error": error, "retry_in": retry_in})
+                with db:
+                    db.execute(
+                        "UPDATE outbox SET attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+                        (attempts, time.time() + retry_in, error, entry_id),
+                    )
+            return
+
+        observe_phase("callback_delivery", time.time() - started)
+        CALLBACK_DELIVERIES.labels(outcome="delivered").inc()
+        with db:
+            db.execute("DELETE FROM outbox WHERE id = ?", (entry_id,))
+
+
+_outbox: Optional[CallbackOutbox] = None
+
+
+def get_outbox() -> CallbackOutbox:
+    """Return the process-wide outbox, creating it on first use."""
+    global _outbox
+    if _outbox is None:
+        _outbox = CallbackOutbox()
+    return _outbox
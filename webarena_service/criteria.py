@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Compiled success criteria.
+
+A challenge's ``success_criteria`` string is compiled once (and cached) into
+matchers that are cheap enough to check after every action:
+
+- ``regex:<pattern>``: regular expression searched in the observation text
+- ``any:<a>|<b>|...``: at least one of the literals occurs in the text
+- ``all:<a>|<b>|...``: every literal occurs in the text
+- ``url:<pattern>``: the page URL contains the pattern, or matches it as a
+  glob if it contains ``*`` or ``?``
+- ``node:role=<role>,name=<name>``: the accessibility tree has a node with
+  that role and exact name; ``name~=<text>`` matches part of the name and
+  either key may be left out
+
+Clauses can be combined with `` && ``; a clause without one of these
+prefixes is a plain substring of the observation text. A string that doesn't
+start with a prefix is one substring as a whole, `` && `` included, as before.
+
+URL clauses don't need the accessibility tree, so criteria made only of them
+are checked without extracting it. ``node:`` clauses look up the parsed tree's
+role and name columns, sharing the parse with the rest of the step.
+"""
+
+import abc
+import fnmatch
+import functools
+import os
+import re
+
+from ax_tree import AXTree
+
+# Check tree-based criteria after every action of a batch, not only the last;
+# that extracts an observation after every action, which lazy observations skip
+CRITERIA_EVERY_ACTION = os.environ.get("CRITERIA_EVERY_ACTION", "false").lower() in ("1", "true", "yes")
+
+_PREFIXES = ("regex:", "any:", "all:", "url:", "node:")
+
+
+class CriteriaError(ValueError):
+    """The success criteria can't be compiled."""
+
+
+class Matcher(abc.ABC):
+    needs_tree = True
+    # Whether ``match`` reads the parsed ``AXTree``, not only the text
+    needs_parsed_tree = False
+
+    def __init__(self, source):
+        self.source = source
+
+    @abc.abstractmethod
+    def match(self, url, text, tree=None):
+        """Whether the clause holds for the page URL, observation text and parsed tree."""
+
+
+class SubstringMatcher(Matcher):
+    def match(self, url, text, tree=None):
+        return self.source in text
+
+
+class RegexMatcher(Matcher):
+    def __init__(self, source, pattern):
+        super().__init__(source)
+        try:
+            self.regex = re.compile(pattern, re.MULTILINE)
+        except re.error as e:
+            raise CriteriaError(f"Invalid regex in {source!r}: {e}")
+
+    def match(self, url, text, tree=None):
+        return self.regex.search(text) is not None
+
+
+class LiteralSetMatcher(Matcher):
+    def __init__(self, source, literals, require_all):
+        super().__init__(source)
+        literals = [literal for literal in literals if literal]
+        if not literals:
+            raise CriteriaError(f"No literals in {source!r}")
+        self.literals = literals
+        self.require_all = require_all
+
+    def match(self, url, text, tree=None):
+        # str.__contains__ is a C search per literal, faster than one pass in Python
+        if self.require_all:
+            return all(literal in text for literal in self.literals)
+        return any(literal in text for literal in self.literals)
+
+
+class UrlMatcher(Matcher):
+    needs_tree = False
+
+    def __init__(self, source, pattern):
+        super().__init__(source)
+        self.pattern = pattern
+        self.glob = re.compile(fnmatch.translate(pattern)) if any(c in pattern for c in "*?") else None
+
+    def match(self, url, text, tree=None):
+        url = url or ""
+        if self.glob is not None:
+            return self.glob.match(url) is not None
+        return self.pattern in url
+
+
+class NodeMatcher(Matcher):
+    """Role/name predicate checked against the tree's role and name columns."""
+
+    needs_parsed_tree = True
+
+    def __init__(self, source, spec):
+        super().__init__(source)
+        self.role = None
+        self.name = None
+        self.name_part = None
+        for part in spec.split(","):
+            key, sep, value = part.partition("=")
+            key = key.strip()
+            if not sep or not key:
+                raise CriteriaError(f"Expected key=value in {source!r}")
+            if key == "role":
+                self.role = value.strip()
+            elif key == "name":
+                self.name = value
+            elif key == "name~":
+                self.name_part = value
+            else:
+                raise CriteriaError(f"Unknown node key {key!r} in {source!r}")
+
+    def match(self, url, text, tree=None):
+        # Role and exact name are looked up by the tree; quoting of the name in the text doesn't matter
+        for node in tree.find(role=self.role, name=self.name):
+            if self.name_part is None or self.name_part in node.name:
+                return True
+        return False
+
+
+def _compile_clause(clause):
+    if clause.startswith("regex:"):
+        return RegexMatcher(clause, clause[len("regex:"):])
+    if clause.startswith("any:"):
+        return LiteralSetMatcher(clause, clause[len("any:"):].split("|"), require_all=False)
+    if clause.startswith("all:"):
+        return LiteralSetMatcher(clause, clause[len("all:"):].split("|"), require_all=True)
+    if clause.startswith("url:"):
+        return UrlMatcher(clause, clause[len("url:"):])
+    if clause.startswith("node:"):
+        return NodeMatcher(clause, clause[len("node:"):])
+    return SubstringMatcher(clause)
+
+
+class Criteria:
+    """All clauses of a compiled success criteria; cheap ones are checked first."""
+
+    def __init__(self, source, matchers):
+        self.source = source
+        self.matchers = sorted(matchers, key=lambda m: m.needs_tree)
+        self.needs_tree = any(m.needs_tree for m in matchers)
+
+    def matches(self, url, obs):
+        """Check the page URL and observation; only reads ``obs['text']`` if a clause needs it.
+
+        ``node:`` clauses use ``obs.tree`` when the observation has one, so it is parsed once.
+        """
+        text = tree = None
+        for matcher in self.matchers:
+            if matcher.needs_tree and text is None:
+                text = obs.get("text", "")
+            if matcher.needs_parsed_tree and tree is None:
+                tree = getattr(obs, "tree", None)
+                if not isinstance(tree, AXTree):
+                    tree = AXTree.parse(text)
+            if not matcher.match(url, text, tree):
+                return False
+        return True
+
+
+@functools.lru_cache(maxsize=256)
+def compile_criteria(source: str) -> Criteria:
+    """Compile a success criteria string, raising ``CriteriaError`` if it is malformed."""
+    if not source.startswith(_PREFIXES):
+        return Criteria(source, [SubstringMatcher(source)])
+    return Criteria(source, [_compile_clause(clause.strip()) for clause in source.split(" && ")])
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Throughput and parity check of the sync and async browser engines.
+
+Runs the same evaluation ``--runs`` times on each engine, ``--concurrency`` at
+a time, and reports evaluations per minute and run duration percentiles.
+Parity is checked two ways: the challenge's first observation must be the
+same text on both engines, and every run must end with the same status,
+score and steps taken. Exits with status 1 if parity fails.
+
+    BROWSER_HEADLESS=true BROWSER_SLOW_MO=0 BROWSER_POOL_SIZE=8 ASYNC_BROWSERS=2 ASYNC_CONTEXTS_PER_BROWSER=4 \\
+        python engine_benchmark.py --url http://localhost:3000/mail --criteria "Search results for" \\
+        --agent my_agent.py --runs 32 --concurrency 8
+
+Size ``BROWSER_POOL_SIZE`` and the ``ASYNC_*`` settings to the same
+concurrency for a fair comparison.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import app
+from async_engine import AsyncActivityMonitor, get_engine
+from async_engine import wait_for_page_ready as wait_for_page_ready_async
+from browser_pool import get_pool
+from callback_outbox import get_outbox
+from observation import run_action
+from readiness import PageActivityMonitor, wait_for_page_ready
+
+ENGINES = {
+    "sync": app.test_interactive_elements,
+    "async": app.evaluate_async,
+}
+
+
+class CallbackReceiver:
+    """Local HTTP server collecting the callbacks of the benchmark's evaluations."""
+
+    def __init__(self):
+        self.results = {}
+        self._cond = threading.Condition()
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                self.send_response(200)
+                self.end_headers()
+                with receiver._cond:
+                    receiver.results[body["evaluation_id"]] = body
+                    receiver._cond.notify_all()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/callback"
+
+    def wait(self, evaluation_ids, timeout):
+        deadline = time.time() + timeout
+        with self._cond:
+            while not all(e in self.results for e in evaluation_ids) and time.time() < deadline:
+                self._cond.wait(max(0.0, deadline - time.time()))
+            return [self.results.get(e) for e in evaluation_ids]
+
+
+def first_observation_sync(env, url, ready_selectors):
+    from browser_env import create_id_based_action
+
+    monitor = PageActivityMonitor(env.context)
+    run_action(env, create_id_based_action(f"goto [{url}]"))
+    wait_for_page_ready(monitor, env.page, ready_selectors=ready_selectors)
+    return env._get_obs()["text"]
+
+
+async def first_observation_async(session, url, ready_selectors):
+    monitor = AsyncActivityMonitor(session.context)
+    await monitor.install()
+    await session.execute(f"goto [{url}]")
+    await wait_for_page_ready_async(monitor, session.page, ready_selectors=ready_selectors)
+    return (await session.observe())["text"]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+def benchmark(engine, runner, args, agent_code, receiver):
+    requests = [
+        app.EvaluationRequest(
+            evaluation_id=f"bench-{engine}-{uuid.uuid4().hex[:8]}",
+            agent_code=agent_code,
+            challenge_url=args.url,
+            success_criteria=args.criteria,
+            callback_url=receiver.url,
+            ready_selectors=args.ready_selector or None,
+        )
+        for _ in range(args.runs)
+    ]
+    durations = []
+
+    def timed(request):
+        started = time.perf_counter()
+        runner(request)
+        durations.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        list(executor.map(timed, requests))
+    wall = time.perf_counter() - started
+    results = receiver.wait([r.evaluation_id for r in requests], args.callback_timeout)
+    return {
+        "engine": engine,
+        "runs": args.runs,
+        "wall_time": round(wall, 2),
+        "evaluations_per_minute": round(60 * args.runs / wall, 2),
+        "p50_duration": round(statistics.median(durations), 2),
+        "p95_duration": round(percentile(durations, 0.95), 2),
+        "outcomes": [
+            None if r is None else (r["status"], r["score"], r["steps_taken"]) for r in results
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", required=True, help="Challenge URL")
+    parser.add_argument("--criteria", required=True, help="Success criteria")
+    parser.add_argument("--agent", default="test_agent.py", help="File with the agent's agent_logic")
+    parser.add_argument("--ready-selector", action="append", help="Ready selector (repeatable)")
+    parser.add_argument("--runs", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--callback-timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    with open(args.agent, encoding="utf-8") as f:
+        agent_code = f.read()
+    receiver = CallbackReceiver()
+    get_outbox().start()
+    ok = True
+    try:
+        sync_text = get_pool().run(first_observation_sync, args.url, args.ready_selector)
+        async_text = get_engine().run(first_observation_async, args.url, args.ready_selector)
+        if sync_text != async_text:
+            ok = False
+            print("Observation parity: FAILED")
+            print(f"--- sync ({len(sync_text)} chars)\n{sync_text}\n--- async ({len(async_text)} chars)\n{async_text}")
+        else:
+            print(f"Observation parity: ok ({len(sync_text)} chars)")
+
+        reports = [benchmark(engine, runner, args, agent_code, receiver) for engine, runner in ENGINES.items()]
+        for report in reports:
+            outcomes = report.pop("outcomes")
+            report["outcomes"] = {str(o): outcomes.count(o) for o in set(outcomes)}
+            print(json.dumps(report))
+        if reports[0]["outcomes"] != reports[1]["outcomes"]:
+            ok = False
+            print("Outcome parity: FAILED")
+        else:
+            print("Outcome parity: ok")
+        speedup = reports[1]["evaluations_per_minute"] / reports[0]["evaluations_per_minute"]
+        print(f"Async throughput: {speedup:.2f}x sync")
+    finally:
+        get_pool().shutdown()
+        get_engine().shutdown()
+        get_outbox().stop()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
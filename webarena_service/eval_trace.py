@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Compact evaluation traces and their offline replay.
+
+Every evaluation appends its run to ``TRACE_DIR/<evaluation_id>.trace``: the
+request, each observation with the page URL, what the agent returned, every
+executed or rejected action with its timings, and the outcome. Replaying a
+trace rebuilds every observation without a browser, so a failed evaluation
+can be inspected step by step in milliseconds::
+
+    python eval_trace.py traces/<evaluation_id>.trace
+    python eval_trace.py traces/<evaluation_id>.trace --step 3
+    python eval_trace.py traces/<evaluation_id>.trace --step 3 --diff
+
+File format: the magic ``WATRACE1`` followed by records, each a 4-byte
+big-endian length and that many bytes of one zlib stream, flushed with
+``Z_SYNC_FLUSH`` after every record. A record decompresses to a JSON object
+with its kind ``k`` and its time ``t`` in seconds since the trace started.
+Compressing all records as one stream lets each observation reuse the
+previous ones' text. Observations after the first are stored as line deltas
+against the previous one (unless the full text is smaller). The file is only
+appended to, so a crash leaves every record before the last one readable.
+
+Traces older than ``TRACE_RETENTION`` seconds are deleted, and the oldest ones
+beyond ``TRACE_MAX_MB`` in total, checked in the background as new traces are
+opened.
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from difflib import SequenceMatcher
+from typing import Dict, Iterator, List, Optional
+
+from service_log import get_logger
+
+TRACE_DIR = os.environ.get(
+    "TRACE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "traces")
+)
+TRACE_ENABLED = os.environ.get("TRACE_ENABLED", "true").lower() in ("1", "true", "yes")
+# 0 keeps traces however old, or however large in total
+TRACE_RETENTION = float(os.environ.get("TRACE_RETENTION", str(7 * 24 * 3600)))
+TRACE_MAX_MB = float(os.environ.get("TRACE_MAX_MB", "1024"))
+# Seconds between checks of the trace directory
+TRACE_PRUNE_INTERVAL = 60
+
+# Changed lines between two observations beyond which they aren't diffed line by line
+LINE_DELTA_MAX_LINES = 2000
+
+MAGIC = b"WATRACE1"
+_LENGTH = struct.Struct(">I")
+
+log = get_logger("eval_trace")
+
+_last_prune = 0.0
+_prune_lock = threading.Lock()
+
+
+def trace_path(evaluation_id: str) -> str:
+    path = os.path.join(TRACE_DIR, f"{evaluation_id}.trace")
+    # Evaluation ids come from requests; none may name a file outside TRACE_DIR
+    if os.path.dirname(os.path.abspath(path)) != os.path.abspath(TRACE_DIR):
+        raise ValueError(f"Invalid evaluation id {evaluation_id!r}")
+    return path
+
+
+def prune_traces(trace_dir: str = TRACE_DIR) -> int:
+    """Delete traces past ``TRACE_RETENTION``, then the oldest beyond ``TRACE_MAX_MB``; returns how many."""
+    try:
+        entries = [entry for entry in os.scandir(trace_dir) if entry.name.endswith(".trace") and entry.is_file()]
+        traces = sorted(((entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in entries), reverse=True)
+    except OSError:
+        return 0
+    cutoff = time.time() - TRACE_RETENTION if TRACE_RETENTION > 0 else None
+    budget = TRACE_MAX_MB * 1024 * 1024 if TRACE_MAX_MB > 0 else None
+    total = 0
+    removed = 0
+    # Newest first, so everything past the size budget is older than what is kept
+    for mtime, size, path in traces:
+        total += size
+        if (cutoff is not None and mtime < cutoff) or (budget is not None and total > budget):
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+    if removed:
+        log.info("Pruned traces", extra={"removed": removed, "trace_dir": trace_dir})
+    return removed
+
+
+def _schedule_prune():
+    global _last_prune
+    with _prune_lock:
+        if time.time() - _last_prune < TRACE_PRUNE_INTERVAL:
+            return
+        _last_prune = time.time()
+    threading.Thread(target=prune_traces, name="trace-prune", daemon=True).start()
+
+
+def line_delta(old: List[str], new: List[str]):
+    """``[start, end, lines]`` edits that turn ``old`` into ``new``.
+
+    Lines the two share at the start and end are skipped in linear time, so
+    only the part of the page that changed is diffed; a changed part longer
+    than ``LINE_DELTA_MAX_LINES`` is replaced as one edit instead.
+    """
+    head = 0
+    shortest = min(len(old), len(new))
+    while head < shortest and old[head] == new[head]:
+        head += 1
+    tail = 0
+    while tail < shortest - head and old[-1 - tail] == new[-1 - tail]:
+        tail += 1
+    old_end, new_end = len(old) - tail, len(new) - tail
+    if head == old_end and head == new_end:
+        return []
+    changed = (old_end - head) + (new_end - head)
+    if head == old_end or head == new_end or changed > LINE_DELTA_MAX_LINES:
+        return [[head, old_end, new[head:new_end]]]
+    # SequenceMatcher is quadratic at worst; its junk heuristic keeps repeated lines cheap
+    matcher = SequenceMatcher(None, old[head:old_end], new[head:new_end])
+    return [
+        [head + i1, head + i2, new[head + j1:head + j2]]
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+
+def apply_delta(old: List[str], delta) -> List[str]:
+    lines = []
+    position = 0
+    for start, end, replacement in delta:
+        lines.extend(old[position:start])
+        lines.extend(replacement)
+        position = end
+    lines.extend(old[position:])
+    return lines
+
+
+class TraceWriter:
+    """Appends one evaluation's records to its trace file; a no-op when tracing is off."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._file = None
+        self._compressor = None
+        self._started = time.time()
+        self._last_lines = None
+        if path is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._file = open(path, "wb")
+            self._file.write(MAGIC)
+            self._compressor = zlib.compressobj(6)
+        except OSError:
+            log.exception("Failed to open trace", extra={"path": path})
+            self._file = None
+
+    @property
+    def name(self) -> Optional[str]:
+        return os.path.basename(self.path) if self._file is not None else None
+
+    def write(self, kind: str, **data):
+        if self._file is None:
+            return
+        data["k"] = kind
+        data["t"] = round(time.time() - self._started, 4)
+        payload = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        chunk = self._compressor.compress(payload) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        try:
+            self._file.write(_LENGTH.pack(len(chunk)) + chunk)
+            self._file.flush()
+        except OSError:
+            log.exception("Failed to write trace", extra={"path": self.path})
+            self.close()
+
+    def start(self, request, engine="sync"):
+        from agent_registry import agent_hash
+
+        self.write(
+            "start",
+            evaluation_id=request.evaluation_id,
+            challenge_url=request.challenge_url,
+            success_criteria=request.success_criteria,
+            observation_mode=request.observation_mode,
+            network_mode=request.network_mode,
+            agent_hash=agent_hash(request.agent_code),
+            engine=engine,
+            started_at=self._started,
+        )
+
+    def observation(self, step: int, url: str, obs):
+        """Record the page after ``step`` (0 is the loaded challenge) from its observation dict."""
+        if self._file is None:
+            return
+        text = obs["text"]
+        lines = text.split("\n")
+        if self._last_lines is not None:
+            delta = line_delta(self._last_lines, lines)
+            if sum(len(line) for _, _, new in delta for line in new) < len(text):
+                self._last_lines = lines
+                self.write("observation", step=step, url=url, delta=delta)
+                return
+        self._last_lines = lines
+        self.write("observation", step=step, url=url, text=text)
+
+    def agent(self, step: int, actions, agent_time: float):
+        self.write("agent", step=step, actions=[a if isinstance(a, str) else repr(a) for a in actions],
+                   agent_time=round(agent_time, 4))
+
+    def action(self, step: int, action: str, success: bool, error: str, url: str,
+               step_time: float, settle_time: float):
+        self.write("action", step=step, action=action, success=success, error=error or None, url=url,
+                   step_time=round(step_time, 4), settle_time=round(settle_time, 4))
+
+    def rejected(self, step: int, rejection: dict):
+        self.write("rejected", step=step, **rejection)
+
+    def finish(self, response):
+        self.write(
+            "finish",
+            status=response.status,
+            score=response.score,
+            steps_taken=response.steps_taken,
+            message=response.message,
+            phase_timings=response.phase_timings,
+        )
+        self.close()
+
+    def close(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+
+def open_trace(evaluation_id: str) -> TraceWriter:
+    """Start the evaluation's trace, or a writer that records nothing if tracing is off."""
+    if not TRACE_ENABLED:
+        return TraceWriter(None)
+    _schedule_prune()
+    return TraceWriter(trace_path(evaluation_id))
+
+
+def read_records(path: str) -> Iterator[dict]:
+    """Yield a trace's records in order, stopping at a truncated last record."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an evaluation trace")
+        decompressor = zlib.decompressobj()
+        while True:
+            header = f.read(_LENGTH.size)
+            if len(header) < _LENGTH.size:
+                return
+            (length,) = _LENGTH.unpack(header)
+            chunk = f.read(length)
+            if len(chunk) < length:
+                return
+            yield json.loads(decompressor.decompress(chunk))
+
+
+class TraceStep:
+    """One agent step: what the agent saw and returned, and what happened."""
+
+    def __init__(self, number, observation, url):
+        self.number = number
+        # Observation text and URL the agent was given
+        self.observation = observation
+        self.url = url
+        self.actions = []
+        self.agent_time = None
+        # Executed actions, with success, error, URL and timings
+        self.executed = []
+        self.rejected = []
+
+    def to_dict(self):
+        return {
+            "step": self.number,
+            "url": self.url,
+            "actions": self.actions,
+            "agent_time": self.agent_time,
+            "executed": self.executed,
+            "rejected": self.rejected,
+        }
+
+
+class TraceReplay:
+    """A trace loaded for browserless stepping; every observation is rebuilt in full."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.start: Dict = {}
+        self.finish: Optional[Dict] = None
+        # (url, text) after each step, index 0 being the loaded challenge
+        self.observations: List[tuple] = []
+        self.steps: List[TraceStep] = []
+        lines = None
+        for record in read_records(path):
+            kind = record.pop("k")
+            if kind == "start":
+                self.start = record
+            elif kind == "observation":
+                if "text" in record:
+                    lines = record["text"].split("\n")
+                else:
+                    lines = apply_delta(lines, record["delta"])
+                self.observations.append((record["url"], "\n".join(lines)))
+            elif kind == "agent":
+                url, text = self.observations[-1]
+                step = TraceStep(record["step"], text, url)
+                step.actions = record["actions"]
+                step.agent_time = record["agent_time"]
+                self.steps.append(step)
+            elif kind == "action":
+                self.steps[-1].executed.append(record)
+            elif kind == "rejected":
+                self.steps[-1].rejected.append(record)
+            elif kind == "finish":
+                self.finish = record
+
+    def __iter__(self):
+        return iter(self.steps)
+
+    def __len__(self):
+        return len(self.steps)
+
+    def step(self, number: int) -> TraceStep:
+        return self.steps[number - 1]
+
+    def observation_after(self, number: int) -> str:
+        """Observation text after ``number`` steps (0 is the loaded challenge)."""
+        return self.observations[number][1]
+
+    @property
+    def completed(self):
+        return self.finish is not None
+
+
+def _print_summary(replay: TraceReplay):
+    start = replay.start
+    print(f"{start.get('evaluation_id')}  {start.get('challenge_url')}  criteria={start.get('success_criteria')!r}")
+    for step in replay:
+        print(f"step {step.number}  {step.url}  agent {step.agent_time:.3f}s")
+        for action in step.executed:
+            status = "ok" if action["success"] else f"failed: {action['error']}"
+            print(f"  {action['action']}  ({status}, {action['step_time']:.3f}s + settle {action['settle_time']:.3f}s)")
+        for rejection in step.rejected:
+            print(f"  rejected {rejection['action']}: {rejection['code']} ({rejection['error']})")
+    if replay.finish is None:
+        print("(trace ends without a result)")
+    else:
+        finish = replay.finish
+        print(f"{finish['status']}  score={finish['score']}  steps={finish['steps_taken']}  {finish['message'] or ''}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Step through an evaluation trace without a browser.")
+    parser.add_argument("trace", help="Trace file, or an evaluation id in TRACE_DIR")
+    parser.add_argument("--step", type=int, help="Show the observation the agent was given at this step")
+    parser.add_argument("--diff", action="store_true", help="With --step, show the diff against the previous step")
+    parser.add_argument("--json", action="store_true", help="Print the steps as JSON")
+    args = parser.parse_args(argv)
+
+    path = args.trace if os.path.exists(args.trace) else trace_path(args.trace)
+    replay = TraceReplay(path)
+    if args.json:
+        print(json.dumps({
+            "start": replay.start,
+            "steps": [step.to_dict() for step in replay],
+            "finish": replay.finish,
+        }, indent=2))
+    elif args.step is not None:
+        step = replay.step(args.step)
+        if args.diff and args.step > 1:
+            from ax_tree import AXTree
+            from obs_diff import diff_trees
+
+            previous = replay.step(args.step - 1).observation
+            print(diff_trees(AXTree.parse(previous), AXTree.parse(step.observation)).to_text())
+        else:
+            print(step.observation)
+        print(f"\n# {step.url}\n# actions: {step.actions}")
+    else:
+        _print_summary(replay)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Per-evaluation progress events.
+
+Evaluation threads publish events (step started, action executed, observation
+summary, finished) as they happen; the ``/api/evaluations/{id}/events``
+endpoint streams them to subscribers as Server-Sent Events. Every evaluation
+keeps its event history, so a subscriber that connects late (or reconnects
+with ``Last-Event-ID``) replays what it missed before receiving live events.
+An evaluation has events from the moment it is queued; subscribing to any
+other id is answered with 404. Histories are dropped ``EVENT_RETENTION``
+seconds after the evaluation finishes.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+EVENT_RETENTION = float(os.environ.get("EVENT_RETENTION", "300"))
+# Seconds between SSE keep-alive comments on an idle stream
+EVENT_KEEPALIVE = float(os.environ.get("EVENT_KEEPALIVE", "15"))
+
+FINISHED = "finished"
+
+
+class _Channel:
+    def __init__(self):
+        self.events = []
+        self.subscribers = []
+        self.finished_at = None
+
+
+class EventBus:
+    """Thread-safe fan-out of evaluation events to asyncio subscribers."""
+
+    def __init__(self):
+        self._channels: Dict[str, _Channel] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, evaluation_id: str, event_type: str, data: Optional[Dict[str, Any]] = None):
+        """Record an event and hand it to every live subscriber. Safe from any thread."""
+        with self._lock:
+            self._expire()
+            channel = self._channels.setdefault(evaluation_id, _Channel())
+            event = {
+                "id": len(channel.events) + 1,
+                "type": event_type,
+                "time": time.time(),
+                "data": data or {},
+            }
+            channel.events.append(event)
+            if event_type == FINISHED:
+                channel.finished_at = time.time()
+            subscribers = list(channel.subscribers)
+
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    def exists(self, evaluation_id: str) -> bool:
+        """Whether the evaluation has published events that haven't expired yet."""
+        with self._lock:
+            return evaluation_id in self._channels
+
+    def _expire(self):
+        cutoff = time.time() - EVENT_RETENTION
+        for evaluation_id in [
+            eid for eid, ch in self._channels.items()
+            if ch.finished_at is not None and ch.finished_at < cutoff and not ch.subscribers
+        ]:
+            del self._channels[evaluation_id]
+
+    async def subscribe(self, evaluation_id: str, last_event_id: int = 0):
+        """Yield past events after ``last_event_id``, then live ones until the evaluation finishes.
+
+        Yields nothing for an evaluation without events; only ``publish`` creates channels,
+        so subscribers can't leave behind ones that never expire.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        with self._lock:
+            channel = self._channels.get(evaluation_id)
+            if channel is None:
+                return
+            backlog = [e for e in channel.events if e["id"] > last_event_id]
+            subscriber = (loop, queue)
+            channel.subscribers.append(subscriber)
+
+        try:
+            for event in backlog:
+                yield event
+                if event["type"] == FINISHED:
+                    return
+            seen = backlog[-1]["id"] if backlog else last_event_id
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=EVENT_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if event["id"] <= seen:
+                    continue
+                yield event
+                if event["type"] == FINISHED:
+                    return
+        finally:
+            with self._lock:
+                channel.subscribers.remove(subscriber)
+
+
+def format_sse(event) -> str:
+    """Render an event (or a keep-alive for None) in text/event-stream format."""
+    if event is None:
+        return ": keep-alive\n\n"
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+_bus: Optional[EventBus] = None
+
+
+def get_event_bus() -> EventBus:
+    """Return the process-wide event bus, creating it on first use."""
+    global _bus
+    if _bus is None:
+        _bus = EventBus()
+    return _bus
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Prometheus metrics and per-evaluation phase timing.
+
+Every phase of an evaluation (browser checkout, navigation, readiness wait,
+agent load, each agent call, each env.step, settle waits, the criteria check
+and callback queueing) is timed with ``PhaseTimer``. Each measurement goes to
+the ``evaluation_phase_seconds`` histogram and to a per-evaluation total that
+is attached to the ``EvaluationResponse``. Work that happens outside an
+evaluation (browser launch, context reset, callback delivery) is observed
+directly on the histograms. Everything is exposed on ``/metrics``.
+"""
+
+import contextlib
+import time
+from collections import defaultdict
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Buckets from sub-millisecond checks up to multi-minute evaluations
+_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+PHASE_SECONDS = Histogram(
+    "evaluation_phase_seconds",
+    "Time spent in each phase of an evaluation",
+    ["phase"],
+    buckets=_BUCKETS,
+)
+EVALUATION_SECONDS = Histogram(
+    "evaluation_seconds",
+    "Wall-clock time of whole evaluations, from slot start to result queued",
+    ["status"],
+    buckets=_BUCKETS,
+)
+EVALUATIONS = Counter("evaluations_total", "Finished evaluations", ["status"])
+EVALUATIONS_REJECTED = Counter("evaluations_rejected_total", "Evaluations rejected at admission", ["reason"])
+AGENT_ACTIONS = Counter("agent_actions_total", "Actions executed on behalf of agents")
+ACTIONS_REJECTED = Counter("agent_actions_rejected_total", "Agent actions rejected before reaching the browser", ["code"])
+ROUTED_REQUESTS = Counter("routed_requests_total", "Page requests seen by a routing policy", ["action"])
+ROUTED_KNOWN_BYTES = Counter(
+    "routed_known_bytes_saved_total", "Bytes of blocked or stubbed responses whose size is known"
+)
+CALLBACK_DELIVERIES = Counter("callback_deliveries_total", "Callback delivery attempts", ["outcome"])
+
+QUEUE_DEPTH = Gauge("evaluation_queue_depth", "Evaluations waiting for a scheduler slot")
+RUNNING_EVALUATIONS = Gauge("evaluations_running", "Evaluations occupying a scheduler slot")
+ACTIVE_BROWSERS = Gauge("browsers_active", "Pooled browsers currently running an evaluation")
+READY_BROWSERS = Gauge("browsers_ready", "Pooled browsers launched and available")
+CALLBACKS_PENDING = Gauge("callbacks_pending", "Callbacks waiting in the outbox")
+
+
+def observe_phase(phase, seconds):
+    PHASE_SECONDS.labels(phase=phase).observe(seconds)
+
+
+class PhaseTimer:
+    """Accumulates one evaluation's phase timings while feeding the histograms."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.totals = defaultdict(float)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def record(self, phase, seconds):
+        self.totals[phase] += seconds
+        observe_phase(phase, seconds)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def as_dict(self):
+        return {phase: round(seconds, 4) for phase, seconds in self.totals.items()}
+
+
+def render_latest():
+    """Return the current metrics in Prometheus text format and its content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+HAR record/replay of challenge traffic.
+
+An evaluation's ``network_mode`` decides where its page traffic comes from:
+
+- ``live``: the network, as before
+- ``record``: the network, while every response is captured into an archive
+  for the challenge
+- ``replay``: only the challenge's archive. Requests missing from it are
+  aborted (or sent to the network with ``HAR_NOT_FOUND=fallback``)
+
+Archives are Playwright HAR zips (``context.route_from_har``) whose response
+bodies are stored as separate content-addressed entries. There is one per
+challenge URL under ``NETWORK_ARCHIVE_DIR``, named by the URL's hash.
+Playwright writes the archive when the browser context closes, so a recording
+goes to a temporary file that replaces the archive once the evaluation's
+context has been closed; concurrent recordings of the same challenge can't
+corrupt it.
+
+A challenge's archive also tells routing policies (see ``routing``) how large
+the responses they block would have been.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+import zipfile
+from typing import Dict
+
+from browser_pool import reset_context
+from service_log import get_logger
+
+NETWORK_ARCHIVE_DIR = os.environ.get(
+    "NETWORK_ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "archives")
+)
+HAR_NOT_FOUND = os.environ.get("HAR_NOT_FOUND", "abort")
+
+NETWORK_MODES = ("live", "record", "replay")
+
+log = get_logger("network_archive")
+
+# archive path -> (mtime, sizes by URL)
+_sizes = {}
+_sizes_lock = threading.Lock()
+
+
+class NetworkArchiveError(Exception):
+    """The evaluation's network mode can't be set up."""
+
+
+def archive_path(challenge_url: str) -> str:
+    digest = hashlib.sha256(challenge_url.encode("utf-8")).hexdigest()[:32]
+    return os.path.join(NETWORK_ARCHIVE_DIR, f"{digest}.har.zip")
+
+
+def has_archive(challenge_url: str) -> bool:
+    return os.path.exists(archive_path(challenge_url))
+
+
+def archive_sizes(challenge_url: str) -> Dict[str, int]:
+    """Response body sizes by URL in the challenge's archive; empty if it has none."""
+    path = archive_path(challenge_url)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    with _sizes_lock:
+        cached = _sizes.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    sizes = {}
+    try:
+        with zipfile.ZipFile(path) as archive:
+            name = next((n for n in archive.namelist() if n.endswith(".har")), None)
+            har = json.loads(archive.read(name)) if name is not None else {}
+        for entry in har.get("log", {}).get("entries", []):
+            response = entry.get("response", {})
+            size = response.get("content", {}).get("size", -1)
+            if size is None or size < 0:
+                size = response.get("bodySize", -1)
+            if size is not None and size >= 0:
+                sizes[entry["request"]["url"]] = size
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        log.exception("Failed to read network archive sizes", extra={"path": path})
+    with _sizes_lock:
+        _sizes[path] = (mtime, sizes)
+    return sizes
+
+
+class NetworkArchive:
+    """Routes one evaluation's browser context according to its network mode."""
+
+    def __init__(self, mode: str, challenge_url: str):
+        self.mode = mode
+        self.challenge_url = challenge_url
+        self.path = archive_path(challenge_url)
+        self._recording = None
+
+    def attach(self, context):
+        """Install the HAR routes on a fresh context, before anything navigates."""
+        if self.mode == "replay":
+            if not os.path.exists(self.path):
+                raise NetworkArchiveError(f"No recorded archive for {self.challenge_url}")
+            context.route_from_har(self.path, not_found=HAR_NOT_FOUND)
+        elif self.mode == "record":
+            os.makedirs(NETWORK_ARCHIVE_DIR, exist_ok=True)
+            self._recording = f"{self.path}.{uuid.uuid4().hex}.tmp.zip"
+            context.route_from_har(self._recording, update=True, update_content="attach")
+
+    def finish(self, env):
+        """Close a recording context so Playwright writes the HAR, then publish it."""
+        if self._recording is None:
+            return
+        # Leaves the env on a fresh context, as the pool would before the next checkout
+        reset_context(env)
+        try:
+            os.replace(self._recording, self.path)
+            log.info("Recorded network archive", extra={"challenge_url": self.challenge_url, "path": self.path})
+        except OSError:
+            log.exception("Failed to save network archive", extra={"challenge_url": self.challenge_url})
+        finally:
+            self._recording = None
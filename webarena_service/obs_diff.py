@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Incremental accessibility-tree observations.
+
+With ``observation_mode: "diff"`` an agent receives the full tree on its first
+step and afterwards only what changed since the observation it last saw:
+nodes added, removed or changed, keyed by element id. The diff is computed
+on the parsed ``AXTree`` of both observations; a node counts as changed when
+its role, name, properties or depth differ. The lines before the first node,
+such as the tab list, are compared as one block. The observation's ``.tree``
+always describes the whole page.
+
+An agent can ask for the whole tree again by returning the pseudo-action
+``full_tree``; it is not executed, and the next observation is sent in full.
+The full tree is also sent whenever the diff would not be smaller, e.g. after
+navigating to a different page.
+"""
+
+from ax_tree import AXTree, Observation
+from eval_trace import line_delta
+
+OBSERVATION_MODES = ("full", "diff")
+FULL_TREE_ACTION = "full_tree"
+
+
+class ObservationDiff:
+    """Nodes that differ between two observations, in document order."""
+
+    def __init__(self, header, added, removed, changed):
+        # New header text, or None if unchanged
+        self.header = header
+        # Lines of added and changed nodes, ids of removed ones
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+
+    def to_text(self) -> str:
+        lines = [
+            f"# Observation diff: {len(self.added)} added, "
+            f"{len(self.removed)} removed, {len(self.changed)} changed"
+        ]
+        if self.header is not None:
+            lines.append(self.header)
+        lines.extend(f"+ {line}" for line in self.added)
+        lines.extend(f"- [{element_id}]" for element_id in self.removed)
+        lines.extend(f"~ {line}" for line in self.changed)
+        return "\n".join(lines)
+
+
+def diff_trees(old: AXTree, new: AXTree) -> ObservationDiff:
+    """Compare two parsed trees through their element id indexes."""
+    old_rows = old.row_by_id
+    added = []
+    changed = []
+    for row, element_id in enumerate(new.ids):
+        old_row = old_rows.get(element_id)
+        if old_row is None:
+            added.append(new.line(row))
+        elif (
+            new.names[row] != old.names[old_row]
+            or new.props[row] != old.props[old_row]
+            or new.roles[row] != old.roles[old_row]
+            or new.depths[row] != old.depths[old_row]
+        ):
+            changed.append(new.line(row))
+    new_rows = new.row_by_id
+    removed = [element_id for element_id in old.ids if element_id not in new_rows]
+    return ObservationDiff(
+        new.header if new.header != old.header else None, added, removed, changed
+    )
+
+
+class ObservationTracker:
+    """Turns one evaluation's observations into what its agent should receive."""
+
+    def __init__(self, mode="full"):
+        self.mode = mode
+        self._last = None
+        self._last_text = None
+        self._full_requested = False
+
+    def request_full_tree(self):
+        self._full_requested = True
+
+    def render(self, obs, errors=None) -> Observation:
+        """The ``Observation`` to give the agent for the page's current state."""
+        text = obs["text"]
+        tree = obs.tree
+        if self.mode != "diff":
+            # Only the text goes to a worker process; it re-parses the tree if read
+            return Observation(text, tree, errors=errors)
+        last, self._last = self._last, tree
+        last_text, self._last_text = self._last_text, text
+        if last is None or self._full_requested:
+            self._full_requested = False
+            return Observation(text, tree, errors=errors)
+        diff_text = diff_trees(last, tree).to_text()
+        if len(diff_text) < len(text):
+            # Lets the agent worker rebuild the page text, and the tree from it, without receiving either
+            delta = line_delta(last_text.split("\n"), text.split("\n"))
+            return Observation(diff_text, tree, detached=True, errors=errors, delta=delta)
+        return Observation(text, tree, errors=errors)
+
+
+def split_pseudo_actions(actions, tracker: ObservationTracker):
+    """Handle ``full_tree`` requests and return the actions left to execute."""
+    remaining = []
+    for action in actions:
+        if isinstance(action, str) and action.strip() == FULL_TREE_ACTION:
+            tracker.request_full_tree()
+        else:
+            remaining.append(action)
+    return remaining
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Lazily extracted observations and observation-free action execution.
+
+``env.step`` extracts a full observation (accessibility tree, screenshot and
+page content) after every action, although within a multi-action batch only
+the observation after the last action is ever used. ``execute_action_only``
+runs an action the way ``env.step`` does but skips that extraction, and
+``LazyObservation`` extracts the observation only when it is first read, by
+the agent, the success check or a debug dump.
+
+Actions are validated against the tree the agent was given, but executed
+against the last observation the env extracted. That is the agent's own,
+unless something read an intermediate one: ``CRITERIA_EVERY_ACTION=true``
+with criteria that need the tree, or ``LAZY_OBSERVATIONS=false``, under
+which every action goes through ``env.step`` as before.
+"""
+
+import os
+from collections.abc import Mapping
+
+from ax_tree import AXTree
+
+LAZY_OBSERVATIONS = os.environ.get("LAZY_OBSERVATIONS", "true").lower() in ("1", "true", "yes")
+
+
+class LazyObservation(Mapping):
+    """Read-only observation dict that calls ``env._get_obs()`` on first access.
+
+    The observation reflects the page when it is first read, so create a new
+    one after acting on the page instead of keeping an old one around.
+    """
+
+    def __init__(self, env, timer=None):
+        self._env = env
+        self._timer = timer
+        self._obs = None
+        self._tree = None
+
+    @classmethod
+    def of(cls, obs, timer=None):
+        """Wrap an observation that was already extracted, e.g. by ``env.step``."""
+        lazy = cls(None, timer)
+        lazy._obs = obs
+        return lazy
+
+    @property
+    def materialized(self):
+        return self._obs is not None
+
+    def materialize(self):
+        """Extract the observation now, if that hasn't happened yet, and return it."""
+        if self._obs is None:
+            if self._timer is not None:
+                with self._timer.phase("observation"):
+                    self._obs = self._env._get_obs()
+            else:
+                self._obs = self._env._get_obs()
+        return self._obs
+
+    def __getitem__(self, key):
+        return self.materialize()[key]
+
+    def __iter__(self):
+        return iter(self.materialize())
+
+    def __len__(self):
+        return len(self.materialize())
+
+    @property
+    def tree(self) -> AXTree:
+        """The observation's accessibility tree, parsed once."""
+        if self._tree is None:
+            text = self["text"]
+            if self._timer is not None:
+                with self._timer.phase("tree_parse"):
+                    self._tree = AXTree.parse(text)
+            else:
+                self._tree = AXTree.parse(text)
+        return self._tree
+
+    def to_dict(self):
+        return dict(self.materialize())
+
+
+def execute_action_only(env, action):
+    """Run ``action`` on the env's page like ``env.step`` without extracting an observation.
+
+    Like ``env.step`` a failing action doesn't raise; returns ``(success, error)``.
+    """
+    from browser_env import execute_action
+
+    if not env.reset_finished:
+        raise RuntimeError("Call reset first before calling step.")
+    try:
+        env.page = execute_action(
+            action, env.page, env.context, env.observation_handler.action_processor
+        )
+    except Exception as e:
+        return False, str(e)
+    return True, ""
+
+
+def run_action(env, action, timer=None):
+    """Execute one action and return a (lazy) observation of the page afterwards."""
+    if LAZY_OBSERVATIONS:
+        success, error = execute_action_only(env, action)
+        return LazyObservation(env, timer), success, error
+    obs, reward, terminated, truncated, info = env.step(action)
+    return LazyObservation.of(obs), bool(reward), info.get("fail_error", "")
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Event-driven page readiness detection.
+
+Instead of polling the accessibility tree for "loading" strings, readiness is
+decided from browser signals:
+
+- network idle: no request has been in flight for ``NETWORK_IDLE_MS``
+  (tracked from the context's request events)
+- DOM quiescence: no mutation seen by a MutationObserver for ``READY_QUIET_MS``
+- optional per-challenge ready selectors that must be visible
+
+All checks run on a short poll of cheap ``page.evaluate`` calls, so a fast
+page is reported ready as soon as it is stable.
+"""
+
+import os
+import time
+from typing import List, Optional
+
+READY_TIMEOUT = float(os.environ.get("READY_TIMEOUT", "60"))
+READY_QUIET_MS = int(os.environ.get("READY_QUIET_MS", "500"))
+NETWORK_IDLE_MS = int(os.environ.get("NETWORK_IDLE_MS", "500"))
+READY_POLL_MS = int(os.environ.get("READY_POLL_MS", "50"))
+# Requests open longer than this (long polls, event streams) don't block idleness
+LONG_REQUEST_MS = int(os.environ.get("LONG_REQUEST_MS", "5000"))
+# Post-action settle detection: ceiling in seconds and the quiet windows it waits for
+SETTLE_TIMEOUT = float(os.environ.get("SETTLE_TIMEOUT", "5"))
+SETTLE_QUIET_MS = int(os.environ.get("SETTLE_QUIET_MS", "200"))
+SETTLE_NETWORK_IDLE_MS = int(os.environ.get("SETTLE_NETWORK_IDLE_MS", "200"))
+
+# Installed in every document of the context; records when the DOM last changed
+MUTATION_TRACKER_JS = """
+(() => {
+  if (window.__agentEvalActivity) return;
+  const state = window.__agentEvalActivity = { lastMutation: performance.now(), mutations: 0 };
+  new MutationObserver(() => {
+    state.lastMutation = performance.now();
+    state.mutations += 1;
+  }).observe(document, { subtree: true, childList: true, attributes: true, characterData: true });
+})();
+"""
+
+PAGE_STATE_JS = """
+() => {
+  const state = window.__agentEvalActivity;
+  return {
+    readyState: document.readyState,
+    quietMs: state ? performance.now() - state.lastMutation : 0,
+    mutations: state ? state.mutations : 0,
+    tracked: !!state,
+  };
+}
+"""
+
+
+class PageActivityMonitor:
+    """Tracks in-flight requests and DOM mutations for every page of a browser context."""
+
+    def __init__(self, context):
+        self._track(context)
+        context.add_init_script(MUTATION_TRACKER_JS)
+
+    def _track(self, context):
+        self.context = context
+        self._inflight = {}
+        self._last_network_activity = time.time()
+        self.requests_seen = 0
+        context.on("request", self._on_request)
+        context.on("requestfinished", self._on_request_done)
+        context.on("requestfailed", self._on_request_done)
+
+    def _on_request(self, request):
+        self.requests_seen += 1
+        self._inflight[request] = time.time()
+        self._last_network_activity = time.time()
+
+    def _on_request_done(self, request):
+        self._inflight.pop(request, None)
+        self._last_network_activity = time.time()
+
+    def network_idle_ms(self):
+        """Milliseconds since the last network activity, or 0 while requests are pending."""
+        now = time.time()
+        pending = [t for t in self._inflight.values() if (now - t) * 1000 < LONG_REQUEST_MS]
+        if pending:
+            return 0
+        return (now - self._last_network_activity) * 1000
+
+    def page_state(self, page):
+        """Return document readiness and how long the DOM has been quiet."""
+        try:
+            state = page.evaluate(PAGE_STATE_JS)
+        except Exception:
+            # Navigation in progress destroys the execution context
+            return {"readyState": "loading", "quietMs": 0, "mutations": 0, "tracked": False}
+        if not state["tracked"]:
+            # Page predates the init script, install the tracker now
+            try:
+                page.evaluate(MUTATION_TRACKER_JS)
+            except Exception:
+                pass
+        return state
+
+    def is_stable(self, page, quiet_ms, idle_ms):
+        state = self.page_state(page)
+        return (
+            state["readyState"] != "loading"
+            and state["tracked"]
+            and state["quietMs"] >= quiet_ms
+            and self.network_idle_ms() >= idle_ms
+        )
+
+    def wait_until_stable(self, page, timeout, quiet_ms=READY_QUIET_MS, idle_ms=NETWORK_IDLE_MS):
+        """
+        Block until the page is stable or ``timeout`` seconds pass.
+
+        Returns True if the page became stable. ``page.wait_for_timeout`` is used
+        between checks so Playwright keeps dispatching request events.
+        """
+        deadline = time.time() + timeout
+        while True:
+            if self.is_stable(page, quiet_ms, idle_ms):
+                return True
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            page.wait_for_timeout(min(READY_POLL_MS, remaining * 1000))
+
+
+class ReadinessResult:
+    """Outcome of a readiness wait."""
+
+    def __init__(self, ready, load_time, reason):
+        self.ready = ready
+        # Seconds from the start of the wait until the page was stable
+        self.load_time = load_time
+        self.reason = reason
+
+
+def wait_for_page_ready(monitor: PageActivityMonitor, page, timeout=READY_TIMEOUT,
+                        ready_selectors: Optional[List[str]] = None) -> ReadinessResult:
+    """Wait for the page to load, show its ready selectors and become stable."""
+    started = time.time()
+
+    def remaining_ms():
+        # Playwright treats a timeout of 0 as "no timeout", so never go below 1ms
+        return max(1, (started + timeout - time.time()) * 1000)
+
+    try:
+        page.wait_for_load_state("domcontentloaded", timeout=remaining_ms())
+    except Exception:
+        return ReadinessResult(False, time.time() - started, "document did not load")
+
+    for selector in ready_selectors or []:
+        try:
+            page.wait_for_selector(selector, state="visible", timeout=remaining_ms())
+        except Exception:
+            return ReadinessResult(False, time.time() - started, f"selector not visible: {selector}")
+
+    if not monitor.wait_until_stable(page, remaining_ms() / 1000):
+        return ReadinessResult(False, time.time() - started, "page did not settle")
+
+    return ReadinessResult(True, time.time() - started, "stable")
+
+
+class SettleResult:
+    """Outcome of waiting for the page to settle after an action."""
+
+    def __init__(self, settled, settle_time, changed):
+        self.settled = settled
+        # Seconds spent waiting for the page to go quiet
+        self.settle_time = settle_time
+        # Whether navigation, requests or DOM mutations happened while waiting
+        self.changed = changed
+
+
+def wait_for_settle(monitor: PageActivityMonitor, page, ceiling=SETTLE_TIMEOUT) -> SettleResult:
+    """
+    Wait after an action until navigation, network and DOM activity stop.
+
+    Unlike a fixed sleep this returns after ``SETTLE_QUIET_MS`` when nothing
+    happens, and never waits longer than ``ceiling`` seconds.
+    """
+    started = time.time()
+    url = page.url
+    before = monitor.page_state(page)
+    requests_before = monitor.requests_seen
+
+    settled = monitor.wait_until_stable(
+        page, ceiling, quiet_ms=SETTLE_QUIET_MS, idle_ms=SETTLE_NETWORK_IDLE_MS
+    )
+
+    after = monitor.page_state(page)
+    changed = (
+        page.url != url
+        or monitor.requests_seen != requests_before
+        or after["mutations"] != before["mutations"]
+    )
+    return SettleResult(settled, time.time() - started, changed)
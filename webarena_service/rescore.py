@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Re-score past evaluations against new success criteria, from their traces.
+
+When a challenge's ``success_criteria`` change, its evaluations are scored
+again from the observations recorded in their traces (see ``eval_trace``)
+instead of being re-run in a browser. Traces are re-scored in parallel
+across ``--workers`` processes and changed scores are written back through
+the backend's ``PATCH /api/evaluations/:id``::
+
+    python rescore.py --challenge <challenge_id>
+    python rescore.py --challenge <challenge_id> --criteria "url:*/sent && Message sent" --dry-run
+    python rescore.py --criteria "Search results for" traces/*.trace
+
+An evaluation now succeeds at the first step whose observation (and URL)
+meets the criteria, exactly as the live check after each step would. A run
+only has the steps it took: one that stopped because the old criteria were
+met, and doesn't meet the new ones within those steps, is scored as failed
+and reported as ``truncated``, since re-running it might still succeed.
+
+The trials of a multi-trial evaluation (see ``trials``) have no backend row of
+their own: their traces are re-scored one by one and written back as the one
+evaluation they belong to, aggregated as its callback did.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import requests
+
+from criteria import compile_criteria, CriteriaError
+from eval_trace import TraceReplay, trace_path
+from trials import TRIALS_MAX, parent_id, trial_id
+
+BACKEND_URL = os.environ.get("BACKEND_URL", "http://localhost:3000")
+RESCORE_WORKERS = int(os.environ.get("RESCORE_WORKERS", str(os.cpu_count() or 1)))
+# Seconds allowed for each backend request
+RESCORE_TIMEOUT = float(os.environ.get("RESCORE_TIMEOUT", "10"))
+
+
+def rescore_trace(path: str, criteria_source: str) -> dict:
+    """Score one trace against the criteria; runs in a worker process."""
+    criteria = compile_criteria(criteria_source)
+    evaluation_id = os.path.basename(path).split(".")[0]
+    try:
+        replay = TraceReplay(path)
+    except (OSError, ValueError, zlib.error) as e:
+        return {"evaluation_id": evaluation_id, "error": str(e)}
+    result = {
+        "evaluation_id": replay.start.get("evaluation_id") or evaluation_id,
+        "status": "failed",
+        "score": 0,
+        "steps_taken": 0,
+        "truncated": False,
+        "previous": {field: (replay.finish or {}).get(field) for field in ("status", "score", "steps_taken")},
+    }
+    # Observation 0 is the loaded challenge, which the live check never scores
+    for step in range(1, len(replay.observations)):
+        url, text = replay.observations[step]
+        if criteria.matches(url, {"text": text}):
+            result.update(status="completed", score=100, steps_taken=step)
+            return result
+    previous = replay.finish or {}
+    result["truncated"] = previous.get("status") == "completed"
+    return result
+
+
+def _aggregate(runs):
+    """Status, score, steps and success rate of an evaluation from its trials' ones."""
+    completed = [run for run in runs if run["status"] == "completed"]
+    steps = [run["steps_taken"] or 0 for run in completed]
+    return {
+        "status": "completed" if completed else "failed",
+        "score": round(statistics.fmean(run["score"] or 0 for run in runs), 2),
+        "steps_taken": round(statistics.median(steps)) if steps else 0,
+        "accuracy": round(len(completed) / len(runs), 4),
+    }
+
+
+def merge_trials(results):
+    """Replace the results of trials with one result for the evaluation they belong to."""
+    merged, trials = [], {}
+    for result in results:
+        evaluation_id = parent_id(result["evaluation_id"])
+        if evaluation_id is None:
+            merged.append(result)
+        else:
+            trials.setdefault(evaluation_id, []).append(result)
+    for evaluation_id, runs in trials.items():
+        # Scoring the rest of the trials would change the evaluation's success rate
+        unreadable = next((run for run in runs if "error" in run), None)
+        if unreadable is not None:
+            merged.append({"evaluation_id": evaluation_id,
+                           "error": f"{unreadable['evaluation_id']}: {unreadable['error']}"})
+            continue
+        previous = _aggregate([run["previous"] for run in runs])
+        merged.append({
+            "evaluation_id": evaluation_id,
+            **_aggregate(runs),
+            "truncated": any(run["truncated"] for run in runs),
+            "trials": len(runs),
+            "previous": {field: previous[field] for field in ("status", "score", "steps_taken")},
+        })
+    return merged
+
+
+def _changed(result):
+    return any(result["previous"][field] != result[field] for field in ("status", "score", "steps_taken"))
+
+
+def fetch_challenge_traces(session, challenge_id):
+    """The challenge's criteria, its evaluations' trace paths and stored scores, and ids without a trace."""
+    response = session.get(f"{BACKEND_URL}/api/challenges/{challenge_id}", timeout=RESCORE_TIMEOUT)
+    response.raise_for_status()
+    criteria = response.json()["success_criteria"]
+    response = session.get(f"{BACKEND_URL}/api/evaluations/challenge/{challenge_id}", timeout=RESCORE_TIMEOUT)
+    response.raise_for_status()
+    paths, stored, missing = [], {}, []
+    for evaluation in response.json():
+        found = [trace_path(evaluation["id"])]
+        if not os.path.exists(found[0]):
+            # A multi-trial evaluation only has its trials' traces
+            found = [trace_path(trial_id(evaluation["id"], trial)) for trial in range(1, TRIALS_MAX + 1)]
+            found = [path for path in found if os.path.exists(path)]
+        if found:
+            paths.extend(found)
+            stored[evaluation["id"]] = {field: evaluation.get(field) for field in ("status", "score", "steps_taken")}
+        else:
+            missing.append(evaluation["id"])
+    return criteria, paths, stored, missing
+
+
+def rescore(paths, criteria_source, workers=RESCORE_WORKERS):
+    """Re-score traces in parallel, returning one result per trace."""
+    if workers <= 1 or len(paths) <= 1:
+        return [rescore_trace(path, criteria_source) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, len(paths) // (workers * 4))
+        return list(executor.map(rescore_trace, paths, [criteria_source] * len(paths), chunksize=chunksize))
+
+
+def write_back(session, results):
+    """PATCH changed scores to the backend; returns the ids that failed."""
+    failed = []
+    for result in results:
+        fields = ("status", "score", "steps_taken") + (("accuracy",) if "trials" in result else ())
+        try:
+            response = session.patch(
+                f"{BACKEND_URL}/api/evaluations/{result['evaluation_id']}",
+                json={field: result[field] for field in fields},
+                timeout=RESCORE_TIMEOUT,
+            )
+            response.raise_for_status()
+        except requests.RequestException as e:
+            print(f"Failed to update {result['evaluation_id']}: {e}", file=sys.stderr)
+            failed.append(result["evaluation_id"])
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-score evaluations from their traces.")
+    parser.add_argument("traces", nargs="*", help="Trace files (instead of --challenge)")
+    parser.add_argument("--challenge", help="Re-score every evaluation of this challenge")
+    parser.add_argument("--criteria", help="Criteria to apply (default: the challenge's current ones)")
+    parser.add_argument("--workers", type=int, default=RESCORE_WORKERS)
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing them back")
+    parser.add_argument("--json", action="store_true", help="Print every result as a JSON line")
+    args = parser.parse_args(argv)
+    if bool(args.challenge) == bool(args.traces):
+        parser.error("give either --challenge or trace files")
+    if args.traces and not args.criteria:
+        parser.error("--criteria is required with trace files")
+
+    session = requests.Session()
+    stored, missing = {}, []
+    if args.challenge:
+        criteria_source, paths, stored, missing = fetch_challenge_traces(session, args.challenge)
+        criteria_source = args.criteria or criteria_source
+    else:
+        criteria_source, paths = args.criteria, args.traces
+    try:
+        compile_criteria(criteria_source)
+    except CriteriaError as e:
+        parser.error(f"invalid criteria: {e}")
+
+    started = time.perf_counter()
+    results = merge_trials(rescore(paths, criteria_source, args.workers))
+    elapsed = time.perf_counter() - started
+    unreadable = [result for result in results if "error" in result]
+    for result in unreadable:
+        print(f"Skipping unreadable trace of {result['evaluation_id']}: {result['error']}", file=sys.stderr)
+    results = [result for result in results if "error" not in result]
+    # Compare with what the backend has, which may differ from the trace's original result
+    for result in results:
+        if result["evaluation_id"] in stored:
+            result["previous"] = stored[result["evaluation_id"]]
+
+    changed = [result for result in results if _changed(result)]
+    if args.json:
+        for result in results:
+            print(json.dumps(result))
+    failed = [] if args.dry_run else write_back(session, changed)
+    print(json.dumps({
+        "criteria": criteria_source,
+        "rescored": len(results),
+        "changed": len(changed),
+        "completed": sum(1 for r in results if r["status"] == "completed"),
+        "truncated": sum(1 for r in results if r["truncated"]),
+        "missing_traces": len(missing),
+        "unreadable_traces": len(unreadable),
+        "written": 0 if args.dry_run else len(changed) - len(failed),
+        "write_failures": len(failed),
+        "seconds": round(elapsed, 3),
+    }))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Per-challenge request routing policies.
+
+The accessibility-tree observation never uses images, fonts, media or
+analytics, yet loading them delays readiness and settle detection. A routing
+policy, given per evaluation as ``routing_policy`` (or service-wide through
+``ROUTING_POLICY``), is installed with ``context.route`` before the challenge
+loads::
+
+    {
+      "preset": "lean",
+      "block_resource_types": ["image", "font", "media"],
+      "block_domains": ["google-analytics.com"],
+      "stub": [{"url": "*/api/track*", "status": 204}],
+      "allow": ["*/logo.svg"]
+    }
+
+Requests matching ``allow`` always go through, then ``stub`` entries are
+fulfilled locally, then blocked domains and resource types are aborted. The
+``lean`` preset blocks images, fonts, media and well-known trackers.
+
+Each evaluation reports the requests it blocked and stubbed. A blocked
+response is never downloaded, so its size is taken from the challenge's
+recorded network archive, or from a response to the same URL seen earlier in
+this process: ``known_bytes_saved`` adds up the sizes found, and
+``unknown_size`` counts the requests it leaves out.
+"""
+
+import fnmatch
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import urlsplit
+
+from metrics import ROUTED_KNOWN_BYTES, ROUTED_REQUESTS
+
+ROUTING_POLICY = os.environ.get("ROUTING_POLICY", "")
+# Number of URLs whose response size is remembered for the known-bytes-saved report
+ROUTING_SIZE_CACHE = int(os.environ.get("ROUTING_SIZE_CACHE", "10000"))
+
+RESOURCE_TYPES = (
+    "document", "stylesheet", "image", "media", "font", "script", "texttrack",
+    "xhr", "fetch", "eventsource", "websocket", "manifest", "other",
+)
+KNOWN_TRACKERS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "facebook.net", "connect.facebook.net", "hotjar.com", "segment.io", "segment.com",
+    "mixpanel.com", "amplitude.com", "fullstory.com", "clarity.ms", "newrelic.com", "nr-data.net",
+)
+PRESETS = {
+    "lean": {
+        "block_resource_types": ["image", "font", "media"],
+        "block_domains": list(KNOWN_TRACKERS),
+    },
+}
+
+
+class RoutingPolicyError(ValueError):
+    """The routing policy is malformed."""
+
+
+_DEFAULT_POLICY = json.loads(ROUTING_POLICY) if ROUTING_POLICY else None
+
+
+def _strings(spec, field):
+    values = spec.get(field, [])
+    if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+        raise RoutingPolicyError(f"{field} must be a list of strings")
+    return values
+
+
+class RoutingPolicy:
+    """A validated routing policy."""
+
+    def __init__(self, spec: dict):
+        if not isinstance(spec, dict):
+            raise RoutingPolicyError("routing_policy must be an object")
+        preset = spec.get("preset")
+        if preset is not None and (not isinstance(preset, str) or preset not in PRESETS):
+            raise RoutingPolicyError(f"Unknown preset {preset!r}; expected one of: {', '.join(PRESETS)}")
+        base = PRESETS.get(preset, {})
+
+        self.block_resource_types = frozenset(
+            base.get("block_resource_types", []) + _strings(spec, "block_resource_types")
+        )
+        unknown = self.block_resource_types - set(RESOURCE_TYPES)
+        if unknown:
+            raise RoutingPolicyError(f"Unknown resource types: {', '.join(sorted(unknown))}")
+        self.block_domains = tuple(
+            d.lower().lstrip(".") for d in base.get("block_domains", []) + _strings(spec, "block_domains")
+        )
+        allow = _strings(spec, "allow")
+        self.allow = re.compile("|".join(fnmatch.translate(p) for p in allow)) if allow else None
+
+        stubs = spec.get("stub", [])
+        if not isinstance(stubs, list):
+            raise RoutingPolicyError("stub must be a list")
+        self.stubs = []
+        for stub in stubs:
+            if not isinstance(stub, dict) or not isinstance(stub.get("url"), str):
+                raise RoutingPolicyError("stub entries must be objects with a url pattern")
+            status = stub.get("status", 200)
+            if not isinstance(status, int) or not 100 <= status <= 599:
+                raise RoutingPolicyError(f"Invalid stub status {status!r}")
+            self.stubs.append((
+                re.compile(fnmatch.translate(stub["url"])),
+                status,
+                str(stub.get("body", "")),
+                stub.get("content_type", "text/plain"),
+            ))
+
+    @property
+    def empty(self):
+        return not (self.block_resource_types or self.block_domains or self.stubs)
+
+    def _blocked_domain(self, host):
+        return any(host == d or host.endswith("." + d) for d in self.block_domains)
+
+    def decide(self, url, resource_type):
+        """Return ``("allow" | "stub" | "block", detail)`` for a request."""
+        if self.allow is not None and self.allow.match(url):
+            return "allow", None
+        for pattern, status, body, content_type in self.stubs:
+            if pattern.match(url):
+                return "stub", (status, body, content_type)
+        if resource_type in self.block_resource_types:
+            return "block", f"type:{resource_type}"
+        if self.block_domains and self._blocked_domain((urlsplit(url).hostname or "").lower()):
+            return "block", "domain"
+        return "allow", None
+
+
+def parse_policy(spec) -> Optional[RoutingPolicy]:
+    """Validate a request's policy, falling back to ``ROUTING_POLICY``; None if it routes nothing."""
+    if spec is None:
+        spec = _DEFAULT_POLICY
+    if spec is None:
+        return None
+    policy = RoutingPolicy(spec)
+    return None if policy.empty else policy
+
+
+class _SizeCache:
+    """Response sizes of recently loaded URLs, from their Content-Length."""
+
+    def __init__(self, size):
+        self.size = size
+        self._sizes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, url, length):
+        with self._lock:
+            self._sizes[url] = length
+            self._sizes.move_to_end(url)
+            if len(self._sizes) > self.size:
+                self._sizes.popitem(last=False)
+
+    def get(self, url):
+        with self._lock:
+            return self._sizes.get(url)
+
+
+_sizes = _SizeCache(ROUTING_SIZE_CACHE)
+
+
+def record_response_size(response):
+    length = response.headers.get("content-length")
+    if length and length.isdigit():
+        _sizes.record(response.url, int(length))
+
+
+class RequestRouter:
+    """Applies a policy to one evaluation's context and counts what it saved."""
+
+    def __init__(self, policy: RoutingPolicy, archive_sizes=None):
+        self.policy = policy
+        # URL -> response size recorded in the challenge's network archive
+        self.archive_sizes = archive_sizes or {}
+        self.blocked = 0
+        self.stubbed = 0
+        self.known_bytes_saved = 0
+        self.unknown_size = 0
+        self.reasons = {}
+
+    def attach(self, context):
+        """Install the policy; on an async context, returns the awaitable ``context.route``."""
+        context.on("response", record_response_size)
+        # Registered after any HAR routes, so it runs first and falls back to them
+        return context.route("**/*", self._handle)
+
+    def _handle(self, route, request):
+        # Returns the route call so async contexts await it; sync ones get None
+        action, detail = self.policy.decide(request.url, request.resource_type)
+        ROUTED_REQUESTS.labels(action=action).inc()
+        if action == "allow":
+            return route.fallback()
+
+        size = _sizes.get(request.url)
+        if size is None:
+            size = self.archive_sizes.get(request.url)
+        if size is None:
+            self.unknown_size += 1
+        else:
+            self.known_bytes_saved += size
+            ROUTED_KNOWN_BYTES.inc(size)
+        if action == "stub":
+            self.stubbed += 1
+            status, body, content_type = detail
+            return route.fulfill(status=status, body=body, content_type=content_type)
+        self.blocked += 1
+        self.reasons[detail] = self.reasons.get(detail, 0) + 1
+        return route.abort("blockedbyclient")
+
+    def report(self):
+        return {
+            "blocked": self.blocked,
+            "stubbed": self.stubbed,
+            "known_bytes_saved": self.known_bytes_saved,
+            "unknown_size": self.unknown_size,
+            "blocked_by": dict(self.reasons),
+        }
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Bounded evaluation scheduler with admission control.
+
+A fixed number of slot threads pull evaluations from a FIFO queue. When the
+queue already holds ``max_queue`` evaluations new submissions are rejected
+with ``QueueFull`` so the API can answer 429 instead of opening more browsers
+than the host can run.
+
+A batch is queued as one entry but counts as all of its evaluations against
+``max_queue``: once it reaches the head of the queue its evaluations are
+handed to free slots in order, ahead of anything submitted after it. An
+evaluation of a batch can be held back until another one of the batch has
+finished (e.g. until the first evaluation of a challenge has captured the
+snapshot the others start from); while a batch only has held evaluations
+left, slots move on to the entries behind it.
+"""
+
+import collections
+import os
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from async_engine import ASYNC_CAPACITY, BROWSER_ENGINE
+from browser_pool import BROWSER_POOL_SIZE
+from metrics import observe_phase
+from service_log import get_logger
+
+# Scheduler configuration (overridable through environment variables)
+# Slots only wait on the async engine, so its capacity is the natural default there
+EVAL_CONCURRENCY = int(os.environ.get(
+    "EVAL_CONCURRENCY", str(ASYNC_CAPACITY if BROWSER_ENGINE == "async" else BROWSER_POOL_SIZE)
+))
+EVAL_QUEUE_MAX = int(os.environ.get("EVAL_QUEUE_MAX", "20"))
+# Assumed evaluation duration (seconds) until real ones have been measured
+EVAL_DURATION_ESTIMATE = float(os.environ.get("EVAL_DURATION_ESTIMATE", "60"))
+
+log = get_logger("scheduler")
+
+
+class QueueFull(Exception):
+    """Raised when an evaluation is submitted while the queue is at capacity."""
+
+    def __init__(self, depth, retry_after):
+        super().__init__(f"Evaluation queue is full ({depth} waiting)")
+        self.depth = depth
+        self.retry_after = retry_after
+
+
+class Admission:
+    """Where a newly accepted evaluation landed in the queue."""
+
+    def __init__(self, position, depth, started):
+        # Number of evaluations that will start before this one
+        self.position = position
+        # Number of evaluations waiting for a slot, including this one
+        self.depth = depth
+        # Whether a slot was free, so the evaluation starts right away
+        self.started = started
+
+
+class _Batch:
+    """A queued batch; each job is ``(job_id, fn, args, kwargs, after)``."""
+
+    def __init__(self, batch_id, jobs, queued_at):
+        self.job_id = batch_id
+        self.jobs = list(jobs)
+        self.queued_at = queued_at
+        self.finished = set()
+
+    def take(self):
+        """Remove and return the first job that isn't waiting on an unfinished one, or None."""
+        for i, job in enumerate(self.jobs):
+            if job[4] is None or job[4] in self.finished:
+                return self.jobs.pop(i)
+        return None
+
+
+class EvaluationScheduler:
+    """Runs at most ``concurrency`` evaluations at once, FIFO, with a bounded queue."""
+
+    def __init__(self, concurrency=EVAL_CONCURRENCY, max_queue=EVAL_QUEUE_MAX):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._slots = []
+        self._running = 0
+        self._stopped = False
+        # Moving average of evaluation wall-clock time, used for Retry-After
+        self._avg_duration = EVAL_DURATION_ESTIMATE
+
+    def start(self):
+        with self._cond:
+            if self._slots:
+                return
+            self._stopped = False
+            for i in range(self.concurrency):
+                slot = threading.Thread(target=self._slot_loop, name=f"eval-slot-{i}", daemon=True)
+                slot.start()
+                self._slots.append(slot)
+
+    def submit(self, job_id: str, fn: Callable[..., Any], *args, **kwargs) -> Admission:
+        """Queue ``fn(*args, **kwargs)``, or raise ``QueueFull`` if there is no room."""
+        self.start()
+        with self._cond:
+            waiting = self._waiting()
+            if waiting >= self.max_queue:
+                raise QueueFull(waiting, self.retry_after())
+            started = self._running + waiting < self.concurrency
+            self._queue.append((job_id, fn, args, kwargs, time.time()))
+            self._cond.notify()
+            return Admission(position=waiting, depth=waiting + 1, started=started)
+
+    def submit_batch(self, batch_id: str, jobs) -> Admission:
+        """Queue a batch of ``(job_id, fn, args, kwargs, after)`` jobs as one entry.
+
+        ``after`` is None or the id of a job of the same batch that must finish
+        before this one starts. Raises ``QueueFull`` if the queue has no room
+        for all of the batch's jobs.
+        """
+        self.start()
+        with self._cond:
+            waiting = self._waiting()
+            if waiting + len(jobs) > self.max_queue:
+                raise QueueFull(waiting, self.retry_after())
+            started = self._running + waiting < self.concurrency
+            self._queue.append(_Batch(batch_id, jobs, time.time()))
+            self._cond.notify_all()
+            return Admission(position=waiting, depth=waiting + len(jobs), started=started)
+
+    def _waiting(self):
+        """Number of evaluations waiting for a slot, counting every job of queued batches."""
+        return sum(len(entry.jobs) if isinstance(entry, _Batch) else 1 for entry in self._queue)
+
+    def position(self, job_id: str) -> Optional[int]:
+        """Return how many queued evaluations are ahead of ``job_id``, or None if not queued."""
+        with self._cond:
+            ahead = 0
+            for entry in self._queue:
+                if isinstance(entry, _Batch):
+                    for job in entry.jobs:
+                        if job[0] == job_id:
+                            return ahead
+                        ahead += 1
+                elif entry[0] == job_id:
+                    return ahead
+                else:
+                    ahead += 1
+        return None
+
+    def retry_after(self) -> int:
+        """Estimate, in seconds, when a slot will free up for a rejected client."""
+        waves = (self._waiting() // max(1, self.concurrency)) + 1
+        return max(1, int(self._avg_duration * waves))
+
+    def stats(self):
+        with self._cond:
+            return {
+                "concurrency": self.concurrency,
+                "running": self._running,
+                "queued": self._waiting(),
+                "queued_batches": sum(1 for entry in self._queue if isinstance(entry, _Batch)),
+                "max_queue": self.max_queue,
+            }
+
+    def _take(self):
+        """Remove and return the next job that can start, with its batch (or None), if any."""
+        for i, entry in enumerate(self._queue):
+            if not isinstance(entry, _Batch):
+                del self._queue[i]
+                return entry, None
+            job = entry.take()
+            if job is not None:
+                if not entry.jobs:
+                    del self._queue[i]
+                return job[:4] + (entry.queued_at,), entry
+        return None, None
+
+    def _slot_loop(self):
+        while True:
+            with self._cond:
+                job, batch = self._take()
+                while job is None and not self._stopped:
+                    self._cond.wait()
+                    job, batch = self._take()
+                if self._stopped:
+                    return
+                job_id, fn, args, kwargs, queued_at = job
+                self._running += 1
+
+            started = time.time()
+            observe_phase("queue_wait", started - queued_at)
+            try:
+                fn(*args, **kwargs)
+            except Exception:
+                log.exception("Evaluation raised", extra={"evaluation_id": job_id})
+            finally:
+                elapsed = time.time() - started
+                with self._cond:
+                    self._running -= 1
+                    self._avg_duration = 0.8 * self._avg_duration + 0.2 * elapsed
+                    if batch is not None:
+                        batch.finished.add(job_id)
+                        # Jobs of the batch waiting on this one can start now
+                        self._cond.notify_all()
+
+    def shutdown(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+
+_scheduler: Optional[EvaluationScheduler] = None
+
+
+def get_scheduler() -> EvaluationScheduler:
+    """Return the process-wide scheduler, creating it on first use."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = EvaluationScheduler()
+    return _scheduler
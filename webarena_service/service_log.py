@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Structured, level-gated logging for the service.
+
+Records are formatted as JSON lines (or plain text with ``LOG_FORMAT=text``)
+and written by a background ``QueueListener``: the calling thread only puts
+the record on a bounded in-memory queue, and drops it if the queue is full,
+so logging never blocks an evaluation on stdout.
+
+High-frequency messages (per step, per action) are logged with
+``sample=True`` and kept with probability ``LOG_SAMPLE_RATE``. Full
+observation dumps are never written to stdout; with ``LOG_LEVEL=DEBUG`` they
+go to a per-evaluation artifact file under ``LOG_ARTIFACT_DIR``.
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from collections.abc import Mapping
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", "1.0"))
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+LOG_ARTIFACT_DIR = os.environ.get(
+    "LOG_ARTIFACT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "artifacts")
+)
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+_CONTROL = {"sample", "artifact"}
+
+_setup_lock = threading.Lock()
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and key not in _CONTROL:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = {
+            k: v for k, v in vars(record).items()
+            if k not in _RESERVED and k not in _CONTROL
+        }
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+class SamplingFilter(logging.Filter):
+    """Keep ``sample=True`` records below WARNING with probability ``rate``."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if getattr(record, "sample", False) and record.levelno < logging.WARNING:
+            return random.random() < self.rate
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full."""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+    def prepare(self, record):
+        # Artifact records carry large payloads; skip the message pre-formatting
+        if getattr(record, "artifact", None):
+            return record
+        return super().prepare(record)
+
+
+class ArtifactHandler(logging.Handler):
+    """Append artifact records to ``LOG_ARTIFACT_DIR/<evaluation_id>.log``."""
+
+    def emit(self, record):
+        artifact = getattr(record, "artifact", None)
+        if not artifact:
+            return
+        try:
+            path = os.path.join(LOG_ARTIFACT_DIR, f"{artifact}.log")
+            # Artifacts are named after evaluation ids, which come from requests
+            if os.path.dirname(os.path.abspath(path)) != os.path.abspath(LOG_ARTIFACT_DIR):
+                return
+            os.makedirs(LOG_ARTIFACT_DIR, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(f"=== {time.strftime('%H:%M:%S', time.localtime(record.created))} {record.getMessage()} ===\n")
+                f.write(str(record.payload))
+                f.write("\n\n")
+        except Exception:
+            self.handleError(record)
+
+
+class _NotArtifact(logging.Filter):
+    def filter(self, record):
+        return not getattr(record, "artifact", None)
+
+
+def setup_logging():
+    """Route all service loggers through the asynchronous queue sink. Idempotent."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+        stream.addFilter(_NotArtifact())
+
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        _listener = logging.handlers.QueueListener(
+            log_queue, stream, ArtifactHandler(), respect_handler_level=True
+        )
+        _listener.start()
+
+        handler = DroppingQueueHandler(log_queue)
+        handler.addFilter(SamplingFilter(LOG_SAMPLE_RATE))
+
+        root = logging.getLogger("webarena")
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(handler)
+        root.propagate = False
+
+
+def shutdown_logging():
+    """Flush queued records and stop the background writer."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+class EvaluationLogger(logging.LoggerAdapter):
+    """Adds ``evaluation_id`` to every record, merged with per-call ``extra``."""
+
+    def process(self, msg, kwargs):
+        kwargs["extra"] = {**self.extra, **kwargs.get("extra", {})}
+        return msg, kwargs
+
+
+def get_logger(name):
+    setup_logging()
+    return logging.getLogger(f"webarena.{name}")
+
+
+def evaluation_logger(name, evaluation_id):
+    return EvaluationLogger(get_logger(name), {"evaluation_id": evaluation_id})
+
+
+def dump_observation(log, label, obs):
+    """Write a full observation to the evaluation's artifact file, only when debugging."""
+    if not log.isEnabledFor(logging.DEBUG):
+        return
+    text = obs.get("text", "") if isinstance(obs, Mapping) else obs
+    evaluation_id = log.extra["evaluation_id"] if isinstance(log, EvaluationLogger) else "service"
+    log.debug(label, extra={"artifact": evaluation_id, "payload": text})
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Browserless agent simulator over recorded evaluation traces.
+
+The traces of a challenge's past evaluations (see ``eval_trace``) are merged
+into a graph of the page states they saw, with an edge for every batch of
+actions executed from a state and the state it led to. An agent is then run
+against that graph instead of a browser: it gets the recorded observation of
+its current state, and its actions move it along recorded edges. As long as
+the agent only does things some recorded run did, a whole evaluation takes a
+fraction of a second::
+
+    python simulate.py --agent my_agent.py --challenge-url http://localhost:3000/mail
+    python simulate.py --agent my_agent.py traces/<evaluation_id>.trace --observation-mode diff
+
+When the agent does something no trace recorded from its current state, the
+simulation stops and reports the divergence: the step, the page, the action
+and the actions that were recorded from there. Running the agent once through
+``/api/evaluate`` from that point records the missing transition. Traces of
+evaluations run with ``network_mode: replay`` see the same pages every time,
+so they merge into the fewest states.
+
+States are identified by their URL and exact observation text, so element
+ids in an action mean the same element on every trace that reached the state.
+A batch the agent returns is matched against the longest recorded batch it
+starts with, then the rest of it from the state that led to.
+"""
+
+import argparse
+import collections
+import hashlib
+import json
+import os
+import sys
+import time
+import traceback
+
+from action_validation import parse_action, validate_action
+from agent_registry import AgentValidationError, compile_agent
+from agent_workers import InlineAgentSession
+from criteria import CriteriaError, compile_criteria
+from eval_trace import TRACE_DIR, TraceReplay, read_records
+from obs_diff import ObservationTracker, split_pseudo_actions
+from observation import LazyObservation
+
+# Same step budget as a live evaluation
+MAX_STEPS = 25
+
+
+def state_key(url: str, text: str) -> str:
+    return hashlib.sha1(f"{url}\n{text}".encode("utf-8")).hexdigest()[:16]
+
+
+def canonical_action(action: str) -> str:
+    """Spell an action the same way however the agent wrote it (``type`` always gets its Enter flag)."""
+    try:
+        action_type, arguments = parse_action(action)
+    except ValueError:
+        return action.strip()
+    return action_type + "".join(f" [{argument}]" for argument in arguments)
+
+
+class StateGraph:
+    """Page states seen by recorded evaluations and the action batches between them."""
+
+    def __init__(self):
+        # key -> (url, text)
+        self.states = {}
+        # key -> {actions: Counter of next state keys}
+        self.edges = collections.defaultdict(lambda: collections.defaultdict(collections.Counter))
+        self.start_states = collections.Counter()
+        self.traces = []
+        self.criteria = collections.Counter()
+
+    def _add_state(self, url, text):
+        key = state_key(url, text)
+        self.states.setdefault(key, (url, text))
+        return key
+
+    def add_trace(self, replay: TraceReplay):
+        if not replay.observations:
+            return
+        self.traces.append(replay.start.get("evaluation_id") or os.path.basename(replay.path))
+        if replay.start.get("success_criteria"):
+            self.criteria[replay.start["success_criteria"]] += 1
+        current = self._add_state(*replay.observations[0])
+        self.start_states[current] += 1
+        for step in replay:
+            # A step that broke off before its observation was recorded ends the trace
+            if step.number >= len(replay.observations):
+                break
+            following = self._add_state(*replay.observations[step.number])
+            actions = tuple(canonical_action(record["action"]) for record in step.executed)
+            if actions:
+                self.edges[current][actions][following] += 1
+            current = following
+
+    @property
+    def start(self):
+        return self.start_states.most_common(1)[0][0] if self.start_states else None
+
+    def follow(self, state, actions):
+        """Longest recorded batch ``actions`` starts with, and the state it most often led to."""
+        recorded = self.edges.get(state, {})
+        for length in range(len(actions), 0, -1):
+            outcomes = recorded.get(tuple(actions[:length]))
+            if outcomes:
+                return length, outcomes.most_common(1)[0][0]
+        return 0, None
+
+    def known_actions(self, state):
+        recorded = self.edges.get(state, {})
+        return sorted(
+            ([list(actions), sum(outcomes.values())] for actions, outcomes in recorded.items()),
+            key=lambda item: -item[1],
+        )
+
+    def stats(self):
+        edges = [outcomes for recorded in self.edges.values() for outcomes in recorded.values()]
+        return {
+            "traces": len(self.traces),
+            "states": len(self.states),
+            "edges": len(edges),
+            # Same state and actions, different resulting pages
+            "nondeterministic_edges": sum(1 for outcomes in edges if len(outcomes) > 1),
+        }
+
+
+def find_traces(challenge_url, trace_dir=TRACE_DIR):
+    """Traces in ``trace_dir`` whose evaluation ran ``challenge_url``."""
+    paths = []
+    for name in sorted(os.listdir(trace_dir)) if os.path.isdir(trace_dir) else []:
+        if not name.endswith(".trace"):
+            continue
+        path = os.path.join(trace_dir, name)
+        try:
+            start = next(read_records(path), {})
+        except (OSError, ValueError):
+            continue
+        if start.get("k") == "start" and start.get("challenge_url") == challenge_url:
+            paths.append(path)
+    return paths
+
+
+def load_graph(paths) -> StateGraph:
+    graph = StateGraph()
+    for path in paths:
+        try:
+            graph.add_trace(TraceReplay(path))
+        except (OSError, ValueError) as e:
+            print(f"Skipping unreadable trace {path}: {e}", file=sys.stderr)
+    return graph
+
+
+def simulate(graph: StateGraph, agent_code: str, criteria_source: str,
+             observation_mode="full", max_steps=MAX_STEPS) -> dict:
+    """Run the agent through the recorded states, as ``run_evaluation`` would through a browser."""
+    report = {
+        "status": "failed",
+        "score": 0,
+        "steps_taken": 0,
+        "steps": [],
+        "divergence": None,
+        "message": None,
+    }
+    state = graph.start
+    if state is None:
+        report["message"] = "No recorded observations to simulate"
+        return report
+    started = time.perf_counter()
+    criteria = compile_criteria(criteria_source)
+    tracker = ObservationTracker(observation_mode)
+    try:
+        agent = InlineAgentSession(compile_agent(agent_code))
+    except AgentValidationError:
+        raise
+    except Exception as e:
+        report["message"] = f"Error loading agent: {e}"
+        return report
+    report["agent_load_time"] = agent.load_time
+    rejected = []
+
+    for step in range(1, max_steps + 1):
+        url, text = graph.states[state]
+        obs = LazyObservation.of({"text": text})
+        obs_text = tracker.render(obs, errors=rejected)
+        rejected = []
+        agent_started = time.perf_counter()
+        try:
+            actions = agent.call(obs_text)
+        except Exception:
+            report["message"] = f"Error executing agent: {traceback.format_exc(limit=-3)}"
+            break
+        agent_time = time.perf_counter() - agent_started
+        if not isinstance(actions, list):
+            actions = [actions]
+        actions = split_pseudo_actions(actions, tracker)
+
+        # Actions up to the first invalid one are executed, like a live step
+        executable = []
+        for i, action in enumerate(actions):
+            rejection = validate_action(action, obs.tree)
+            if rejection is not None:
+                rejection["skipped"] = len(actions) - i - 1
+                rejected.append(rejection)
+                break
+            executable.append(canonical_action(action))
+
+        record = {"step": step, "url": url, "actions": actions, "agent_time": round(agent_time, 4),
+                  "rejected": rejected, "transitions": []}
+        report["steps"].append(record)
+        success = False
+        remaining = executable
+        while remaining:
+            consumed, following = graph.follow(state, remaining)
+            if following is None:
+                report["divergence"] = {
+                    "step": step,
+                    "url": url,
+                    "state": state,
+                    "action": remaining[0],
+                    "pending": remaining,
+                    "known_actions": graph.known_actions(state),
+                }
+                break
+            record["transitions"].append({"actions": remaining[:consumed], "state": following})
+            state, remaining = following, remaining[consumed:]
+            success = criteria.matches(graph.states[state][0], {"text": graph.states[state][1]})
+            if success:
+                break
+        if report["divergence"] is not None:
+            report["status"] = "diverged"
+            report["message"] = f"Step {step}: no recorded run did {remaining[0]!r} from this page"
+            break
+        if success:
+            report.update(status="completed", score=100, steps_taken=step)
+            break
+
+    agent.close()
+    report["simulated_time"] = round(time.perf_counter() - started, 4)
+    return report
+
+
+def _print_report(report, graph):
+    stats = graph.stats()
+    print(f"{stats['traces']} traces, {stats['states']} states, {stats['edges']} recorded transitions")
+    for step in report["steps"]:
+        print(f"step {step['step']}  {step['url']}  agent {step['agent_time']:.3f}s")
+        for transition in step["transitions"]:
+            print(f"  {', '.join(transition['actions'])}  -> {transition['state']}")
+        for rejection in step["rejected"]:
+            print(f"  rejected {rejection['action']}: {rejection['code']} ({rejection['error']})")
+    divergence = report["divergence"]
+    if divergence is not None:
+        print(f"\nDiverged at step {divergence['step']} on {divergence['url']} (state {divergence['state']}):")
+        print(f"  agent did: {divergence['action']}")
+        if divergence["known_actions"]:
+            print("  recorded from here:")
+            for actions, count in divergence["known_actions"]:
+                print(f"    {', '.join(actions)}  ({count}x)")
+        else:
+            print("  no recorded run acted from here")
+    print(f"\n{report['status']}  score={report['score']}  steps={report['steps_taken']}  "
+          f"in {report.get('simulated_time', 0):.3f}s  {report['message'] or ''}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run an agent against recorded traces instead of a browser.")
+    parser.add_argument("traces", nargs="*", help="Trace files (instead of --challenge-url)")
+    parser.add_argument("--agent", required=True, help="File with the agent's agent_logic")
+    parser.add_argument("--challenge-url", help="Use every trace in TRACE_DIR of this challenge")
+    parser.add_argument("--criteria", help="Success criteria (default: the traces' own)")
+    parser.add_argument("--observation-mode", choices=("full", "diff"), default="full")
+    parser.add_argument("--max-steps", type=int, default=MAX_STEPS)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+    if bool(args.challenge_url) == bool(args.traces):
+        parser.error("give either --challenge-url or trace files")
+
+    paths = args.traces or find_traces(args.challenge_url)
+    graph = load_graph(paths)
+    if not graph.traces:
+        parser.error("no readable traces to simulate")
+    criteria_source = args.criteria or (graph.criteria.most_common(1)[0][0] if graph.criteria else None)
+    if not criteria_source:
+        parser.error("--criteria is required, the traces don't record any")
+    try:
+        compile_criteria(criteria_source)
+    except CriteriaError as e:
+        parser.error(f"invalid criteria: {e}")
+    with open(args.agent, encoding="utf-8") as f:
+        agent_code = f.read()
+
+    try:
+        report = simulate(graph, agent_code, criteria_source, args.observation_mode, args.max_steps)
+    except AgentValidationError as e:
+        parser.error(f"invalid agent: {e}")
+    report["criteria"] = criteria_source
+    report["graph"] = graph.stats()
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report, graph)
+    return 0 if report["status"] == "completed" else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Per-challenge start-state snapshots.
+
+A live page can't be copied between browser contexts, so a snapshot keeps
+what can be restored cheaply: the context's storage state (cookies and
+``localStorage`` per origin) and the URL the challenge settled on after its
+redirects, captured once the page first became ready. Evaluations of that
+challenge then start with the cookies added to their fresh context, the
+``localStorage`` entries restored by an init script before any page script
+runs, and navigation going straight to the final URL. Login redirects and
+first-visit setup are skipped; the readiness wait still runs.
+
+Snapshots are keyed by a hash of the challenge definition (URL, success
+criteria, ready selectors and the backend's ``challenge_version``), so editing
+the challenge invalidates them. They are kept in memory and as JSON files under
+``SNAPSHOT_DIR`` and expire after ``SNAPSHOT_TTL`` seconds.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+from service_log import get_logger
+
+SNAPSHOT_DIR = os.environ.get(
+    "SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots")
+)
+SNAPSHOT_TTL = float(os.environ.get("SNAPSHOT_TTL", "3600"))
+
+# Restores localStorage once per origin; later navigations keep what the page changed
+RESTORE_STORAGE_JS = """
+(origins => {
+    const items = origins[location.origin];
+    if (!items || localStorage.getItem("__agentEvalSnapshot")) return;
+    for (const item of items) localStorage.setItem(item.name, item.value);
+    localStorage.setItem("__agentEvalSnapshot", "1");
+})(%s);
+"""
+
+log = get_logger("snapshots")
+
+
+def snapshot_key(challenge_url: str, success_criteria: str, ready_selectors: Optional[List[str]],
+                 challenge_version: Optional[str]) -> str:
+    definition = json.dumps(
+        {
+            "url": challenge_url,
+            "success_criteria": success_criteria,
+            "ready_selectors": ready_selectors or [],
+            "version": challenge_version,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(definition.encode("utf-8")).hexdigest()[:32]
+
+
+class ChallengeSnapshot:
+    """Storage state and final URL of a challenge once it was ready."""
+
+    def __init__(self, key, url, storage_state, created_at=None):
+        self.key = key
+        self.url = url
+        self.storage_state = storage_state
+        self.created_at = created_at or time.time()
+
+    def expired(self):
+        return time.time() - self.created_at > SNAPSHOT_TTL
+
+    def apply(self, context):
+        """Restore cookies and localStorage into a fresh context, before it navigates."""
+        cookies = self.storage_state.get("cookies") or []
+        if cookies:
+            context.add_cookies(cookies)
+        origins = {
+            entry["origin"]: entry.get("localStorage", [])
+            for entry in self.storage_state.get("origins", [])
+            if entry.get("localStorage")
+        }
+        if origins:
+            context.add_init_script(RESTORE_STORAGE_JS % json.dumps(origins))
+
+    def to_dict(self):
+        return {
+            "key": self.key,
+            "url": self.url,
+            "storage_state": self.storage_state,
+            "created_at": self.created_at,
+        }
+
+
+class SnapshotStore:
+    """Snapshots in memory, persisted as one JSON file each."""
+
+    def __init__(self, directory=SNAPSHOT_DIR):
+        self.directory = directory
+        self._snapshots: Dict[str, ChallengeSnapshot] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key, restoring=False) -> Optional[ChallengeSnapshot]:
+        """The key's snapshot, if any; only lookups for a restore count as hits or misses."""
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+        if snapshot is None:
+            try:
+                with open(self._path(key), encoding="utf-8") as f:
+                    snapshot = ChallengeSnapshot(**json.load(f))
+            except (OSError, ValueError, TypeError):
+                snapshot = None
+        with self._lock:
+            if snapshot is None or snapshot.expired():
+                self._snapshots.pop(key, None)
+                if restoring:
+                    self.misses += 1
+                return None
+            self._snapshots[key] = snapshot
+            if restoring:
+                self.hits += 1
+            return snapshot
+
+    def capture(self, key, context, page) -> ChallengeSnapshot:
+        """Snapshot a context whose page just became ready."""
+        snapshot = ChallengeSnapshot(key, page.url, context.storage_state())
+        with self._lock:
+            self._snapshots[key] = snapshot
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # One temporary file per writer, so concurrent captures of a challenge can't interleave
+            fd, temporary = tempfile.mkstemp(dir=self.directory, prefix=f"{key}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(snapshot.to_dict(), f)
+                os.replace(temporary, self._path(key))
+            except BaseException:
+                os.unlink(temporary)
+                raise
+        except OSError:
+            log.exception("Failed to persist snapshot", extra={"key": key})
+        return snapshot
+
+    def stats(self):
+        with self._lock:
+            return {"cached": len(self._snapshots), "hits": self.hits, "misses": self.misses}
+
+
+_store: Optional[SnapshotStore] = None
+
+
+def get_snapshots() -> SnapshotStore:
+    """Return the process-wide snapshot store, creating it on first use."""
+    global _store
+    if _store is None:
+        _store = SnapshotStore()
+    return _store
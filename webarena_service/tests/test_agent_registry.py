@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent_registry import AgentValidationError, compile_agent  # noqa: E402
+
+AGENT_LOGIC = "def agent_logic(obs_text):\n    return []\n"
+
+
+@pytest.mark.parametrize("source", [
+    "return 1\n",
+    "nonlocal x\n",
+    "await x\n",
+])
+def test_compile_errors_are_validation_errors(source):
+    with pytest.raises(AgentValidationError):
+        compile_agent(AGENT_LOGIC + source)
+
+
+def test_valid_agent_compiles():
+    assert compile_agent(AGENT_LOGIC).code is not None
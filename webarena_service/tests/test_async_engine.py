@@ -0,0 +1,165 @@
+import asyncio
+import copy
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from action_validation import parse_action  # noqa: E402
+from async_engine import SCROLL_JS, AsyncSession, _remove_node, fetch_accessibility_tree  # noqa: E402
+
+WINDOW = {"top": 0, "left": 0, "width": 1280, "height": 720, "ratio": 1}
+# backendDOMNodeId -> bounding rect
+RECTS = {
+    12: {"x": 10, "y": 10, "width": 100, "height": 20},
+    13: {"x": 10, "y": 5000, "width": 100, "height": 20},
+    14: {"x": 20, "y": 12, "width": 50, "height": 10},
+}
+
+
+def _node(node_id, role, name, parent=None, children=(), backend=None):
+    node = {
+        "nodeId": node_id,
+        "role": {"value": role},
+        "name": {"value": name},
+        "childIds": list(children),
+        "properties": [],
+    }
+    if parent is not None:
+        node["parentId"] = parent
+    if backend is not None:
+        node["backendDOMNodeId"] = backend
+    return node
+
+
+AX_NODES = [
+    _node("1", "RootWebArea", "Mail", children=["2", "3"], backend=11),
+    _node("2", "button", "Send", parent="1", children=["4"], backend=12),
+    _node("3", "link", "Below the fold", parent="1", backend=13),
+    _node("4", "StaticText", "Send", parent="2", backend=14),
+    # The accessibility tree repeats a few nodes
+    _node("2", "button", "Send", parent="1", children=["4"], backend=12),
+]
+
+
+def _reply(method, params):
+    if method == "Accessibility.getFullAXTree":
+        return {"nodes": copy.deepcopy(AX_NODES)}
+    if method == "DOM.resolveNode":
+        return {"object": {"objectId": str(params["backendNodeId"])}}
+    if method == "Runtime.callFunctionOn":
+        return {"result": {"value": RECTS[int(params["objectId"])]}}
+    raise AssertionError(method)
+
+
+class FakeClient:
+    async def send(self, method, params):
+        return _reply(method, params)
+
+
+class FakePage:
+    def __init__(self):
+        self.calls = []
+        self.mouse = self._Recorder(self.calls, "mouse")
+        self.keyboard = self._Recorder(self.calls, "keyboard")
+
+    class _Recorder:
+        def __init__(self, calls, prefix):
+            self._calls = calls
+            self._prefix = prefix
+
+        def __getattr__(self, name):
+            async def record(*args):
+                self._calls.append((f"{self._prefix}.{name}", *args))
+            return record
+
+    async def evaluate(self, js):
+        if js in SCROLL_JS.values():
+            self.calls.append(("evaluate", js))
+            return None
+        return dict(WINDOW)
+
+    async def goto(self, url):
+        self.calls.append(("goto", url))
+
+
+def _session(page):
+    session = AsyncSession(None, None, page)
+    session.obs_nodes_info = {"42": {"union_bound": [100.0, 200.0, 40.0, 20.0]}}
+    return session
+
+
+def test_remove_node_hands_children_to_parent():
+    nodes = copy.deepcopy(AX_NODES[:4])
+    cursors = {node["nodeId"]: i for i, node in enumerate(nodes)}
+    _remove_node(nodes, cursors, nodes[1])
+    assert nodes[0]["childIds"] == ["4", "3"]
+    assert nodes[3]["parentId"] == "1"
+    assert nodes[1]["parentId"] == "[REMOVED]"
+
+
+def test_fetch_drops_duplicates_and_offscreen_nodes():
+    pytest.importorskip("browser_env.processors")
+    nodes = asyncio.run(fetch_accessibility_tree(FakePage(), FakeClient()))
+    assert [node["nodeId"] for node in nodes] == ["1", "2", "4"]
+    assert nodes[0]["union_bound"] == [0.0, 0.0, 10.0, 10.0]
+    assert nodes[1]["union_bound"] == [10, 10, 100, 20]
+
+
+def test_fetch_matches_webarena_processor():
+    processors = pytest.importorskip("browser_env.processors")
+
+    class SyncClient:
+        def send(self, method, params):
+            return _reply(method, params)
+
+    config = {
+        "win_top_bound": WINDOW["top"],
+        "win_left_bound": WINDOW["left"],
+        "win_width": WINDOW["width"],
+        "win_height": WINDOW["height"],
+        "win_right_bound": WINDOW["left"] + WINDOW["width"],
+        "win_lower_bound": WINDOW["top"] + WINDOW["height"],
+        "device_pixel_ratio": WINDOW["ratio"],
+    }
+    processor = object.__new__(processors.TextObervationProcessor)
+    expected = processor.fetch_page_accessibility_tree({"config": config}, SyncClient(), True)
+    actual = asyncio.run(fetch_accessibility_tree(FakePage(), FakeClient()))
+    assert actual == expected
+
+
+@pytest.mark.parametrize("action, expected", [
+    ("click [42]", [("mouse.click", 120.0, 210.0)]),
+    ("hover [42]", [("mouse.move", 120.0, 210.0)]),
+    ("type [42] [hello]", [("mouse.click", 120.0, 210.0), ("keyboard.type", "hello\n")]),
+    ("type [42] [hello] [0]", [("mouse.click", 120.0, 210.0), ("keyboard.type", "hello")]),
+    ("press [Enter]", [("keyboard.press", "Enter")]),
+    ("scroll [down]", [("evaluate", SCROLL_JS["down"])]),
+    ("goto [http://localhost:3000/mail]", [("goto", "http://localhost:3000/mail")]),
+    ("noop", []),
+])
+def test_execute_runs_actions_like_execute_action(action, expected):
+    page = FakePage()
+    success, error = asyncio.run(_session(page).execute(action))
+    assert (success, error) == (True, "")
+    assert page.calls == expected
+
+
+def test_execute_reports_unknown_elements_as_failures():
+    success, error = asyncio.run(_session(FakePage()).execute("click [7]"))
+    assert not success and error
+
+
+@pytest.mark.parametrize("action", [
+    "click [42]", "hover [42]", "type [42] [hello]", "type [42] [hello] [0]", "press [Enter]",
+    "scroll [down]", "goto [http://localhost:3000/mail]", "tab_focus [1]", "go_back", "stop",
+])
+def test_parse_action_matches_create_id_based_action(action):
+    actions = pytest.importorskip("browser_env.actions")
+    webarena = actions.create_id_based_action(action)
+    action_type, arguments = parse_action(action)
+    assert webarena["action_type"] == actions.ActionTypes[action_type.upper()]
+    if action_type in ("click", "hover", "type"):
+        assert webarena["element_id"] == arguments[0]
@@ -0,0 +1,115 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ax_tree import AXTree  # noqa: E402
+from criteria import (  # noqa: E402
+    CriteriaError, LiteralSetMatcher, Matcher, NodeMatcher, RegexMatcher, SubstringMatcher, UrlMatcher,
+    compile_criteria,
+)
+
+PAGE = (
+    "Tab 0 (current): Cart\n"
+    "[1] RootWebArea 'Cart' focused: True\n"
+    "\t[2] heading 'Order placed'\n"
+    "\t[3] button 'Continue shopping'\n"
+    "\t[4] StaticText 'Total: $42'"
+)
+URL = "http://localhost:7770/checkout/onepage/success/"
+
+
+class CountingObservation(dict):
+    """Observation dict that counts how often its text is read."""
+
+    reads = 0
+
+    def get(self, key, default=None):
+        self.reads += 1
+        return super().get(key, default)
+
+
+@pytest.mark.parametrize("source, matcher", [
+    ("Order placed", SubstringMatcher),
+    ("regex:Total: \\$\\d+", RegexMatcher),
+    ("any:Declined|Order placed", LiteralSetMatcher),
+    ("all:Order placed|Total", LiteralSetMatcher),
+    ("url:*/success/", UrlMatcher),
+    ("node:role=heading,name=Order placed", NodeMatcher),
+])
+def test_prefixes_compile_to_their_matcher(source, matcher):
+    [compiled] = compile_criteria(source).matchers
+    assert type(compiled) is matcher
+
+
+@pytest.mark.parametrize("source, expected", [
+    ("Order placed", True),
+    ("Order failed", False),
+    ("regex:^\\t\\[\\d+\\] heading", True),
+    ("regex:Total: \\$9\\d", False),
+    ("any:Declined|Order placed", True),
+    ("any:Declined|Failed", False),
+    ("all:Order placed|Total", True),
+    ("all:Order placed|Declined", False),
+    ("url:/checkout/", True),
+    ("url:*/success/", True),
+    ("url:*/cart/", False),
+    ("node:role=heading,name=Order placed", True),
+    ("node:role=heading,name=Order", False),
+    ("node:role=button,name~=shopping", True),
+    ("node:name=Continue shopping", True),
+    ("node:role=link", False),
+])
+def test_matches(source, expected):
+    assert compile_criteria(source).matches(URL, {"text": PAGE}) is expected
+
+
+def test_compound_criteria_need_every_clause():
+    assert compile_criteria("url:*/success/ && node:role=heading,name=Order placed").matches(URL, {"text": PAGE})
+    assert not compile_criteria("url:*/cart/ && Order placed").matches(URL, {"text": PAGE})
+
+
+def test_unprefixed_clauses_of_compound_criteria_are_substrings():
+    criteria = compile_criteria("url:*/success/ && Total: $42")
+    assert [type(m) for m in criteria.matchers] == [UrlMatcher, SubstringMatcher]
+    assert criteria.matches(URL, {"text": PAGE})
+
+
+def test_unprefixed_criteria_are_one_substring():
+    [matcher] = compile_criteria("Cart && Total").matchers
+    assert matcher.source == "Cart && Total"
+
+
+def test_url_clauses_are_checked_first_without_the_text():
+    criteria = compile_criteria("any:Order placed && url:*/cart/")
+    assert criteria.needs_tree
+    obs = CountingObservation(text=PAGE)
+    assert not criteria.matches(URL, obs)
+    assert obs.reads == 0
+    assert not compile_criteria("url:*/success/").needs_tree
+
+
+def test_node_clauses_use_the_observation_tree():
+    class Parsed(dict):
+        tree = AXTree.parse(PAGE)
+
+    # The text is never parsed when the observation carries its tree
+    assert compile_criteria("node:role=heading,name=Order placed").matches(URL, Parsed(text=""))
+
+
+@pytest.mark.parametrize("source", [
+    "regex:(unclosed",
+    "any:|",
+    "node:role",
+    "node:colour=red",
+])
+def test_malformed_criteria_raise(source):
+    with pytest.raises(CriteriaError):
+        compile_criteria(source)
+
+
+def test_matcher_is_abstract():
+    with pytest.raises(TypeError):
+        Matcher("Order placed")
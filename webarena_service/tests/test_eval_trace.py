@@ -0,0 +1,114 @@
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import eval_trace  # noqa: E402
+from eval_trace import TraceReplay, TraceWriter, apply_delta, line_delta, prune_traces, read_records  # noqa: E402
+
+PAGE = [f"\t[{i}] link 'Item {i}'" for i in range(200)]
+
+
+def _edited(lines, rng):
+    lines = list(lines)
+    for _ in range(rng.randint(0, 6)):
+        row = rng.randint(0, len(lines))
+        roll = rng.random()
+        if roll < 0.4:
+            lines.insert(row, f"\t[{rng.randint(1000, 2000)}] button 'New'")
+        elif lines and roll < 0.8:
+            del lines[min(row, len(lines) - 1)]
+        elif lines:
+            lines[min(row, len(lines) - 1)] += " focused: True"
+    return lines
+
+
+def test_line_delta_round_trips():
+    rng = random.Random(0)
+    old = PAGE[:rng.randint(0, 50)]
+    for _ in range(500):
+        new = _edited(old, rng)
+        assert apply_delta(old, line_delta(old, new)) == new
+        old = new
+
+
+def test_line_delta_covers_only_the_changed_lines():
+    new = PAGE[:100] + ["\t[999] button 'New'"] + PAGE[100:]
+    assert line_delta(PAGE, new) == [[100, 100, ["\t[999] button 'New'"]]]
+    assert line_delta(PAGE, PAGE) == []
+
+
+def test_large_changes_are_one_replacement(monkeypatch):
+    monkeypatch.setattr(eval_trace, "LINE_DELTA_MAX_LINES", 10)
+    new = ["header"] + [line + " focused: True" for line in PAGE[1:-1]] + [PAGE[-1]]
+    delta = line_delta(PAGE, new)
+    assert delta == [[0, len(PAGE) - 1, new[:-1]]]
+    assert apply_delta(PAGE, delta) == new
+
+
+def _write_trace(path, pages):
+    writer = TraceWriter(str(path))
+    writer.start(SimpleNamespace(
+        evaluation_id="e1", challenge_url="http://localhost:3000", success_criteria="Done",
+        observation_mode="full", network_mode="live", agent_code="def agent_logic(obs):\n    return []\n",
+    ))
+    writer.observation(0, "http://localhost:3000", {"text": "\n".join(pages[0])})
+    for step, page in enumerate(pages[1:], 1):
+        writer.agent(step, ["click [1]"], 0.01)
+        writer.action(step, "click [1]", True, "", "http://localhost:3000", 0.1, 0.05)
+        writer.observation(step, "http://localhost:3000", {"text": "\n".join(page)})
+    return writer
+
+
+def test_replay_rebuilds_every_observation(tmp_path):
+    rng = random.Random(1)
+    pages = [PAGE]
+    for _ in range(5):
+        pages.append(_edited(pages[-1], rng))
+    path = tmp_path / "e1.trace"
+    _write_trace(path, pages).finish(SimpleNamespace(
+        status="completed", score=0, steps_taken=5, message="", phase_timings={},
+    ))
+
+    kinds = [record["k"] for record in read_records(str(path))]
+    assert kinds.count("observation") == 6
+    assert sum("delta" in record for record in read_records(str(path))) >= 4
+
+    replay = TraceReplay(str(path))
+    assert replay.completed and len(replay) == 5
+    for step, page in enumerate(pages):
+        assert replay.observation_after(step) == "\n".join(page)
+    assert replay.step(1).observation == "\n".join(pages[0])
+    assert replay.step(1).executed[0]["action"] == "click [1]"
+
+
+def test_replay_stops_at_a_truncated_record(tmp_path):
+    path = tmp_path / "e1.trace"
+    _write_trace(path, [PAGE, PAGE[1:]]).close()
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 3)
+    replay = TraceReplay(str(path))
+    assert not replay.completed
+    assert [text for _, text in replay.observations] == ["\n".join(PAGE)]
+
+
+def test_prune_removes_expired_then_oldest_over_budget(tmp_path, monkeypatch):
+    now = time.time()
+    for name, age, size in [("old", 7200, 10), ("a", 30, 600), ("b", 20, 600), ("c", 10, 600), ("x.tmp", 7200, 1)]:
+        path = tmp_path / (name if name.endswith(".tmp") else f"{name}.trace")
+        path.write_bytes(b"x" * size)
+        os.utime(path, (now - age, now - age))
+    monkeypatch.setattr(eval_trace, "TRACE_RETENTION", 3600)
+    monkeypatch.setattr(eval_trace, "TRACE_MAX_MB", 1300 / 1024 / 1024)
+    assert prune_traces(str(tmp_path)) == 2
+    assert sorted(os.listdir(tmp_path)) == ["b.trace", "c.trace", "x.tmp"]
+
+
+def test_trace_ids_stay_in_the_trace_dir():
+    with pytest.raises(ValueError):
+        eval_trace.trace_path("../escape")
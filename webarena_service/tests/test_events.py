@@ -0,0 +1,91 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import events  # noqa: E402
+from events import FINISHED, EventBus, format_sse  # noqa: E402
+
+
+async def _collect(bus, evaluation_id, last_event_id=0):
+    return [event async for event in bus.subscribe(evaluation_id, last_event_id)]
+
+
+async def _first(bus):
+    stream = bus.subscribe("eval-1")
+    event = await stream.__anext__()
+    await stream.aclose()
+    return [event]
+
+
+def test_unknown_evaluations_have_no_events():
+    bus = EventBus()
+    assert not bus.exists("eval-1")
+    assert asyncio.run(_collect(bus, "eval-1")) == []
+    # Subscribing doesn't create the channel
+    assert not bus.exists("eval-1")
+
+
+def test_late_subscribers_replay_the_history():
+    bus = EventBus()
+    bus.publish("eval-1", "queued", {"position": 1})
+    bus.publish("eval-1", "step", {"step": 1})
+    bus.publish("eval-1", FINISHED, {"status": "completed"})
+    assert [event["type"] for event in asyncio.run(_collect(bus, "eval-1"))] == ["queued", "step", FINISHED]
+    # Last-Event-ID resumes after the events already seen
+    assert [event["id"] for event in asyncio.run(_collect(bus, "eval-1", last_event_id=2))] == [3]
+
+
+def test_live_events_from_other_threads_reach_subscribers():
+    bus = EventBus()
+    bus.publish("eval-1", "queued")
+
+    async def run():
+        received = []
+        async for event in bus.subscribe("eval-1"):
+            received.append(event["type"])
+            if event["type"] == "queued":
+                threading.Thread(target=lambda: [
+                    bus.publish("eval-1", "step", {"step": 1}),
+                    bus.publish("eval-1", FINISHED),
+                ]).start()
+        return received
+
+    assert asyncio.run(asyncio.wait_for(run(), timeout=5)) == ["queued", "step", FINISHED]
+
+
+def test_idle_streams_yield_keep_alives(monkeypatch):
+    monkeypatch.setattr(events, "EVENT_KEEPALIVE", 0.01)
+    bus = EventBus()
+    bus.publish("eval-1", "queued")
+
+    async def first_two():
+        stream = bus.subscribe("eval-1")
+        received = [await stream.__anext__(), await stream.__anext__()]
+        await stream.aclose()
+        return received
+
+    queued, keep_alive = asyncio.run(first_two())
+    assert queued["type"] == "queued" and keep_alive is None
+    assert format_sse(None) == ": keep-alive\n\n"
+
+
+def test_finished_evaluations_expire(monkeypatch):
+    monkeypatch.setattr(events, "EVENT_RETENTION", -1)
+    bus = EventBus()
+    bus.publish("eval-1", FINISHED)
+    bus.publish("eval-2", "queued")
+    assert not bus.exists("eval-1")
+    assert bus.exists("eval-2")
+
+
+def test_format_sse():
+    bus = EventBus()
+    bus.publish("eval-1", "action_rejected", {"action": "click [9]"})
+    [event] = asyncio.run(asyncio.wait_for(_first(bus), timeout=5))
+    header, kind, data, blank, end = format_sse(event).split("\n")
+    assert (header, kind, blank, end) == ("id: 1", "event: action_rejected", "", "")
+    assert json.loads(data[len("data: "):])["data"] == {"action": "click [9]"}
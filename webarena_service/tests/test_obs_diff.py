@@ -0,0 +1,95 @@
+import os
+import pickle
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ax_tree import AXTree, Observation  # noqa: E402
+from obs_diff import FULL_TREE_ACTION, ObservationTracker, diff_trees, split_pseudo_actions  # noqa: E402
+
+HEADER = "Tab 0 (current): Inbox"
+NODES = [f"\t[{i}] link 'Message {i}'" for i in range(2, 40)]
+BEFORE = "\n".join([HEADER, "[1] RootWebArea 'Inbox' focused: True"] + NODES)
+
+
+class FakeObservation(dict):
+    """What the evaluation loop passes to the tracker: the text, and its tree as ``.tree``."""
+
+    def __init__(self, text):
+        super().__init__(text=text)
+        self.tree = AXTree.parse(text)
+
+
+def _after():
+    lines = BEFORE.split("\n")
+    lines[3] = "\t[3] link 'Message 3' focused: True"
+    del lines[4]
+    lines.append("\t[99] button 'Archive'")
+    return "\n".join(lines)
+
+
+def test_diff_trees_by_element_id():
+    diff = diff_trees(AXTree.parse(BEFORE), AXTree.parse(_after()))
+    assert diff.header is None
+    assert diff.added == ["\t[99] button 'Archive'"]
+    assert diff.removed == [4]
+    assert diff.changed == ["\t[3] link 'Message 3' focused: True"]
+    assert diff.to_text().split("\n") == [
+        "# Observation diff: 1 added, 1 removed, 1 changed",
+        "+ \t[99] button 'Archive'",
+        "- [4]",
+        "~ \t[3] link 'Message 3' focused: True",
+    ]
+
+
+def test_header_changes_are_one_block():
+    after = BEFORE.replace(HEADER, "Tab 0 (current): Archive")
+    assert diff_trees(AXTree.parse(BEFORE), AXTree.parse(after)).header == "Tab 0 (current): Archive"
+
+
+def test_full_mode_always_sends_the_page():
+    tracker = ObservationTracker("full")
+    for text in (BEFORE, _after()):
+        assert tracker.render(FakeObservation(text)) == text
+
+
+def test_diff_mode_sends_the_page_then_diffs():
+    tracker = ObservationTracker("diff")
+    first = tracker.render(FakeObservation(BEFORE))
+    assert first == BEFORE
+    second = tracker.render(FakeObservation(_after()), errors=["rejected"])
+    assert second.startswith("# Observation diff:")
+    assert second.errors == ["rejected"]
+    assert second.tree.first(role="button").name == "Archive"
+
+
+def test_full_tree_request_sends_the_page_once():
+    tracker = ObservationTracker("diff")
+    tracker.render(FakeObservation(BEFORE))
+    assert split_pseudo_actions(["click [3]", f" {FULL_TREE_ACTION} "], tracker) == ["click [3]"]
+    assert tracker.render(FakeObservation(_after())) == _after()
+    assert tracker.render(FakeObservation(BEFORE)).startswith("# Observation diff:")
+
+
+def test_diff_mode_sends_the_page_when_the_diff_is_larger():
+    tracker = ObservationTracker("diff")
+    tracker.render(FakeObservation(BEFORE))
+    other = "\n".join([HEADER, "[500] RootWebArea 'Settings'"])
+    assert tracker.render(FakeObservation(other)) == other
+
+
+def test_detached_diff_pickles_without_the_page_and_rebuilds_it():
+    tracker = ObservationTracker("diff")
+    # As the agent worker would have received the first observation
+    pickle.loads(pickle.dumps(tracker.render(FakeObservation(BEFORE))))
+    diff = tracker.render(FakeObservation(_after()))
+    payload = pickle.dumps(diff)
+    assert len(payload) < len(_after())
+
+    received = pickle.loads(payload)
+    assert isinstance(received, Observation)
+    assert received == diff
+    assert received.tree.first(role="button", name="Archive") is not None
+    assert [node.id for node in received.tree.find(role="link")] == [
+        node.id for node in AXTree.parse(_after()).find(role="link")
+    ]
@@ -0,0 +1,56 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import observation  # noqa: E402
+from metrics import PhaseTimer  # noqa: E402
+from observation import LazyObservation, run_action  # noqa: E402
+
+TEXT = "Tab 0 (current): Inbox\n[1] RootWebArea 'Inbox'\n\t[2] button 'Compose'"
+
+
+class FakeEnv:
+    """Counts observation extractions; ``step`` extracts one like WebArena's env."""
+
+    def __init__(self):
+        self.extractions = 0
+
+    def _get_obs(self):
+        self.extractions += 1
+        return {"text": TEXT, "image": None}
+
+    def step(self, action):
+        return self._get_obs(), 1.0, False, False, {"fail_error": ""}
+
+
+def test_nothing_is_extracted_until_read():
+    env = FakeEnv()
+    obs = LazyObservation(env)
+    assert not obs.materialized and env.extractions == 0
+    assert obs["text"] == TEXT
+    assert obs.get("image") is None and sorted(obs) == ["image", "text"]
+    assert obs.to_dict() == {"text": TEXT, "image": None}
+    assert obs.materialized and env.extractions == 1
+
+
+def test_tree_is_parsed_once_and_timed():
+    timer = PhaseTimer()
+    obs = LazyObservation(FakeEnv(), timer)
+    assert obs.tree is obs.tree
+    assert obs.tree.first(role="button").name == "Compose"
+    assert {"observation", "tree_parse"} <= set(timer.as_dict())
+
+
+def test_wrapped_observations_need_no_env():
+    obs = LazyObservation.of(FakeEnv()._get_obs())
+    assert obs.materialized and obs["text"] == TEXT
+    assert obs.tree.first(role="button").name == "Compose"
+
+
+def test_eager_mode_goes_through_step(monkeypatch):
+    monkeypatch.setattr(observation, "LAZY_OBSERVATIONS", False)
+    env = FakeEnv()
+    obs, success, error = run_action(env, "click [2]")
+    assert (success, error) == (True, "")
+    assert obs.materialized and env.extractions == 1
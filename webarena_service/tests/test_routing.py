@@ -0,0 +1,122 @@
+import json
+import os
+import sys
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import network_archive  # noqa: E402
+from routing import RequestRouter, RoutingPolicy, RoutingPolicyError, parse_policy  # noqa: E402
+
+SITE = "http://localhost:7770"
+
+
+@pytest.mark.parametrize("url, resource_type, expected", [
+    (f"{SITE}/logo.svg", "image", ("allow", None)),
+    (f"{SITE}/photo.jpg", "image", ("block", "type:image")),
+    (f"{SITE}/font.woff2", "font", ("block", "type:font")),
+    ("https://www.google-analytics.com/collect", "xhr", ("block", "domain")),
+    ("https://ssl.google-analytics.com/ga.js", "script", ("block", "domain")),
+    ("https://not-google-analytics.com/app.js", "script", ("allow", None)),
+    (f"{SITE}/api/track?e=view", "fetch", ("stub", (204, "", "text/plain"))),
+    (f"{SITE}/checkout", "document", ("allow", None)),
+])
+def test_decide(url, resource_type, expected):
+    policy = RoutingPolicy({
+        "preset": "lean",
+        "stub": [{"url": "*/api/track*", "status": 204}],
+        "allow": ["*/logo.svg"],
+    })
+    assert policy.decide(url, resource_type) == expected
+
+
+def test_stubs_come_before_blocks_and_allow_before_both():
+    policy = RoutingPolicy({
+        "block_resource_types": ["script"],
+        "stub": [{"url": "*.js", "body": "0", "content_type": "application/javascript"}],
+        "allow": ["*/app.js"],
+    })
+    assert policy.decide(f"{SITE}/vendor.js", "script") == ("stub", (200, "0", "application/javascript"))
+    assert policy.decide(f"{SITE}/app.js", "script") == ("allow", None)
+
+
+@pytest.mark.parametrize("spec", [
+    [],
+    {"preset": "fast"},
+    {"block_resource_types": ["picture"]},
+    {"block_domains": "example.com"},
+    {"stub": [{"status": 204}]},
+    {"stub": [{"url": "*", "status": 999}]},
+])
+def test_malformed_policies_raise(spec):
+    with pytest.raises(RoutingPolicyError):
+        RoutingPolicy(spec)
+
+
+def test_policies_that_route_nothing_are_dropped():
+    assert parse_policy({"allow": ["*"]}) is None
+    assert parse_policy({"preset": "lean"}) is not None
+
+
+class FakeRoute:
+    def __init__(self):
+        self.outcome = None
+
+    def fallback(self):
+        self.outcome = "fallback"
+
+    def fulfill(self, status, body, content_type):
+        self.outcome = ("fulfill", status)
+
+    def abort(self, reason):
+        self.outcome = ("abort", reason)
+
+
+def _route(router, url, resource_type):
+    route = FakeRoute()
+    router._handle(route, SimpleNamespace(url=url, resource_type=resource_type))
+    return route.outcome
+
+
+def _write_archive(directory, challenge_url, entries):
+    path = os.path.join(directory, os.path.basename(network_archive.archive_path(challenge_url)))
+    har = {"log": {"entries": [
+        {"request": {"url": url}, "response": {"content": content, "bodySize": body_size}}
+        for url, content, body_size in entries
+    ]}}
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("har.har", json.dumps(har))
+
+
+def test_archive_sizes_fall_back_to_body_size(tmp_path, monkeypatch):
+    monkeypatch.setattr(network_archive, "NETWORK_ARCHIVE_DIR", str(tmp_path))
+    assert network_archive.archive_sizes(SITE) == {}
+    _write_archive(str(tmp_path), SITE, [
+        (f"{SITE}/a.png", {"size": 5000}, 4000),
+        (f"{SITE}/b.woff2", {"size": -1}, 800),
+        (f"{SITE}/c.mp4", {}, -1),
+    ])
+    assert network_archive.archive_sizes(SITE) == {f"{SITE}/a.png": 5000, f"{SITE}/b.woff2": 800}
+
+
+def test_router_reports_archive_sizes_of_blocked_requests(tmp_path, monkeypatch):
+    monkeypatch.setattr(network_archive, "NETWORK_ARCHIVE_DIR", str(tmp_path))
+    _write_archive(str(tmp_path), SITE, [(f"{SITE}/hero.png", {"size": 5000}, 5000)])
+    router = RequestRouter(
+        RoutingPolicy({"preset": "lean", "stub": [{"url": "*/api/track*", "status": 204}]}),
+        network_archive.archive_sizes(SITE),
+    )
+    assert _route(router, f"{SITE}/hero.png", "image") == ("abort", "blockedbyclient")
+    assert _route(router, f"{SITE}/unrecorded.png", "image") == ("abort", "blockedbyclient")
+    assert _route(router, f"{SITE}/api/track", "fetch") == ("fulfill", 204)
+    assert _route(router, f"{SITE}/checkout", "document") == "fallback"
+    assert router.report() == {
+        "blocked": 2,
+        "stubbed": 1,
+        "known_bytes_saved": 5000,
+        "unknown_size": 2,
+        "blocked_by": {"type:image": 2},
+    }
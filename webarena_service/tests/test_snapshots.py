@@ -0,0 +1,89 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import snapshots  # noqa: E402
+from snapshots import SnapshotStore, snapshot_key  # noqa: E402
+
+STATE = {
+    "cookies": [{"name": "session", "value": "abc", "domain": "localhost", "path": "/"}],
+    "origins": [
+        {"origin": "http://localhost:7770", "localStorage": [{"name": "cart", "value": "[]"}]},
+        {"origin": "http://localhost:9999", "localStorage": []},
+    ],
+}
+
+
+class FakeContext:
+    def __init__(self):
+        self.cookies = []
+        self.scripts = []
+
+    def storage_state(self):
+        return STATE
+
+    def add_cookies(self, cookies):
+        self.cookies.extend(cookies)
+
+    def add_init_script(self, script):
+        self.scripts.append(script)
+
+
+class FakePage:
+    url = "http://localhost:7770/customer/account/"
+
+
+def test_keys_change_with_the_challenge_definition():
+    key = snapshot_key("http://localhost:7770", "Order placed", None, "v1")
+    assert key == snapshot_key("http://localhost:7770", "Order placed", [], "v1")
+    assert key != snapshot_key("http://localhost:7770", "Order placed", None, "v2")
+    assert key != snapshot_key("http://localhost:7770", "Order placed", ["#cart"], "v1")
+
+
+def test_captured_snapshots_survive_a_restart(tmp_path):
+    SnapshotStore(str(tmp_path)).capture("k", FakeContext(), FakePage())
+    assert os.listdir(tmp_path) == ["k.json"]
+
+    snapshot = SnapshotStore(str(tmp_path)).get("k")
+    assert snapshot.url == FakePage.url
+    context = FakeContext()
+    snapshot.apply(context)
+    assert context.cookies == STATE["cookies"]
+    # Only origins with localStorage get a restore script
+    [script] = context.scripts
+    assert "localhost:7770" in script and "localhost:9999" not in script
+
+
+def test_only_restores_count_as_hits_and_misses(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    assert store.get("k") is None
+    assert store.get("k", restoring=True) is None
+    store.capture("k", FakeContext(), FakePage())
+    store.get("k")
+    store.get("k", restoring=True)
+    assert store.stats() == {"cached": 1, "hits": 1, "misses": 1}
+
+
+def test_expired_snapshots_are_dropped(tmp_path, monkeypatch):
+    store = SnapshotStore(str(tmp_path))
+    store.capture("k", FakeContext(), FakePage())
+    monkeypatch.setattr(snapshots, "SNAPSHOT_TTL", -1)
+    assert store.get("k", restoring=True) is None
+    assert store.stats() == {"cached": 0, "hits": 0, "misses": 1}
+
+
+def test_concurrent_captures_leave_one_complete_file(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    threads = [
+        threading.Thread(target=store.capture, args=("k", FakeContext(), FakePage()))
+        for _ in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert os.listdir(tmp_path) == ["k.json"]
+    assert SnapshotStore(str(tmp_path)).get("k").created_at <= time.time()
@@ -0,0 +1,71 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from trials import TrialTracker, distribution, parent_id, trial_id, wilson_interval  # noqa: E402
+
+
+@pytest.mark.parametrize("successes, n, expected", [
+    (0, 10, [0.0, 0.2775]),
+    (5, 10, [0.2366, 0.7634]),
+    (10, 10, [0.7225, 1.0]),
+    (1, 1, [0.2065, 1.0]),
+])
+def test_wilson_interval(successes, n, expected):
+    assert wilson_interval(successes, n) == expected
+
+
+def test_wilson_interval_narrows_with_more_trials():
+    low, high = wilson_interval(50, 100)
+    assert low > 0.2366 and high < 0.7634
+    assert wilson_interval(0, 0) is None
+
+
+def test_distribution():
+    assert distribution([3, 1, 2, 10]) == {"min": 1, "p50": 2.5, "p90": 10, "max": 10, "mean": 4.0}
+    assert distribution([]) is None
+
+
+def test_trial_ids_round_trip():
+    assert parent_id(trial_id("eval-1", 3)) == "eval-1"
+    assert parent_id("eval-1") is None
+
+
+def _response(status, score, steps):
+    return SimpleNamespace(status=status, score=score, steps_taken=steps, message="", trace=None)
+
+
+def test_tracker_summarizes_once_every_trial_finished():
+    finished = []
+    tracker = TrialTracker()
+    ids = tracker.create("eval-1", 3, finished.append)
+    assert ids == ["eval-1-trial-1", "eval-1-trial-2", "eval-1-trial-3"]
+    assert tracker.stats() == {"pending_trials": 3}
+
+    tracker.record(ids[2], _response("completed", 100, 4), 2.0)
+    tracker.record(ids[0], _response("failed", 0, 10), 5.0)
+    assert not finished
+    assert tracker.record("eval-2", _response("completed", 100, 1), 1.0) is None
+    trial_set = tracker.record(ids[1], _response("completed", 100, 6), 3.0)
+    assert finished == [trial_set]
+    assert tracker.stats() == {"pending_trials": 0}
+
+    summary = trial_set.summary()
+    assert summary["completed"] == 2
+    assert summary["mean_score"] == 66.67
+    assert summary["success_rate"] == 0.6667
+    assert summary["success_rate_ci95"] == wilson_interval(2, 3)
+    # Only successful trials count towards steps
+    assert summary["steps_taken"]["max"] == 6
+    assert [run["trial"] for run in summary["runs"]] == [1, 2, 3]
+
+
+def test_discard_forgets_unqueued_trials():
+    tracker = TrialTracker()
+    tracker.create("eval-1", 2, lambda trial_set: None)
+    tracker.discard("eval-1", 2)
+    assert tracker.stats() == {"pending_trials": 0}
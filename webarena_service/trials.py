@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Multi-trial evaluations and their statistical score.
+
+A single run scores 100 or 0, so a flaky page or a nondeterministic agent
+makes one evaluation a coin flip. An evaluation submitted with ``trials: K``
+runs K times instead, as one batch of the scheduler, so the trials run
+concurrently on separate browser contexts. Each trial is a full evaluation
+with its own id (``<evaluation_id>-trial-<k>``), events and trace, but only
+reports to this module; once the last trial has finished, the evaluation's
+single callback carries the mean score, the success rate with its Wilson
+score interval, and the distributions of steps taken and run duration.
+"""
+
+import math
+import os
+import re
+import statistics
+import threading
+from typing import Callable, Dict, List, Optional
+
+# Most trials one evaluation may ask for
+TRIALS_MAX = int(os.environ.get("TRIALS_MAX", "10"))
+# z for the 95% confidence interval of the success rate
+CONFIDENCE_Z = 1.96
+
+_TRIAL_ID = re.compile(r"^(.+)-trial-\d+$")
+
+
+def trial_id(evaluation_id: str, trial: int) -> str:
+    return f"{evaluation_id}-trial-{trial}"
+
+
+def parent_id(run_id: str) -> Optional[str]:
+    """The evaluation id a trial's id belongs to, or None for an evaluation's own id."""
+    match = _TRIAL_ID.match(run_id)
+    return match.group(1) if match else None
+
+
+def wilson_interval(successes: int, n: int, z: float = CONFIDENCE_Z):
+    """Wilson score interval of a success rate; unlike the normal one it stays in [0, 1] for small n."""
+    if n == 0:
+        return None
+    p = successes / n
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return [round(max(0.0, center - half_width), 4), round(min(1.0, center + half_width), 4)]
+
+
+def distribution(values: List[float]) -> Optional[Dict]:
+    if not values:
+        return None
+    values = sorted(values)
+    return {
+        "min": values[0],
+        "p50": statistics.median(values),
+        "p90": values[min(len(values) - 1, int(0.9 * len(values)))],
+        "max": values[-1],
+        "mean": round(statistics.fmean(values), 4),
+    }
+
+
+class TrialSet:
+    """The trials of one evaluation and what they reported so far."""
+
+    def __init__(self, evaluation_id: str, trials: int, on_finished: Callable):
+        self.evaluation_id = evaluation_id
+        self.trials = trials
+        self.on_finished = on_finished
+        # trial number -> (response, duration)
+        self.results = {}
+
+    def summary(self) -> Dict:
+        runs = [(trial, *self.results[trial]) for trial in sorted(self.results)]
+        completed = [response for _, response, _ in runs if response.status == "completed"]
+        scores = [response.score or 0 for _, response, _ in runs]
+        return {
+            "trials": self.trials,
+            "completed": len(completed),
+            "mean_score": round(statistics.fmean(scores), 2) if scores else None,
+            "score_stdev": round(statistics.pstdev(scores), 2) if scores else None,
+            "success_rate": round(len(completed) / len(runs), 4) if runs else None,
+            "success_rate_ci95": wilson_interval(len(completed), len(runs)),
+            # Failed runs take every step they are allowed, so only successful ones count
+            "steps_taken": distribution([response.steps_taken for response in completed]),
+            "duration": distribution([round(duration, 3) for _, _, duration in runs]),
+            "runs": [
+                {
+                    "trial": trial,
+                    "status": response.status,
+                    "score": response.score,
+                    "steps_taken": response.steps_taken,
+                    "duration": round(duration, 3),
+                    "message": response.message,
+                    "trace": response.trace,
+                }
+                for trial, response, duration in runs
+            ],
+        }
+
+
+class TrialTracker:
+    """Routes finished trials to their evaluation's ``TrialSet``."""
+
+    def __init__(self):
+        # trial evaluation_id -> (trial set, trial number)
+        self._trials: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def create(self, evaluation_id: str, trials: int, on_finished: Callable) -> List[str]:
+        """Register an evaluation's trials and return their evaluation ids.
+
+        ``on_finished(trial_set)`` is called from the thread of the last trial to finish.
+        """
+        trial_set = TrialSet(evaluation_id, trials, on_finished)
+        ids = [trial_id(evaluation_id, trial) for trial in range(1, trials + 1)]
+        with self._lock:
+            for trial, run_id in enumerate(ids, 1):
+                self._trials[run_id] = (trial_set, trial)
+        return ids
+
+    def discard(self, evaluation_id: str, trials: int):
+        """Forget trials that were never queued."""
+        with self._lock:
+            for trial in range(1, trials + 1):
+                self._trials.pop(trial_id(evaluation_id, trial), None)
+
+    def record(self, evaluation_id: str, response, duration: float) -> Optional[TrialSet]:
+        """Record a finished run; returns its trial set, or None if it isn't a trial."""
+        with self._lock:
+            entry = self._trials.pop(evaluation_id, None)
+            if entry is None:
+                return None
+            trial_set, trial = entry
+            trial_set.results[trial] = (response, duration)
+            done = len(trial_set.results) == trial_set.trials
+        if done:
+            trial_set.on_finished(trial_set)
+        return trial_set
+
+    def stats(self):
+        with self._lock:
+            return {"pending_trials": len(self._trials)}
+
+
+_tracker: Optional[TrialTracker] = None
+
+
+def get_trials() -> TrialTracker:
+    """Return the process-wide trial tracker, creating it on first use."""
+    global _tracker
+    if _tracker is None:
+        _tracker = TrialTracker()
+    return _tracker